@@ -1,7 +1,10 @@
 import sys
 import uuid
 from langchain_core.messages import HumanMessage
-from src.orchestrator.graph import graph
+from src.orchestrator.graph import graph, capabilities
+from src.core.tracing import traced
+from src.core.cassette import record_turn
+from src.core.iot import state_mirror
 
 def run_interactive_mode():
     print("--- Unraid Assistant (Supervisor Mode) ---")
@@ -13,15 +16,20 @@ def run_interactive_mode():
 
     print(f"Session ID: {thread_id}")
     print("Type 'quit' to exit.")
+
+    # Capabilities load (and the HA state mirror subscribes) in the background while the user types.
+    capabilities.start_background_warm_up()
+    state_mirror.start()
     
-    config = {"configurable": {"thread_id": thread_id}}
+    config = traced({"configurable": {"thread_id": thread_id}})
 
     while True:
         try:
             user_input = input("\nYou: ")
             if user_input.lower() in ["quit", "exit"]:
                 break
-            
+
+            record_turn(thread_id, user_input)
             events = graph.stream(
                 {"messages": [HumanMessage(content=user_input)]}, 
                 config=config, 
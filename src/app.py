@@ -3,29 +3,76 @@ import sys
 import os
 import re
 import json
+import asyncio
+import secrets
 
 if os.getcwd() not in sys.path:
     sys.path.append(os.getcwd())
 
 import chainlit as cl
+from chainlit.server import app as server
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
 from langchain_core.messages import HumanMessage
-from src.core.voice import generate_speech
+from src.core.config import settings
+from src.core import iot, voice
+from src.core.voice import generate_speech, AudioPacer, SpeechStream
+from src.core.tracing import tracer, traced
+from src.core.cassette import record_turn
+from src.utils.streaming import TokenFrames
 
 GRAPH = None
+VOICE_PREWARM = None
+
+def event_owner(event: dict) -> str:
+    """
+    Returns the top-level graph node an event belongs to (e.g. "home_agent").
+    Fan-out runs several agents at once, so their events interleave.
+    """
+    namespace = event.get("metadata", {}).get("langgraph_checkpoint_ns", "")
+    return namespace.split(":")[0]
 
 def get_graph():
     global GRAPH
     if GRAPH is None:
         try:
-            from src.orchestrator.graph import graph
+            from src.orchestrator.graph import graph, capabilities
             GRAPH = graph
+            # Build the worker subgraphs off the event loop; the first
+            # dispatch only waits if its worker is not ready yet.
+            capabilities.start_background_warm_up()
+            from src.core.iot import state_mirror
+            state_mirror.start()
         except Exception as e:
             raise ImportError(f"Could not load Orchestrator: {e}")
     return GRAPH
 
+async def metrics(request: Request):
+    """Prometheus scrape endpoint (per-node / per-tool / per-model latency, voice cache, HA requests)."""
+    if settings.METRICS_TOKEN and not secrets.compare_digest(
+            request.headers.get("authorization", ""), f"Bearer {settings.METRICS_TOKEN}"):
+        return PlainTextResponse("Unauthorized", status_code=401)
+    return PlainTextResponse(tracer.prometheus_text() + voice.prometheus_text() + iot.prometheus_text(),
+                             media_type="text/plain; version=0.0.4")
+
+# Chainlit (2.9.3 in pdm.lock, checked up to 2.12) registers its frontend
+# catch-all "/{full_path:path}" when chainlit.server is imported, so a route
+# added afterwards is never reached. Depending on the FastAPI version the
+# catch-all is a top-level route or sits inside an included router, so
+# /metrics goes first of all rather than next to it. Re-check after a
+# Chainlit upgrade: GET /metrics must return text/plain, not the frontend.
+# The route bypasses Chainlit's auth, hence METRICS_ENABLED (off by default) and METRICS_TOKEN.
+if settings.METRICS_ENABLED:
+    server.add_api_route("/metrics", metrics, methods=["GET"])
+    server.router.routes.insert(0, server.router.routes.pop())
+
 @cl.on_chat_start
 async def start():
+    global VOICE_PREWARM
     cl.user_session.set("thread_id", cl.user_session.get("id"))
+    # Stock phrases are synthesized once per process, in the background.
+    if VOICE_PREWARM is None:
+        VOICE_PREWARM = asyncio.create_task(voice.prewarm())
     try:
         get_graph()
         await cl.Message(
@@ -35,30 +82,105 @@ async def start():
     except Exception as e:
         await cl.Message(content=f"**CRITICAL ERROR**:\n`{e}`", author="System").send()
 
+async def finish_speech(closing: list, streams: list):
+    """Lets a turn's speech play out after its message handler has returned."""
+    try:
+        await asyncio.gather(*closing)
+    except asyncio.CancelledError:
+        for stream in streams:
+            stream.cancel()
+        raise
+
+def stop_speech():
+    """Silences the previous turn (a new message arrived, or the chat ended)."""
+    task = cl.user_session.get("speech")
+    if task is not None and not task.done():
+        task.cancel()
+
+@cl.on_chat_end
+async def end():
+    stop_speech()
+
 @cl.on_message
 async def main(message: cl.Message):
+    stop_speech()
     graph = get_graph()
     thread_id = cl.user_session.get("thread_id")
-    config = {"configurable": {"thread_id": thread_id}}
+    config = traced({"configurable": {"thread_id": thread_id}})
+    record_turn(thread_id, message.content)
     
     inputs = {"messages": [HumanMessage(content=message.content)]}
     
     # --- PERSISTENT STATE ---
-    active_steps = {} # "supervisor", "routing", "agent", "tool", "thought"
-    final_text_buffer = ""
+    # "supervisor", "routing", plus per-agent "agent:<name>", "tool:<name>", "thought:<name>"
+    active_steps = {}
+    # Answer text per agent for the current routing round (several when fanned out)
+    text_buffers = {}
+    # Live answer message per agent, streamed as its tokens arrive
+    answer_msgs = {}
+    # Finished answers of earlier rounds (the last one carries the voice clip)
+    sent_msgs = []
+    # Streaming voice: one speech stream per answer message, one pacer for the turn
+    speech = {}
+    closing_speech = []
+    spoken = []
+    pacer = AudioPacer()
+    # Tokens reach the websocket in ~50ms frames, not one message per token
+    frames = TokenFrames(settings.UI_STREAM_FRAME_MS, settings.UI_STREAM_FRAME_CHARS)
+
+    def speech_for(owner: str, msg: cl.Message) -> SpeechStream:
+        async def send_clip(wav: bytes):
+            clip = cl.Audio(name=f"voice_{len(msg.elements) + 1}.wav", content=wav, display="inline", auto_play=True)
+            msg.elements.append(clip)
+            await clip.send(for_id=msg.id)
+        if owner not in speech:
+            speech[owner] = SpeechStream(send_clip, pacer)
+        return speech[owner]
+
+    async def retract(owner: str):
+        """The tokens were a preamble to tool calls, not the answer: take the message back."""
+        text_buffers[owner] = ""
+        if owner in speech:
+            speech.pop(owner).cancel()
+        if owner in answer_msgs:
+            msg = answer_msgs.pop(owner)
+            frames.drop(msg)
+            await msg.remove()
+
+    async def finalize_answers():
+        for msg in answer_msgs.values():
+            await msg.send()
+            sent_msgs.append(msg)
+        answer_msgs.clear()
+        # Speech tails finish in the background, past the end of the turn if need be.
+        closing_speech.extend(asyncio.create_task(stream.close()) for stream in speech.values())
+        spoken.extend(speech.values())
+        speech.clear()
 
     # LIST OF AGENTS (Added "general_chat" here!)
     AGENTS = ["home_agent", "research_agent", "finance_agent", "scheduler_agent", "system_admin", "general_chat"]
 
-    async for event in graph.astream_events(inputs, config=config, version="v1"):
+    # Only the events rendered below: supervisor/agent node boundaries, model
+    # tokens and tool calls. The filter runs before events are queued, so the
+    # internal runnables of every node never reach this loop.
+    events = graph.astream_events(inputs, config=config, version="v2",
+                                  include_names=["supervisor", *AGENTS], include_types=["chat_model", "tool"])
+    async for event in events:
         kind = event["event"]
         name = event["name"]
         data = event["data"]
+        frames.stats["events"] += 1
+        # Everything except a token touches steps/messages: send their pending tokens first.
+        if kind != "on_chat_model_stream":
+            await frames.flush()
 
         # ==================================================================================
         # 1. SUPERVISOR (ROOT)
         # ==================================================================================
         if kind == "on_chain_start" and name == "supervisor":
+            # A new routing round: answers already streamed stay in the chat.
+            await finalize_answers()
+            text_buffers = {}
             step = cl.Step(name="Supervisor", type="process")
             await step.send()
             active_steps["supervisor"] = step
@@ -81,32 +203,32 @@ async def main(message: cl.Message):
         # ==================================================================================
         # 2. AGENTS (CHILD)
         # ==================================================================================
-        elif kind == "on_chain_start" and name in AGENTS:
+        elif kind == "on_chain_start" and name in AGENTS and event_owner(event) == name:
             # Clean up previous steps
-            if "thought" in active_steps: await active_steps.pop("thought").update()
-            if "tool" in active_steps: await active_steps.pop("tool").update()
-            if "agent" in active_steps: await active_steps.pop("agent").update()
+            for key in (f"thought:{name}", f"tool:{name}", f"agent:{name}"):
+                if key in active_steps: await active_steps.pop(key).update()
             
             parent_id = active_steps["supervisor"].id if "supervisor" in active_steps else None
             
             # For General Chat, we might want to hide the step title or keep it. Keeping it for consistency.
             step = cl.Step(name=name, type="process", parent_id=parent_id)
             await step.send()
-            active_steps["agent"] = step
+            active_steps[f"agent:{name}"] = step
             
-            final_text_buffer = "" 
+            text_buffers[name] = ""
 
-        elif kind == "on_chain_end" and name in AGENTS:
-            if "thought" in active_steps: await active_steps.pop("thought").update()
-            if "agent" in active_steps: await active_steps.pop("agent").update()
+        elif kind == "on_chain_end" and name in AGENTS and event_owner(event) == name:
+            for key in (f"thought:{name}", f"agent:{name}"):
+                if key in active_steps: await active_steps.pop(key).update()
 
         # ==================================================================================
         # 3. TOOLS (GRANDCHILD)
         # ==================================================================================
         elif kind == "on_tool_start":
-            if "thought" in active_steps: await active_steps.pop("thought").update()
+            owner = event_owner(event)
+            if f"thought:{owner}" in active_steps: await active_steps.pop(f"thought:{owner}").update()
 
-            parent_id = active_steps["agent"].id if "agent" in active_steps else None
+            parent_id = active_steps[f"agent:{owner}"].id if f"agent:{owner}" in active_steps else None
             if not parent_id and "supervisor" in active_steps: parent_id = active_steps["supervisor"].id
             
             step = cl.Step(name=name, type="tool", parent_id=parent_id, language="json")
@@ -118,13 +240,14 @@ async def main(message: cl.Message):
                 step.input = str(inp)
                 
             await step.send()
-            active_steps["tool"] = step
+            active_steps[f"tool:{owner}"] = step
             
-            final_text_buffer = ""
+            await retract(owner)
 
         elif kind == "on_tool_end":
-            if "tool" in active_steps:
-                step = active_steps.pop("tool")
+            owner = event_owner(event)
+            if f"tool:{owner}" in active_steps:
+                step = active_steps.pop(f"tool:{owner}")
                 out = data.get("output")
                 out_str = str(out)
                 
@@ -154,19 +277,29 @@ async def main(message: cl.Message):
                 # CASE A: SUPERVISOR (Stream to Routing Step)
                 if langgraph_node == "supervisor":
                     if "routing" in active_steps:
-                        await active_steps["routing"].stream_token(content)
+                        await frames.add(active_steps["routing"], content)
                 
                 # CASE B: AGENTS
                 else:
-                    if "agent" in active_steps and "thought" not in active_steps:
-                        step = cl.Step(name="Reasoning", type="process", parent_id=active_steps["agent"].id)
+                    owner = event_owner(event)
+                    agent_key, thought_key = f"agent:{owner}", f"thought:{owner}"
+                    if agent_key in active_steps and thought_key not in active_steps:
+                        step = cl.Step(name="Reasoning", type="process", parent_id=active_steps[agent_key].id)
                         await step.send()
-                        active_steps["thought"] = step
+                        active_steps[thought_key] = step
                     
-                    if "thought" in active_steps:
-                        await active_steps["thought"].stream_token(content)
+                    if thought_key in active_steps:
+                        await frames.add(active_steps[thought_key], content)
                     
-                    final_text_buffer += content
+                    # Only agents answer the user (not e.g. the context summarizer).
+                    # Stream straight into the chat: the first token shows after one prefill.
+                    if owner in AGENTS:
+                        text_buffers[owner] = text_buffers.get(owner, "") + content
+                        if owner not in answer_msgs:
+                            answer_msgs[owner] = cl.Message(content="", author="GLaDOS")
+                        await frames.add(answer_msgs[owner], content)
+                        if settings.VOICE_STREAMING:
+                            speech_for(owner, answer_msgs[owner]).feed(content)
 
         # ==================================================================================
         # 5. CLEANUP
@@ -178,17 +311,30 @@ async def main(message: cl.Message):
                 has_tool_calls = True
             
             if has_tool_calls:
-                final_text_buffer = ""
-                if "thought" in active_steps:
-                    await active_steps.pop("thought").update()
+                owner = event_owner(event)
+                await retract(owner)
+                if f"thought:{owner}" in active_steps:
+                    await active_steps.pop(f"thought:{owner}").update()
 
     # --- FINAL MESSAGE ---
+    await frames.flush()
+    print(frames.summary())
     for key in list(active_steps.keys()):
         await active_steps[key].update()
 
-    if final_text_buffer:
-        final_msg = cl.Message(content=final_text_buffer, author="GLaDOS")
-        await final_msg.send()
+    # Answers were streamed as they were generated; close the live messages.
+    await finalize_answers()
+    # Chainlit runs one handler per session at a time: waiting for the audio to
+    # finish playing here would hold the next message back for as long.
+    if closing_speech:
+        cl.user_session.set("speech", asyncio.create_task(finish_speech(closing_speech, spoken)))
+
+    # Fanned-out agents each contribute their answer, in the order they started.
+    final_text_buffer = "\n\n".join(text for text in text_buffers.values() if text.strip())
+
+    # Without streaming voice, the last round's answer is spoken in one clip at the end.
+    if not settings.VOICE_STREAMING and final_text_buffer and sent_msgs:
+        final_msg = sent_msgs[-1]
 
         clean_text = re.sub(r'```.*?```', '', final_text_buffer, flags=re.DOTALL).strip()
         if clean_text:
@@ -30,14 +30,15 @@ You: "You spent $384.67 on the UPS."
 4. If the user asks for a list, use `LIMIT 10`.
 """
 
-# Slightly higher temp helps with SQL creativity, but 0 is safest for tool adherence
-model = get_llm(temperature=0) 
-
 tools = [query_amazon_orders]
 
-finance_agent = create_agent(
-    model=model,
-    tools=tools,
-    system_prompt=SystemMessage(content=SYSTEM_PROMPT),
-    middleware=[ToolEnforcementMiddleware(strict_mode=True)]
-)
\ No newline at end of file
+def build_finance_agent():
+    """Builds the compiled agent. Called lazily by the capability registry."""
+    # Slightly higher temp helps with SQL creativity, but 0 is safest for tool adherence
+    model = get_llm(temperature=0, role="sql")
+    return create_agent(
+        model=model,
+        tools=tools,
+        system_prompt=SystemMessage(content=SYSTEM_PROMPT),
+        middleware=[ToolEnforcementMiddleware(strict_mode=True)]
+    )
\ No newline at end of file
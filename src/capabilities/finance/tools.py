@@ -1,6 +1,26 @@
 from langchain_core.tools import tool
 from sqlalchemy import text
-from src.core.database import get_db_session
+from src.core.database import get_db_session, get_async_db_session
+from src.utils.async_tools import async_variant
+
+FORBIDDEN_VERBS = ["INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "TRUNCATE", "GRANT"]
+
+def _is_write_query(sql_query: str) -> bool:
+    return any(verb in sql_query.upper() for verb in FORBIDDEN_VERBS)
+
+def _format_rows(rows, columns) -> str:
+    if not rows:
+        return "Query returned no results."
+
+    # 3. Formatting
+    output = [f"Found {len(rows)} records:", " | ".join(columns)]
+
+    for row in rows:
+        # Convert row to string representation
+        row_str = " | ".join(str(item) for item in row)
+        output.append(row_str)
+
+    return "\n".join(output)
 
 @tool
 def query_amazon_orders(sql_query: str) -> str:
@@ -23,8 +43,7 @@ def query_amazon_orders(sql_query: str) -> str:
     4. Limit results to 20 unless specifically asked for more.
     """
     # 1. Safety Check (Basic SQL Injection/Destruction Guard)
-    forbidden = ["INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "TRUNCATE", "GRANT"]
-    if any(verb in sql_query.upper() for verb in forbidden):
+    if _is_write_query(sql_query):
         return "SECURITY ALERT: Write operations are forbidden. Read-only access allowed."
 
     # 2. Execution
@@ -34,22 +53,22 @@ def query_amazon_orders(sql_query: str) -> str:
         result = session.execute(text(sql_query))
         rows = result.fetchall()
         
-        if not rows:
-            return "Query returned no results."
-            
-        # 3. Formatting
-        # Get column names from keys
-        columns = list(result.keys())
-        output = [f"Found {len(rows)} records:", " | ".join(columns)]
-        
-        for row in rows:
-            # Convert row to string representation
-            row_str = " | ".join(str(item) for item in row)
-            output.append(row_str)
-            
-        return "\n".join(output)
+        return _format_rows(rows, list(result.keys()))
 
     except Exception as e:
         return f"SQL ERROR: {e}"
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+@async_variant(query_amazon_orders)
+async def aquery_amazon_orders(sql_query: str) -> str:
+    if _is_write_query(sql_query):
+        return "SECURITY ALERT: Write operations are forbidden. Read-only access allowed."
+
+    try:
+        async with get_async_db_session() as session:
+            result = await session.execute(text(sql_query))
+            return _format_rows(result.fetchall(), list(result.keys()))
+
+    except Exception as e:
+        return f"SQL ERROR: {e}"
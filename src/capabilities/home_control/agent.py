@@ -1,36 +1,83 @@
 # %% src/capabilities/home_control/agent.py
-import json
-from langchain_core.messages import SystemMessage
+import asyncio
+from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
 
+from src.core.config import settings
+from src.core.iot import state_mirror
 from src.core.llm import get_llm
 from src.core.middleware import ToolEnforcementMiddleware
 from src.orchestrator.state import GlobalState
+from src.utils.async_tools import dual_node
 from src.capabilities.home_control.tools import (
     get_active_domains,
     list_entities_in_domain, 
-    control_device
+    control_device,
+    control_devices
 )
+from src.capabilities.home_control.projection import project_entities, request_text
+from src.capabilities.home_control.resolver import resolver
+from src.capabilities.home_control.inventory import inventory, unpinned
+
+RESOLVED_HEADER = "## SYSTEM: RESOLVED ENTITIES"
+
+# --- NODE 0: RESOLVER (skips scanner + drill-down when the request names its devices) ---
+def _resolve_messages(state: GlobalState, states):
+    if not settings.HOME_RESOLVER_ENABLED or isinstance(states, dict):
+        return {}
+    text = request_text(state)
+    resolution = resolver.resolve(text, states)
+    if not resolution.confident:
+        print(f"[RESOLVER] {text!r}: {resolution.reason} ({resolution.elapsed_us:.0f}µs), drilling down.")
+        return {}
+    by_id = {s["entity_id"]: s for s in states}
+    found = [by_id.get(e) for e in resolution.candidates]
+    if None in found:
+        # The index is from another mirror version and a candidate is gone since: scan instead.
+        print(f"[RESOLVER] {text!r}: candidates no longer in the states, drilling down.")
+        return {}
+    print(f"[RESOLVER] {text!r} -> {', '.join(resolution.candidates)} ({resolution.elapsed_us:.0f}µs)")
+    table = project_entities(found, None, text)
+    return {"messages": [SystemMessage(content=f"{RESOLVED_HEADER}\n"
+                                               f"The request names these entities, best match first.\n{table}")]}
+
+def resolve_node(state: GlobalState):
+    return _resolve_messages(state, state_mirror.states())
+
+async def aresolve_node(state: GlobalState):
+    return _resolve_messages(state, await state_mirror.astates())
 
 # --- NODE 1: DOMAIN SCANNER ---
+def _scan_messages(state: GlobalState, domains: str):
+    # We don't print here to keep the UI clean (the tool call shows up anyway)
+    # Later turns of a thread get the change since the list already in context (see inventory.py).
+    kind, text, pin = inventory.domains(state["messages"], domains)
+    tool_msg = SystemMessage(content=f"## SYSTEM: ACTIVE DOMAINS\n{text}", **pin)
+    if kind != "full":
+        return {"messages": [tool_msg]}
+    msg = SystemMessage(
+        content="## PHASE 1: DISCOVERY\nI have injected the `get_active_domains` tool result below. Use it to orient yourself."
+    )
+    return {"messages": [msg, tool_msg]}
+
 def domain_scanner_node(state: GlobalState):
     try:
-        # We don't print here to keep the UI clean (the tool call shows up anyway)
-        msg = SystemMessage(
-            content="## PHASE 1: DISCOVERY\nI have injected the `get_active_domains` tool result below. Use it to orient yourself."
-        )
         # We manually invoke to ensure the context is loaded immediately for the LLM
-        domains = get_active_domains.invoke({})
-        tool_msg = SystemMessage(content=f"## SYSTEM: ACTIVE DOMAINS\n{domains}")
-        return {"messages": [msg, tool_msg]}
+        return _scan_messages(state, get_active_domains.invoke({}))
+    except Exception as e:
+        return {"messages": [SystemMessage(content=f"Error scanning domains: {e}")]}
+
+async def adomain_scanner_node(state: GlobalState):
+    try:
+        return _scan_messages(state, await get_active_domains.ainvoke({}))
     except Exception as e:
         return {"messages": [SystemMessage(content=f"Error scanning domains: {e}")]}
 
 # --- NODE 2: DRILL DOWN (Logic Engine) ---
-def drill_down_node(state: GlobalState):
-    model = get_llm(temperature=0)
+def _drill_down_chain():
+    model = get_llm(temperature=0, role="home_scout")
     tools = [list_entities_in_domain] 
     model = model.bind_tools(tools)
     
@@ -54,46 +101,97 @@ def drill_down_node(state: GlobalState):
     If the user's request is purely conversational (e.g., "Tell me a joke") and has NO device control, do not call any tools. Just output "PASS".
     """
     
-    chain = ChatPromptTemplate.from_messages([
+    return ChatPromptTemplate.from_messages([
         ("system", prompt),
         MessagesPlaceholder(variable_name="messages"),
     ]) | model
-    
-    response = chain.invoke(state)
+
+def _drill_down_input(state: GlobalState):
+    # Picking a domain takes the domain list, not the entity tables of earlier turns.
+    return {**state, "messages": unpinned(state["messages"], keep=(SystemMessage,))}
+
+def drill_down_node(state: GlobalState):
+    response = _drill_down_chain().invoke(_drill_down_input(state))
+    return {"messages": [response]}
+
+async def adrill_down_node(state: GlobalState):
+    response = await _drill_down_chain().ainvoke(_drill_down_input(state))
     return {"messages": [response]}
 
 # --- NODE 3: FALLBACK ---
+def _fallback_message(lights: str, switches: str):
+    # Both are compact entity tables (see projection.py), each within its own token budget.
+    msg = SystemMessage(content=f"## SYSTEM FALLBACK: LIGHTS & SWITCHES\n{lights}\n\n{switches}")
+    return {"messages": [msg]}
+
 def hard_fallback_scan_node(state: GlobalState):
     print("[HomeAgent] LLM stalled. Executing HARD FALLBACK scan.")
     try:
-        lights = list_entities_in_domain.invoke({"domain": "light"})
-        switches = list_entities_in_domain.invoke({"domain": "switch"})
-        
-        # Merge lists
-        l = json.loads(lights)
-        s = json.loads(switches)
-        combined = json.dumps(l + s, indent=2)
-        
-        msg = SystemMessage(content=f"## SYSTEM FALLBACK: LIGHTS & SWITCHES\n{combined}")
-        return {"messages": [msg]}
+        lights = list_entities_in_domain.invoke({"domain": "light", "state": state})
+        switches = list_entities_in_domain.invoke({"domain": "switch", "state": state})
+        return _fallback_message(lights, switches)
+    except:
+        return {"messages": [SystemMessage(content="## SYSTEM FALLBACK FAILED")]}
+
+async def ahard_fallback_scan_node(state: GlobalState):
+    print("[HomeAgent] LLM stalled. Executing HARD FALLBACK scan.")
+    try:
+        lights, switches = await asyncio.gather(
+            list_entities_in_domain.ainvoke({"domain": "light", "state": state}),
+            list_entities_in_domain.ainvoke({"domain": "switch", "state": state}),
+        )
+        return _fallback_message(lights, switches)
     except:
         return {"messages": [SystemMessage(content="## SYSTEM FALLBACK FAILED")]}
 
+# --- NODE 3b: INVENTORY (entity tables already in context become diffs) ---
+def _list_results(state: GlobalState):
+    """The list_entities_in_domain results just added, with the domain each was asked for."""
+    messages = state["messages"]
+    results = []
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            break
+        results.append(message)
+    calls = {call["id"]: call["args"].get("domain", "") for m in messages if isinstance(m, AIMessage)
+             for call in m.tool_calls}
+    return [(m, calls.get(m.tool_call_id, "")) for m in reversed(results) if isinstance(m.content, str)]
+
+def _inventory_messages(state: GlobalState, results, states):
+    updates = []
+    for message, domain in results:
+        text, pin = inventory.entities(state["messages"], message.content, domain, states.get(domain), message.id)
+        if text != message.content or pin:
+            # Same id: replaces the tool result in the history (add_messages merges by id).
+            updates.append(ToolMessage(content=text, tool_call_id=message.tool_call_id, name=message.name,
+                                       **{"id": message.id, **pin}))
+    return {"messages": updates}
+
+def inventory_node(state: GlobalState):
+    results = _list_results(state)
+    return _inventory_messages(state, results, {domain: state_mirror.states(domain) for _, domain in results})
+
+async def ainventory_node(state: GlobalState):
+    results = _list_results(state)
+    domains = list(dict.fromkeys(domain for _, domain in results))
+    fetched = await asyncio.gather(*(state_mirror.astates(domain) for domain in domains))
+    return _inventory_messages(state, results, dict(zip(domains, fetched)))
+
 # --- NODE 4: EXECUTOR (Anti-Hallucination) ---
-def executor_node(state: GlobalState):
-    model = get_llm(temperature=0)
-    tools = [control_device]
+def _executor_chain():
+    model = get_llm(temperature=0, role="home_executor")
+    tools = [control_device, control_devices]
     model = model.bind_tools(tools)
     
     prompt = """You are the Home Assistant Operator.
 
     ### INSTRUCTIONS
     1. Review the **Lists of Entities** provided in the history.
-    2. Match the user's request to a specific `entity_id`.
-    3. Execute `control_device`.
+    2. Match the user's request to a specific `entity_id` (or several: "all the kitchen lights").
+    3. Execute `control_device` for one device, `control_devices` for more than one.
 
     ### CRITICAL SECURITY RULES
-    1. **NO GUESSING:** You MUST see the `entity_id` in the provided JSON lists before using it.
+    1. **NO GUESSING:** You MUST see the `entity_id` in the provided entity tables before using it.
     2. **NO INVENTING:** Do not make up IDs like `tts.google_say` or `light.kitchen_screen`. 
     3. **IF NOT FOUND:** If the device is not in the list, say "I could not find a device named X in the [domain] domain."
     
@@ -102,32 +200,40 @@ def executor_node(state: GlobalState):
     - `entity_id`: The exact ID found.
     - `service`: 'turn_on', 'turn_off', etc.
     - `parameters`: Dictionary (e.g. {{ "brightness_pct": 50 }}).
+    For several devices, call `control_devices` ONCE with `commands`: a list of those same objects.
     """
     
-    chain = ChatPromptTemplate.from_messages([
+    return ChatPromptTemplate.from_messages([
         ("system", prompt),
         MessagesPlaceholder(variable_name="messages"),
     ]) | model
-    
+
+def _executor_input(state: GlobalState):
+    # A resolved request names its devices: the inventory of earlier turns is only noise.
+    if route_resolve(state) == "executor":
+        return {**state, "messages": unpinned(state["messages"])}
+    return state
+
+def executor_node(state: GlobalState):
     middleware = ToolEnforcementMiddleware(strict_mode=True)
-    modified_state = middleware.before_model(state)
-    response = chain.invoke(modified_state)
+    modified_state = middleware.before_model(_executor_input(state))
+    response = _executor_chain().invoke(modified_state)
     final_response = middleware.after_model(response)
     
     return {"messages": [final_response]}
 
-# --- GRAPH ---
-workflow = StateGraph(GlobalState)
-
-workflow.add_node("scanner", domain_scanner_node)
-workflow.add_node("drill_down", drill_down_node)
-workflow.add_node("list_tool", ToolNode([list_entities_in_domain]))
-workflow.add_node("fallback", hard_fallback_scan_node)
-workflow.add_node("executor", executor_node)
-workflow.add_node("control_tool", ToolNode([control_device]))
+async def aexecutor_node(state: GlobalState):
+    middleware = ToolEnforcementMiddleware(strict_mode=True)
+    modified_state = middleware.before_model(_executor_input(state))
+    response = await _executor_chain().ainvoke(modified_state)
+    return {"messages": [middleware.after_model(response)]}
 
-workflow.add_edge(START, "scanner")
-workflow.add_edge("scanner", "drill_down")
+# --- GRAPH ---
+def route_resolve(state: GlobalState):
+    last_msg = state["messages"][-1]
+    if isinstance(last_msg, SystemMessage) and last_msg.content.startswith(RESOLVED_HEADER):
+        return "executor"
+    return "scanner"
 
 def route_drill_down(state: GlobalState):
     last_msg = state["messages"][-1]
@@ -143,18 +249,36 @@ def route_drill_down(state: GlobalState):
     # If ambiguous/failed, force scan
     return "fallback"
 
-workflow.add_conditional_edges("drill_down", route_drill_down, ["list_tool", "fallback", END])
-
-workflow.add_edge("list_tool", "executor")
-workflow.add_edge("fallback", "executor")
-
 def route_executor(state: GlobalState):
     last_msg = state["messages"][-1]
     if last_msg.tool_calls:
         return "control_tool"
     return END
 
-workflow.add_conditional_edges("executor", route_executor, ["control_tool", END])
-workflow.add_edge("control_tool", END)
+def build_home_agent():
+    """Compiles the home-control subgraph. Called lazily by the capability registry."""
+    workflow = StateGraph(GlobalState)
+
+    # Sync + async twins (see dual_node); ToolNode already awaits tool coroutines.
+    workflow.add_node("resolve", dual_node(resolve_node, aresolve_node))
+    workflow.add_node("scanner", dual_node(domain_scanner_node, adomain_scanner_node))
+    workflow.add_node("drill_down", dual_node(drill_down_node, adrill_down_node))
+    workflow.add_node("list_tool", ToolNode([list_entities_in_domain]))
+    workflow.add_node("inventory", dual_node(inventory_node, ainventory_node))
+    workflow.add_node("fallback", dual_node(hard_fallback_scan_node, ahard_fallback_scan_node))
+    workflow.add_node("executor", dual_node(executor_node, aexecutor_node))
+    workflow.add_node("control_tool", ToolNode([control_device, control_devices]))
+
+    workflow.add_edge(START, "resolve")
+    workflow.add_conditional_edges("resolve", route_resolve, ["executor", "scanner"])
+    workflow.add_edge("scanner", "drill_down")
+    workflow.add_conditional_edges("drill_down", route_drill_down, ["list_tool", "fallback", END])
+
+    workflow.add_edge("list_tool", "inventory")
+    workflow.add_edge("inventory", "executor")
+    workflow.add_edge("fallback", "executor")
+
+    workflow.add_conditional_edges("executor", route_executor, ["control_tool", END])
+    workflow.add_edge("control_tool", END)
 
-home_agent = workflow.compile()
\ No newline at end of file
+    return workflow.compile()
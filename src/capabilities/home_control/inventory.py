@@ -0,0 +1,183 @@
+# src/capabilities/home_control/inventory.py
+import json
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain_core.messages import BaseMessage, ToolMessage
+from langchain_core.runnables.config import ensure_config
+
+from src.core.config import settings
+from src.core.context import PINNED_KEY, STALE_TOOL_STUB, CHARS_PER_TOKEN
+from src.capabilities.home_control.projection import INACTIVE_STATES
+
+# The worker whose window keeps inventory messages across turns (see context._strip_stale).
+WORKER = "home_agent"
+
+def diffs_enabled() -> bool:
+    """HOME_INVENTORY_DIFFS_ENABLED; unset means on only without the context window."""
+    if settings.HOME_INVENTORY_DIFFS_ENABLED is None:
+        return not settings.CONTEXT_WINDOW_ENABLED
+    return settings.HOME_INVENTORY_DIFFS_ENABLED
+
+def _thread_id() -> Optional[str]:
+    """thread_id of the graph run the caller is part of (read from the runnable context)."""
+    return ensure_config().get("configurable", {}).get("thread_id")
+
+def table_rows(table: str) -> Dict[str, str]:
+    """entity_id -> row of a projection table; header, footer and error text are skipped."""
+    rows = {}
+    for line in table.splitlines():
+        entity_id = line.split("|", 1)[0]
+        if "|" in line and "." in entity_id and " " not in entity_id:
+            rows[entity_id] = line
+    return rows
+
+def unpinned(messages: List[BaseMessage], keep: Tuple[type, ...] = ()) -> List[BaseMessage]:
+    """
+    The messages without the pinned inventory (for prompts that don't need
+    it), except messages of the `keep` types. Entity tables become the usual
+    stale-tool stub, so every tool call keeps its result.
+    """
+    cleaned = []
+    for m in messages:
+        if m.additional_kwargs.get(PINNED_KEY) != WORKER or isinstance(m, keep):
+            cleaned.append(m)
+        elif isinstance(m, ToolMessage):
+            cleaned.append(ToolMessage(content=STALE_TOOL_STUB, tool_call_id=m.tool_call_id, name=m.name, id=m.id))
+    return cleaned
+
+class Snapshot:
+    """What one thread's model has been shown, and the messages that show it."""
+    def __init__(self):
+        self.version = 0
+        self.domains: Optional[List[str]] = None
+        self.rows: Dict[str, str] = {}  # entity_id -> table row as last shown
+        self.anchors: Set[str] = set()  # ids of the messages the snapshot relies on
+
+class InventoryContext:
+    """
+    Per-thread record of the home inventory already in the model's context.
+
+    The first domain list and entity table of a thread go out in full; later
+    ones only carry what changed since (rows added, changed or removed), or
+    a one-line reference when nothing did. Messages a snapshot relies on are
+    pinned in the home_agent window; once one of them leaves it (trimmed to
+    the token budget, folded into the summary) the snapshot starts over and
+    the next inventory is sent in full again.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads: "OrderedDict[str, Snapshot]" = OrderedDict()
+        self.stats = {"full": 0, "diff": 0, "reference": 0, "resets": 0, "full_tokens": 0, "sent_tokens": 0}
+
+    def _snapshot(self, messages: List[BaseMessage]) -> Optional[Snapshot]:
+        thread_id = _thread_id() if diffs_enabled() else None
+        if not thread_id:
+            return None
+        visible = {m.id for m in messages if m.id}
+        with self._lock:
+            snapshot = self._threads.get(thread_id)
+            if snapshot is None or not snapshot.anchors <= visible:
+                if snapshot is not None:
+                    self.stats["resets"] += 1
+                snapshot = self._threads[thread_id] = Snapshot()
+            self._threads.move_to_end(thread_id)
+            while len(self._threads) > settings.HOME_INVENTORY_MAX_THREADS:
+                self._threads.popitem(last=False)
+        return snapshot
+
+    def _pin(self, snapshot: Snapshot, message_id: Optional[str] = None) -> Dict[str, Any]:
+        """Message kwargs for a message the snapshot now relies on."""
+        message_id = message_id or str(uuid.uuid4())
+        snapshot.anchors.add(message_id)
+        snapshot.version += 1
+        return {"id": message_id, "additional_kwargs": {PINNED_KEY: WORKER}}
+
+    def _log(self, label: str, kind: str, full: str, sent: str):
+        self.stats[kind] += 1
+        self.stats["full_tokens"] += len(full) // CHARS_PER_TOKEN
+        self.stats["sent_tokens"] += len(sent) // CHARS_PER_TOKEN
+        if kind != "full":
+            print(f"[INVENTORY] {label}: {kind}, ~{len(full) // CHARS_PER_TOKEN} -> ~{len(sent) // CHARS_PER_TOKEN} tokens "
+                  f"({self.stats['diff']} diffs, {self.stats['reference']} references).")
+
+    def domains(self, messages: List[BaseMessage], domains: str) -> Tuple[str, str, Dict[str, Any]]:
+        """(kind, text, message kwargs) for the active-domain list; kind is "full", "diff" or "reference"."""
+        snapshot = self._snapshot(messages)
+        try:
+            current = json.loads(domains)
+        except ValueError:
+            current = None
+        if snapshot is None or not isinstance(current, list):
+            return "full", domains, {}
+        if snapshot.domains is None:
+            snapshot.domains = current
+            self._log("domains", "full", domains, domains)
+            return "full", domains, self._pin(snapshot)
+        added = [d for d in current if d not in snapshot.domains]
+        removed = [d for d in snapshot.domains if d not in current]
+        if not added and not removed:
+            text = f"Unchanged since inventory v{snapshot.version} (above)."
+            self._log("domains", "reference", domains, text)
+            return "reference", text, {}
+        text = (f"Changed since inventory v{snapshot.version} (above): "
+                f"added {json.dumps(added)}, removed {json.dumps(removed)}.")
+        snapshot.domains = current
+        self._log("domains", "diff", domains, text)
+        return "diff", text, self._pin(snapshot)
+
+    def entities(self, messages: List[BaseMessage], table: str, domain: str, states: Any,
+                 message_id: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        (text, message kwargs) for a projected entity table of `domain`.
+        `states` are the domain's current states (rows the model saw for
+        entities no longer active in them are reported removed); the kwargs
+        are empty when the message needn't be pinned.
+        """
+        snapshot = self._snapshot(messages)
+        rows = table_rows(table)
+        if snapshot is None or not rows:
+            return table, {}
+        lines = table.splitlines()
+        label = lines[0][3:].split(" (", 1)[0] if lines[0].startswith("## ") else domain
+        if not any(e.startswith(f"{domain}.") for e in snapshot.rows):
+            snapshot.rows.update(rows)
+            self._log(label, "full", table, table)
+            return table, self._pin(snapshot, message_id)
+
+        active = ({s.get("entity_id") for s in states
+                   if str(s.get("state", "unknown")).lower() not in INACTIVE_STATES}
+                  if isinstance(states, list) else None)
+        changed = [row for e, row in rows.items() if snapshot.rows.get(e) != row]
+        removed = [] if active is None else sorted(
+            e for e in snapshot.rows if e.startswith(f"{domain}.") and e not in rows and e not in active)
+        unchanged = len(rows) - len(changed)
+        if not changed and not removed:
+            text = f"## {label}: unchanged since inventory v{snapshot.version} ({unchanged} rows in the table above)"
+            self._log(label, "reference", table, text)
+            return text, {}
+
+        footer = [line for line in lines[1:] if line.startswith("(")]
+        text = "\n".join([f"## {label}: changes since inventory v{snapshot.version} "
+                          f"({unchanged} rows unchanged, see the table above)",
+                          "entity_id|name|state|attributes",
+                          *changed,
+                          *([f"(removed: {', '.join(removed)})"] if removed else []),
+                          *footer])
+        if len(text) >= len(table):
+            text = table
+        for entity_id in removed:
+            snapshot.rows.pop(entity_id, None)
+        snapshot.rows.update(rows)
+        self._log(label, "full" if text is table else "diff", table, text)
+        return text, self._pin(snapshot, message_id)
+
+    def summary(self) -> str:
+        s = self.stats
+        saved = 1 - s["sent_tokens"] / s["full_tokens"] if s["full_tokens"] else 0.0
+        return (f"[INVENTORY] {s['full']} full, {s['diff']} diffs, {s['reference']} references, "
+                f"{s['resets']} resets: ~{s['full_tokens']} -> ~{s['sent_tokens']} tokens ({saved:.0%} saved).")
+
+inventory = InventoryContext()
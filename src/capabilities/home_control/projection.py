@@ -0,0 +1,142 @@
+# src/capabilities/home_control/projection.py
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.messages import HumanMessage
+
+from src.core.config import settings
+
+# Rough heuristic for Ollama models: ~4 characters per token.
+CHARS_PER_TOKEN = 4
+
+# --- ATTRIBUTE ALLOWLISTS ---
+# Per domain, the attributes the executor can act on or report. Everything
+# else (supported_features bitmasks, color mode lists, mireds, icons, ...)
+# stays out of the prompt. Domains not listed show id, name and state only.
+DOMAIN_ATTRIBUTES: Dict[str, List[str]] = {
+    "light": ["brightness", "color_temp_kelvin", "effect"],
+    "climate": ["hvac_modes", "temperature", "target_temp_low", "target_temp_high",
+                "current_temperature", "hvac_action", "fan_mode", "preset_mode"],
+    "cover": ["current_position"],
+    "fan": ["percentage", "preset_mode", "oscillating"],
+    "media_player": ["volume_level", "is_volume_muted", "source", "media_title"],
+    "humidifier": ["humidity", "mode"],
+    "water_heater": ["temperature", "operation_mode"],
+    "vacuum": ["battery_level", "fan_speed"],
+    "number": ["min", "max", "step"],
+    "input_number": ["min", "max", "step"],
+    "select": ["options"],
+    "input_select": ["options"],
+    "sensor": ["unit_of_measurement"],
+}
+
+INACTIVE_STATES = {"unavailable", "unknown"}
+
+# Words in a request that say nothing about which device is meant.
+STOPWORDS = {"turn", "switch", "set", "the", "and", "off", "on", "to", "in", "of", "please", "can", "you",
+             "my", "a", "an", "is", "it", "all", "make", "what", "percent", "up", "down", "at"}
+
+# Running totals since startup, for the savings log.
+stats = {"calls": 0, "entities": 0, "shown": 0, "full_tokens": 0, "compact_tokens": 0}
+
+def _value(value: Any) -> str:
+    if isinstance(value, list):
+        return "/".join(_value(v) for v in value)
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value).replace("|", "/").replace("\n", " ")
+
+def _attributes(domain: str, attributes: Dict[str, Any]) -> str:
+    parts = []
+    for key in DOMAIN_ATTRIBUTES.get(domain, []):
+        value = attributes.get(key)
+        if value is None:
+            continue
+        if key == "brightness":  # control_device takes brightness_pct
+            key, value = "brightness_pct", round(value * 100 / 255)
+        parts.append(f"{key}={_value(value)}")
+    return " ".join(parts)
+
+def _words(text: str) -> set:
+    # "to 20 percent" is a setting, not part of a name ("Bedroom Light 20").
+    text = re.sub(r"\d+\s*(%|percent|degrees?|°)", " ", text.lower())
+    return {w for w in re.findall(r"[a-z0-9]+", text) if w not in STOPWORDS}
+
+def request_text(state: Optional[Dict[str, Any]]) -> str:
+    """The user's request (last human message), used to rank entities by relevance."""
+    for message in reversed((state or {}).get("messages", [])):
+        if isinstance(message, HumanMessage):
+            return message.content if isinstance(message.content, str) else str(message.content)
+    return ""
+
+def relevance(entity_id: str, name: str, query_words: set) -> int:
+    """Whole-word matches count double; partial ones ('bed' in 'bedroom') once."""
+    haystack = f"{entity_id} {name}".lower()
+    words = set(re.findall(r"[a-z0-9]+", haystack))
+    return sum(2 if w in words else 1 for w in query_words if w in words or (len(w) >= 3 and w in haystack))
+
+def project_entities(states: List[Dict[str, Any]], domain: Optional[str], query: str = "",
+                     budget_tokens: Optional[int] = None) -> str:
+    """
+    Compact table of a domain's active entities for the home-control prompts:
+    one `entity_id|name|state|attributes` row each, allowlisted attributes only.
+    Rows most relevant to `query` (the user's request) come first; rows that
+    would exceed the token budget are dropped and counted in a footer.
+    domain=None tables all the given states (e.g. the resolver's candidates).
+    """
+    budget_tokens = settings.HOME_ENTITY_TOKEN_BUDGET if budget_tokens is None else budget_tokens
+    active = [s for s in states
+              if (domain is None or s.get("entity_id", "").startswith(f"{domain}."))
+              and str(s.get("state", "unknown")).lower() not in INACTIVE_STATES]
+    label = domain or "entities"
+    if not active:
+        return f"No active entities in the '{domain}' domain." if domain else "No active entities."
+
+    rows: List[Tuple[int, str, str]] = []
+    query_words = _words(query)
+    full_chars = 0
+    for s in active:
+        entity_id = s["entity_id"]
+        attributes = s.get("attributes", {})
+        name = attributes.get("friendly_name", entity_id)
+        full_chars += _full_size(entity_id, name, s.get("state"), attributes)
+        row = "|".join([entity_id, _value(name), _value(s.get("state")),
+                        _attributes(entity_id.split(".", 1)[0], attributes)])
+        rows.append((relevance(entity_id, name, query_words) if query_words else 0, entity_id, row))
+    # Best match first; ties keep entity_id order so the prompt is stable across turns.
+    rows.sort(key=lambda r: (-r[0], r[1]))
+
+    header = f"## {label} ({len(active)} active, most relevant first)\nentity_id|name|state|attributes"
+    lines, used = [header], len(header)
+    for _, _, row in rows:
+        if len(lines) > 1 and used + len(row) + 1 > budget_tokens * CHARS_PER_TOKEN:
+            break
+        lines.append(row)
+        used += len(row) + 1
+    shown = len(lines) - 1
+    if shown < len(active):
+        lines.append(f"({len(active) - shown} less relevant {f'{domain} ' if domain else ''}entities omitted)")
+    table = "\n".join(lines)
+
+    _log(label, active, shown, table, full_chars)
+    return table
+
+def _full_size(entity_id: str, name: Any, state: Any, attributes: Dict[str, Any]) -> int:
+    """
+    Roughly what an entity cost before: every attribute, pretty-printed JSON.
+    An estimate from repr() (C speed) plus the indentation and keys json.dumps(indent=2)
+    adds, so the savings log doesn't pay for the serialization this module avoids.
+    """
+    return len(repr(attributes)) + len(entity_id) + len(str(name)) + len(str(state)) + 16 * len(attributes) + 70
+
+def _log(domain: str, active: List[Dict[str, Any]], shown: int, table: str, full_chars: int):
+    full = full_chars // CHARS_PER_TOKEN
+    compact = len(table) // CHARS_PER_TOKEN
+    stats["calls"] += 1
+    stats["entities"] += len(active)
+    stats["shown"] += shown
+    stats["full_tokens"] += full
+    stats["compact_tokens"] += compact
+    saved = 1 - compact / full if full else 0.0
+    total_saved = 1 - stats["compact_tokens"] / stats["full_tokens"] if stats["full_tokens"] else 0.0
+    print(f"[PROJECTION] {domain}: {shown}/{len(active)} entities, ~{full} -> ~{compact} tokens "
+          f"({saved:.0%} saved; {total_saved:.0%} over {stats['calls']} calls)")
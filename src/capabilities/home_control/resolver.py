@@ -0,0 +1,236 @@
+# src/capabilities/home_control/resolver.py
+import re
+import math
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from src.core.config import settings
+from src.core.iot import state_mirror
+from src.capabilities.home_control import projection
+
+# Words that name a kind of device. They pick domains (a boost, and a filter
+# when anything in those domains matches) but never identify an entity alone.
+DOMAIN_HINTS: Dict[str, Tuple[str, ...]] = {
+    "light": ("light",), "lamp": ("light",), "bulb": ("light",), "lighting": ("light",),
+    "chandelier": ("light",), "sconce": ("light",), "strip": ("light",),
+    "switch": ("switch",), "plug": ("switch",), "outlet": ("switch",), "socket": ("switch",),
+    "fan": ("fan", "switch"),
+    "lock": ("lock",), "deadbolt": ("lock",), "door": ("lock", "cover", "binary_sensor"),
+    "blind": ("cover",), "shade": ("cover",), "curtain": ("cover",), "shutter": ("cover",),
+    "thermostat": ("climate",), "heat": ("climate",), "heating": ("climate",), "ac": ("climate",),
+    "temperature": ("climate", "sensor"), "humidity": ("sensor",),
+    "tv": ("media_player",), "speaker": ("media_player",), "music": ("media_player",),
+    "vacuum": ("vacuum",), "sensor": ("sensor", "binary_sensor"),
+}
+
+# Request filler on top of the projection's; "switch" is a device word here.
+STOPWORDS = (projection.STOPWORDS - {"switch"}) | {
+    "could", "dim", "brighten", "open", "close", "start", "stop", "toggle", "unlock", "activate",
+    "for", "me", "with", "by"}
+
+# Dice coefficient over trigrams: "kitchn" ~ "kitchen" is 0.67, "office" ~ "offices" higher.
+FUZZY_MIN_SIMILARITY = 0.6
+
+def _stem(word: str) -> str:
+    # "lights" -> "light", "switches" -> "switch"; leave "glass", "gas" alone.
+    if word.endswith(("ches", "shes", "xes", "sses")):
+        return word[:-2]
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+def tokens(text: str) -> List[str]:
+    text = re.sub(r"\d+\s*(%|percent|degrees?|°)", " ", text.lower())  # settings, not names
+    return [_stem(w) for w in re.findall(r"[a-z0-9]+", text.replace("_", " "))]
+
+def _one_edit(a: str, b: str) -> bool:
+    """True when a and b are one dropped, added, changed or swapped letter."""
+    if abs(len(a) - len(b)) > 1 or a == b:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = next((k for k in range(len(a)) if a[k] != b[k]), len(a))
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i + 1:] or (i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:])
+
+def _trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class Resolution(NamedTuple):
+    candidates: List[str]   # entity_ids, best first
+    confident: bool         # True: the request names these devices; the drill-down LLM can be skipped
+    reason: str
+    elapsed_us: float
+
+class EntityIndex:
+    """
+    Token and trigram index over friendly_name, entity_id, area and aliases.
+
+    Tokens are weighted by IDF, so room and device names decide and generic
+    words ("light", "sensor") barely count. Query words that are not in the
+    vocabulary are matched to it by trigram similarity (typos); words that
+    match nothing ("and tell me a joke") are ignored.
+    """
+    def __init__(self, states: List[Dict], areas: Optional[Dict[str, str]] = None,
+                 aliases: Optional[Dict[str, List[str]]] = None):
+        t0 = time.perf_counter()
+        areas, aliases = areas or {}, aliases or {}
+        self.entity_ids: List[str] = []
+        self.domains: List[str] = []
+        self.postings: Dict[str, Set[int]] = {}
+        self.terms: List[Set[str]] = []   # every term of an entity
+        self.names: List[Set[str]] = []   # the terms of its own name (no area, no aliases)
+        for state in states:
+            entity_id = state.get("entity_id", "")
+            if "." not in entity_id:
+                continue
+            index = len(self.entity_ids)
+            self.entity_ids.append(entity_id)
+            domain, object_id = entity_id.split(".", 1)
+            self.domains.append(domain)
+            name = set(tokens(state.get("attributes", {}).get("friendly_name") or object_id))
+            terms = name | set(tokens(" ".join([object_id, areas.get(entity_id, ""), *aliases.get(entity_id, []),
+                                                *settings.HOME_ENTITY_ALIASES.get(entity_id, [])])))
+            self.names.append(name)
+            self.terms.append(terms)
+            for term in terms:
+                self.postings.setdefault(term, set()).add(index)
+
+        n = max(len(self.entity_ids), 1)
+        self.idf = {term: math.log(1 + n / len(ids)) for term, ids in self.postings.items()}
+        self.grams: Dict[str, List[str]] = {}
+        for term in self.postings:
+            if len(term) >= 3:
+                for gram in _trigrams(term):
+                    self.grams.setdefault(gram, []).append(term)
+        self._fuzzy: Dict[str, List[Tuple[str, float]]] = {}
+        self._hints: Dict[str, str] = {}
+        self.build_ms = (time.perf_counter() - t0) * 1000
+
+    def _hint(self, word: str) -> str:
+        """A misspelt device word ("lght") as the word itself; anything else unchanged."""
+        if word in DOMAIN_HINTS or word in self.postings or len(word) < 4:
+            return word
+        if word not in self._hints:
+            self._hints[word] = next((hint for hint in DOMAIN_HINTS if _one_edit(word, hint)), word)
+        return self._hints[word]
+
+    def _terms(self, word: str) -> List[Tuple[str, float]]:
+        """Vocabulary terms a query word stands for, with a similarity weight."""
+        if word in self.postings:
+            return [(word, 1.0)]
+        if len(word) < 4:
+            return []
+        if word not in self._fuzzy:
+            grams = _trigrams(word)
+            shared: Dict[str, int] = {}
+            for gram in grams:
+                for term in self.grams.get(gram, ()):
+                    shared[term] = shared.get(term, 0) + 1
+            scored = {term: 2 * count / (len(grams) + len(_trigrams(term))) for term, count in shared.items()}
+            # Short words share few trigrams with their typos ("poch"/"porch"); one edit away counts too.
+            for term in self.postings:
+                if _one_edit(word, term):
+                    scored[term] = max(scored.get(term, 0.0), 0.8)
+            self._fuzzy[word] = sorted((s for s in scored.items() if s[1] >= FUZZY_MIN_SIMILARITY),
+                                       key=lambda s: -s[1])[:3]
+        return self._fuzzy[word]
+
+    def resolve(self, text: str, limit: int, active: Optional[Callable[[str], bool]] = None) -> Resolution:
+        """Entities the request names; `active(entity_id)` drops unavailable ones before counting."""
+        t0 = time.perf_counter()
+        text = re.sub(r"\bswitch (on|off)\b", r"turn \1", text.lower())  # the verb, not the device
+        raw = re.findall(r"[a-z0-9]+", text)
+        words = [self._hint(w) for w in dict.fromkeys(tokens(text)) if w not in STOPWORDS]
+        hint_domains = {d for w in words for d in DOMAIN_HINTS.get(w, ())}
+        hints = [w for w in words if w in DOMAIN_HINTS and w in self.postings]
+        required = [(w, self._terms(w)) for w in words if w not in DOMAIN_HINTS]
+        required = [(w, terms) for w, terms in required if terms]  # unknown words are someone else's business
+
+        def done(candidates: List[str], confident: bool, reason: str) -> Resolution:
+            return Resolution(candidates, confident, reason, (time.perf_counter() - t0) * 1e6)
+
+        if not required:
+            return done([], False, "no device or room named")
+
+        # Only entities matching every required word count, so start from the rarest one.
+        required.sort(key=lambda r: sum(len(self.postings[term]) for term, _ in r[1]))
+        seeds = set().union(*(self.postings[term] for term, _ in required[0][1]))
+        for _, options in required[1:]:
+            if len(options) == 1:
+                seeds &= self.postings[options[0][0]]
+
+        if hint_domains:
+            seeds = {i for i in seeds if self.domains[i] in hint_domains} or seeds
+
+        # Score: IDF of each required word (scaled by typo similarity), plus a small boost for hinted domains.
+        scores: Dict[int, float] = {}
+        for i in seeds:
+            terms, score = self.terms[i], 0.0
+            for _, options in required:
+                weight = max((self.idf[term] * similarity for term, similarity in options if term in terms), default=0.0)
+                if not weight:
+                    break
+                score += weight
+            else:
+                if active is None or active(self.entity_ids[i]):
+                    score += sum(0.5 * self.idf[w] for w in hints if w in terms)
+                    scores[i] = score + (1.0 if self.domains[i] in hint_domains else 0.0)
+        full = sorted(scores, key=lambda i: (-scores[i], self.entity_ids[i]))
+
+        if not full:
+            return done([], False, "nothing matches every named word")
+        # "Porch Lock" names lock.porch outright, even though "Porch Lock 2" matches as well;
+        # "kitchen lights" (plural device word) means all of them.
+        plural = any(_stem(w) in DOMAIN_HINTS and _stem(w) != w for w in raw)
+        said = set(words) | {term for _, options in required for term, _ in options}
+        exact = [] if plural else [i for i in full if self.names[i] <= said]
+        if 0 < len(exact) <= limit:
+            return done([self.entity_ids[i] for i in exact], True, f"{len(exact)} named exactly")
+        if len(full) > limit:
+            return done([self.entity_ids[i] for i in full[:limit]], False, f"{len(full)} entities match")
+        return done([self.entity_ids[i] for i in full], True, f"{len(full)} match")
+
+class EntityResolver:
+    """
+    Process-wide resolver over the HA state mirror. The index is rebuilt
+    when the mirror's version changes (entities added/removed/renamed,
+    registries reloaded); with the mirror off, when a refetched snapshot
+    names different entities.
+    """
+    def __init__(self):
+        self._index: Optional[EntityIndex] = None
+        self._key = None
+        self.stats = {"builds": 0, "resolved": 0, "confident": 0}
+
+    def index(self, states: List[Dict]) -> EntityIndex:
+        key = state_mirror.version if settings.HA_STATE_MIRROR_ENABLED else self._fingerprint(states)
+        if self._index is None or key != self._key:
+            self._index = EntityIndex(states, state_mirror.areas, state_mirror.aliases)
+            self._key = key
+            self.stats["builds"] += 1
+            print(f"[RESOLVER] Indexed {len(self._index.entity_ids)} entities in {self._index.build_ms:.0f}ms.")
+        return self._index
+
+    @staticmethod
+    def _fingerprint(states: List[Dict]) -> int:
+        # What the index is built from, not the list's identity: CPython reuses
+        # the id() of a collected snapshot for the next one.
+        areas, aliases = state_mirror.areas, state_mirror.aliases
+        return hash(tuple((s.get("entity_id"), s.get("attributes", {}).get("friendly_name"),
+                           areas.get(s.get("entity_id")), tuple(aliases.get(s.get("entity_id"), ())))
+                          for s in states))
+
+    def resolve(self, text: str, states: List[Dict]) -> Resolution:
+        lookup = state_mirror.get if settings.HA_STATE_MIRROR_ENABLED else {s["entity_id"]: s for s in states}.get
+
+        def active(entity_id: str) -> bool:
+            state = lookup(entity_id)
+            return state is not None and str(state.get("state", "unknown")).lower() not in projection.INACTIVE_STATES
+
+        resolution = self.index(states).resolve(text, settings.HOME_RESOLVER_MAX_CANDIDATES, active)
+        self.stats["resolved"] += 1
+        self.stats["confident"] += resolution.confident
+        return resolution
+
+resolver = EntityResolver()
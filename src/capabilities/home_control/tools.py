@@ -1,69 +1,308 @@
 # %% src/capabilities/home_control/tools.py
 import json
-from typing import Optional, Any, Dict
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Callable, Optional, Any, Dict, List, Tuple
 from langchain_core.tools import tool
-from src.core.iot import ha_client
+from langgraph.prebuilt import InjectedState
+from src.core.config import settings
+from src.core.iot import ha_client, async_ha_client, state_mirror, actuation_metrics, StateWaiter
+from src.utils.async_tools import async_variant
+from src.capabilities.home_control.projection import project_entities, request_text
 
+# --- SHARED LOGIC (sync + async tools) ---
+def _active_domains(states) -> str:
+    if isinstance(states, dict):
+        return json.dumps(states)
+    if not states: return "[]"
+
+    domains = set()
+    for s in states:
+        state_val = s.get("state", "unknown")
+        if state_val.lower() in ["unavailable", "unknown"]:
+            continue
+
+        entity_id = s.get("entity_id", "")
+        if "." in entity_id:
+            d = entity_id.split(".")[0]
+            if d not in ["automation", "script", "update", "zone", "person", "scene"]:
+                domains.add(d)
+
+    return json.dumps(list(sorted(domains)))
+
+def _entities_in_domain(states, domain: str, state: Optional[Dict[str, Any]]) -> str:
+    if isinstance(states, dict):
+        return json.dumps(states)
+    return project_entities(states, domain, request_text(state))
+
+def _service_request(entity_id: str, parameters: Optional[Dict[str, Any]]):
+    """Returns (domain, service_data) or raises ValueError for a malformed entity_id."""
+    # Extract domain
+    if "." not in entity_id:
+        raise ValueError(f"Invalid entity_id format: {entity_id}")
+
+    domain = entity_id.split(".")[0]
+
+    # Prepare Payload
+    service_data = {"entity_id": entity_id}
+
+    # Safely merge dictionary parameters
+    if parameters and isinstance(parameters, dict):
+        service_data.update(parameters)
+    return domain, service_data
+
+# --- DEVICE CONTROL ---
+# Commands are grouped by (domain, service, parameters): each group is one
+# service call with an entity_id list. Independent groups run concurrently;
+# groups that share an entity run in the order given.
+#
+# A command counts as confirmed once the entity is seen in the state it
+# should end up in: in the states HA returns from the call (devices that
+# confirm synchronously), in the mirror already, or in a state_changed
+# event, waited for up to HOME_CONFIRM_TIMEOUT_S for the domain (Z-Wave
+# locks, covers). get_state is only polled while the mirror isn't live.
+
+# Service -> states that confirm it; a transition ("locking", "opening") means
+# the device is acting. Other services, and calls with parameters ("turn_on"
+# at 40% on a light that is already on), also need last_updated to move.
+SERVICE_STATES = {
+    "turn_on": ("on",), "turn_off": ("off",),
+    "lock": ("locked", "locking"), "unlock": ("unlocked", "unlocking"),
+    "open_cover": ("open", "opening"), "close_cover": ("closed", "closing"),
+}
+
+def _expectation(service: str, before: Optional[Dict[str, Any]],
+                 parameterized: bool) -> Callable[[Dict[str, Any]], bool]:
+    targets = SERVICE_STATES.get(service)
+    stamp = (before or {}).get("last_updated")
+
+    def check(state: Dict[str, Any]) -> bool:
+        if "state" not in state:  # {"error": ...} from a failed read
+            return False
+        if targets and state["state"] not in targets:
+            return False
+        return (bool(targets) and not parameterized) or state.get("last_updated") != stamp
+    return check
+
+def _confirm_timeout(domain: str) -> float:
+    timeouts = settings.HOME_CONFIRM_TIMEOUT_S
+    return timeouts.get(domain, timeouts.get("default", 3.0))
+
+def _command_groups(commands: List[Dict[str, Any]]):
+    """Returns ({(domain, service, parameters): service_data}, [errors])."""
+    groups: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    errors = []
+    for command in commands:
+        entity_id, service = command.get("entity_id", ""), command.get("service", "")
+        try:
+            domain, service_data = _service_request(entity_id, command.get("parameters"))
+        except ValueError as e:
+            errors.append({"entity_id": entity_id, "status": "error", "message": str(e)})
+            continue
+        del service_data["entity_id"]
+        key = (domain, service, json.dumps(service_data, sort_keys=True, default=str))
+        group = groups.setdefault(key, {"entity_id": [], **service_data})
+        if entity_id not in group["entity_id"]:
+            group["entity_id"].append(entity_id)
+    return groups, errors
+
+def _watch(service: str, service_data: Dict[str, Any], live: bool, loop=None) -> Dict[str, StateWaiter]:
+    """One waiter per entity, registered BEFORE the call so no event is missed (detached if not live)."""
+    parameterized = any(key != "entity_id" for key in service_data)
+    waiters = {}
+    for entity_id in service_data["entity_id"]:
+        check = _expectation(service, state_mirror.get(entity_id), parameterized)
+        waiters[entity_id] = (state_mirror.expect(entity_id, check, loop) if live
+                              else StateWaiter(entity_id, check, loop))
+    return waiters
+
+def _failed(response) -> bool:
+    return isinstance(response, dict) and "error" in response
+
+def _offer_known(waiters: Dict[str, StateWaiter], response, live: bool):
+    """
+    Synchronous confirmation: the states HA returned, or the live mirror
+    already shows (not live, it holds a REST snapshot from before the call).
+    """
+    changed = {s.get("entity_id"): s for s in response if isinstance(s, dict)} if isinstance(response, list) else {}
+    for entity_id, waiter in waiters.items():
+        for state in (changed.get(entity_id), state_mirror.get(entity_id) if live else None):
+            if state:
+                waiter.offer(state)
+
+def _group_results(key, service_data: Dict[str, Any], response, waiters: Dict[str, StateWaiter],
+                   t0: float, polled: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """`polled`: states read back over REST while the mirror wasn't live (nothing waited for events)."""
+    domain, service, _ = key
+    if _failed(response):
+        return [{"entity_id": e, "status": "error", "message": response["error"]} for e in service_data["entity_id"]]
+    params = {k: v for k, v in service_data.items() if k != "entity_id"}
+    results = []
+    for entity_id, waiter in waiters.items():
+        state = waiter.state or (polled or {}).get(entity_id) or state_mirror.get(entity_id)
+        if state is not None and "state" not in state:
+            state = None
+        latency = waiter.at - t0 if waiter.state else None
+        if latency is not None:
+            actuation_metrics.observe(entity_id, latency, "confirmed")
+        else:
+            actuation_metrics.count(entity_id, "unconfirmed")
+            how = f"within {_confirm_timeout(domain):g}s" if polled is None else "by the state read back"
+            print(f"[HA] {domain}.{service} on {entity_id} not confirmed {how} "
+                  f"(state: {state.get('state') if state else 'unknown'}).")
+        results.append({"entity_id": entity_id, "status": "success", "executed": f"{domain}.{service}",
+                        "params": params, "current_state": state.get("state") if state else None,
+                        "confirmed": latency is not None,
+                        "latency_ms": round(latency * 1000) if latency is not None else None})
+    return results
+
+def _waves(calls: List[Tuple]) -> List[List[Tuple]]:
+    """Groups run concurrently unless they share an entity; then they keep the order they were asked in."""
+    waves: List[List[Tuple]] = []
+    placed: Dict[str, int] = {}  # entity_id -> wave of its latest call
+    for call in calls:
+        wave = max((placed[e] + 1 for e in call[1]["entity_id"] if e in placed), default=0)
+        if wave == len(waves):
+            waves.append([])
+        waves[wave].append(call)
+        for entity_id in call[1]["entity_id"]:
+            placed[entity_id] = wave
+    return waves
+
+def _run_group(call) -> List[Dict[str, Any]]:
+    (domain, service, _), service_data = call
+    live = settings.HA_STATE_MIRROR_ENABLED and state_mirror.live
+    waiters = _watch(service, service_data, live)
+    polled = None if live else {}
+    t0 = time.perf_counter()
+    try:
+        response = ha_client.call_service(domain, service, service_data)
+        if not _failed(response):
+            _offer_known(waiters, response, live)
+            deadline = t0 + _confirm_timeout(domain)
+            for waiter in waiters.values():
+                if live:
+                    waiter.wait(deadline - time.perf_counter())
+                elif waiter.state is None:
+                    polled[waiter.entity_id] = ha_client.get_state(waiter.entity_id)
+                    waiter.offer(polled[waiter.entity_id])
+    finally:
+        for waiter in waiters.values():
+            state_mirror.forget(waiter)
+    return _group_results(call[0], service_data, response, waiters, t0, polled)
+
+async def _arun_group(call) -> List[Dict[str, Any]]:
+    (domain, service, _), service_data = call
+    live = settings.HA_STATE_MIRROR_ENABLED and state_mirror.live
+    waiters = _watch(service, service_data, live, asyncio.get_running_loop())
+    polled = None if live else {}
+    t0 = time.perf_counter()
+    try:
+        response = await async_ha_client.call_service(domain, service, service_data)
+        if not _failed(response):
+            _offer_known(waiters, response, live)
+            if live:
+                timeout = _confirm_timeout(domain) - (time.perf_counter() - t0)
+                await asyncio.gather(*(w.await_(timeout) for w in waiters.values()))
+            else:
+                pending = [w for w in waiters.values() if w.state is None]
+                states = await asyncio.gather(*(async_ha_client.get_state(w.entity_id) for w in pending))
+                for waiter, state in zip(pending, states):
+                    polled[waiter.entity_id] = state
+                    waiter.offer(state)
+    finally:
+        for waiter in waiters.values():
+            state_mirror.forget(waiter)
+    return _group_results(call[0], service_data, response, waiters, t0, polled)
+
+def _control(commands: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    groups, errors = _command_groups(commands)
+    results = []
+    for wave in _waves(list(groups.items())):
+        if len(wave) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(wave), settings.HOME_CONTROL_MAX_PARALLEL)) as pool:
+                outcomes = list(pool.map(_run_group, wave))
+        else:
+            outcomes = [_run_group(call) for call in wave]
+        for outcome in outcomes:
+            results += outcome
+    return results + errors
+
+async def _acontrol(commands: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    groups, errors = _command_groups(commands)
+    results = []
+    limit = asyncio.Semaphore(settings.HOME_CONTROL_MAX_PARALLEL)
+
+    async def run(call):
+        async with limit:
+            return await _arun_group(call)
+
+    for wave in _waves(list(groups.items())):
+        for outcome in await asyncio.gather(*(run(call) for call in wave)):
+            results += outcome
+    return results + errors
+
+def _single_result(results: List[Dict[str, Any]]) -> str:
+    """control_device's original response shape."""
+    result = results[0]
+    if result["status"] != "success":
+        return json.dumps({"status": "error", "message": result["message"]})
+    return json.dumps({
+        "status": "success",
+        "executed": result["executed"],
+        "params": {"entity_id": result["entity_id"], **result["params"]},
+        "current_state": result["current_state"],
+        "confirmed": result["confirmed"],
+        "latency_ms": result["latency_ms"]
+    })
+
+def _batch_result(results: List[Dict[str, Any]]) -> str:
+    failed = sum(r["status"] != "success" for r in results)
+    status = "success" if not failed else "error" if failed == len(results) else "partial"
+    return json.dumps({"status": status, "results": results})
+
+# --- TOOLS ---
 @tool
 def get_active_domains() -> str:
     """
     Returns a list of active Home Assistant domains (e.g., ['light', 'switch', 'sensor']).
     """
     try:
-        states = ha_client.get_all_states()
-        if not states: return "[]"
-        
-        domains = set()
-        for s in states:
-            state_val = s.get("state", "unknown")
-            if state_val.lower() in ["unavailable", "unknown"]:
-                continue
-                
-            entity_id = s.get("entity_id", "")
-            if "." in entity_id:
-                d = entity_id.split(".")[0]
-                if d not in ["automation", "script", "update", "zone", "person", "scene"]:
-                    domains.add(d)
-        
-        return json.dumps(list(sorted(domains)))
+        return _active_domains(state_mirror.states())
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
+@async_variant(get_active_domains)
+async def aget_active_domains() -> str:
+    try:
+        return _active_domains(await state_mirror.astates())
     except Exception as e:
         return json.dumps({"error": str(e)})
 
 @tool
-def list_entities_in_domain(domain: str) -> str:
+def list_entities_in_domain(domain: str, state: Annotated[Optional[dict], InjectedState] = None) -> str:
     """
-    Lists all active entities within a specific domain.
+    Lists the active entities within a specific domain (id, name, state, controllable attributes).
     """
+    # `state` is the graph state, injected by ToolNode (hidden from the model) for relevance ranking.
     try:
-        states = ha_client.get_all_states()
-        matches = []
-        
-        for s in states:
-            entity_id = s.get("entity_id", "")
-            if not entity_id.startswith(f"{domain}."):
-                continue
-                
-            state_val = s.get("state", "unknown")
-            if state_val.lower() in ["unavailable", "unknown"]:
-                continue
-            
-            obj = {
-                "id": entity_id,
-                "name": s.get("attributes", {}).get("friendly_name", entity_id),
-                "state": state_val,
-                "attributes": s.get("attributes", {}) 
-            }
-            matches.append(obj)
-            
-        return json.dumps(matches, indent=2)
+        return _entities_in_domain(state_mirror.states(domain), domain, state)
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
+@async_variant(list_entities_in_domain)
+async def alist_entities_in_domain(domain: str, state: Annotated[Optional[dict], InjectedState] = None) -> str:
+    try:
+        return _entities_in_domain(await state_mirror.astates(domain), domain, state)
     except Exception as e:
         return json.dumps({"error": str(e)})
 
 @tool
 def control_device(
-    entity_id: str, 
-    service: str, 
-    parameters: Optional[Dict[str, Any]] = None 
+    entity_id: str,
+    service: str,
+    parameters: Optional[Dict[str, Any]] = None
 ) -> str:
     """
     Sends a command to a device.
@@ -72,33 +311,37 @@ def control_device(
     - parameters: Dictionary of arguments (e.g., {"brightness_pct": 50})
     """
     try:
-        # Extract domain
-        if "." not in entity_id:
-            return json.dumps({"error": f"Invalid entity_id format: {entity_id}"})
-            
-        domain = entity_id.split(".")[0]
-        
-        # Prepare Payload
-        service_data = {"entity_id": entity_id}
-        
-        # Safely merge dictionary parameters
-        if parameters and isinstance(parameters, dict):
-            service_data.update(parameters)
-
-        # Call Service
-        result = ha_client.call_service(domain, service, service_data)
-        
-        if "error" in result:
-             return json.dumps({"status": "error", "message": result['error']})
-
-        # Verification
-        final_state = ha_client.get_state(entity_id)
-        return json.dumps({
-            "status": "success", 
-            "executed": f"{domain}.{service}",
-            "params": service_data,
-            "current_state": final_state.get("state")
-        })
+        return _single_result(_control([{"entity_id": entity_id, "service": service, "parameters": parameters}]))
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
+@async_variant(control_device)
+async def acontrol_device(
+    entity_id: str,
+    service: str,
+    parameters: Optional[Dict[str, Any]] = None
+) -> str:
+    try:
+        return _single_result(await _acontrol([{"entity_id": entity_id, "service": service, "parameters": parameters}]))
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
+@tool
+def control_devices(commands: List[Dict[str, Any]]) -> str:
+    """
+    Sends commands to several devices at once. Use it instead of repeated control_device calls.
+    - commands: list of {"entity_id": ..., "service": ..., "parameters": {...}}
+      e.g. [{"entity_id": "light.kitchen", "service": "turn_off"},
+            {"entity_id": "lock.front_door", "service": "lock"}]
+    """
+    try:
+        return _batch_result(_control(commands))
+    except Exception as e:
+        return json.dumps({"error": str(e)})
 
+@async_variant(control_devices)
+async def acontrol_devices(commands: List[Dict[str, Any]]) -> str:
+    try:
+        return _batch_result(await _acontrol(commands))
     except Exception as e:
-        return json.dumps({"error": str(e)})
\ No newline at end of file
+        return json.dumps({"error": str(e)})
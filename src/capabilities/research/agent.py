@@ -9,12 +9,14 @@ Your job is to find information in the Knowledge Base.
 Always search before answering. Quote the document source if available.
 """
 
-model = get_llm(temperature=0)
 tools = [search_knowledge_base]
 
-research_agent = create_agent(
-    model=model,
-    tools=tools,
-    system_prompt=SystemMessage(content=SYSTEM_PROMPT),
-    middleware=[ToolEnforcementMiddleware(strict_mode=True)]
-)
\ No newline at end of file
+def build_research_agent():
+    """Builds the compiled agent. Called lazily by the capability registry."""
+    model = get_llm(temperature=0, role="research")
+    return create_agent(
+        model=model,
+        tools=tools,
+        system_prompt=SystemMessage(content=SYSTEM_PROMPT),
+        middleware=[ToolEnforcementMiddleware(strict_mode=True)]
+    )
\ No newline at end of file
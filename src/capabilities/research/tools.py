@@ -1,6 +1,16 @@
 # src/capabilities/research/tools.py
 from langchain_core.tools import tool
 from src.core.vector import get_vector_store
+from src.utils.async_tools import async_variant
+
+def _format_results(results) -> str:
+    # Format the results strictly for the LLM to read
+    return "\n\n".join(
+        f"--- Document: {doc.metadata.get('title', 'Untitled')} ---\n"
+        f"Source: {doc.metadata.get('source', 'Unknown')}\n"
+        f"Content: {doc.page_content}"
+        for doc in results
+    )
 
 @tool
 def search_knowledge_base(query: str) -> str:
@@ -20,14 +30,21 @@ def search_knowledge_base(query: str) -> str:
         if not results:
             return "No relevant documents found in the knowledge base."
             
-        # Format the results strictly for the LLM to read
-        formatted_results = "\n\n".join(
-            f"--- Document: {doc.metadata.get('title', 'Untitled')} ---\n"
-            f"Source: {doc.metadata.get('source', 'Unknown')}\n"
-            f"Content: {doc.page_content}"
-            for doc in results
-        )
-        return formatted_results
+        return _format_results(results)
+
+    except Exception as e:
+        return f"Error searching knowledge base: {e}"
+
+@async_variant(search_knowledge_base)
+async def asearch_knowledge_base(query: str) -> str:
+    try:
+        vector_store = get_vector_store(collection_name="personal_knowledge")
+        results = await vector_store.asimilarity_search(query, k=5)
+
+        if not results:
+            return "No relevant documents found in the knowledge base."
+
+        return _format_results(results)
 
     except Exception as e:
-        return f"Error searching knowledge base: {e}"
\ No newline at end of file
+        return f"Error searching knowledge base: {e}"
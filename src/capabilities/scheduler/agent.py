@@ -57,7 +57,6 @@ gantt
 2. Report findings.
 """
 
-model = get_llm(temperature=0)
 tools = [
     get_calendar_events, 
     get_weather_report, 
@@ -65,9 +64,12 @@ tools = [
     check_maintenance_status
 ]
 
-scheduler_agent = create_agent(
-    model=model,
-    tools=tools,
-    system_prompt=SystemMessage(content=SYSTEM_PROMPT),
-    middleware=[ToolEnforcementMiddleware(strict_mode=True)]
-)
\ No newline at end of file
+def build_scheduler_agent():
+    """Builds the compiled agent. Called lazily by the capability registry."""
+    model = get_llm(temperature=0)
+    return create_agent(
+        model=model,
+        tools=tools,
+        system_prompt=SystemMessage(content=SYSTEM_PROMPT),
+        middleware=[ToolEnforcementMiddleware(strict_mode=True)]
+    )
\ No newline at end of file
@@ -21,12 +21,14 @@ pie title Model Storage Usage
 3. **Action**: If asked to list things, call the appropriate list tool immediately.
 """
 
-model = get_llm(temperature=0)
 tools = [list_ollama_models]
 
-system_admin_agent = create_agent(
-    model=model,
-    tools=tools,
-    system_prompt=SystemMessage(content=SYSTEM_PROMPT),
-    middleware=[ToolEnforcementMiddleware(strict_mode=True)]
-)
\ No newline at end of file
+def build_system_admin_agent():
+    """Builds the compiled agent. Called lazily by the capability registry."""
+    model = get_llm(temperature=0)
+    return create_agent(
+        model=model,
+        tools=tools,
+        system_prompt=SystemMessage(content=SYSTEM_PROMPT),
+        middleware=[ToolEnforcementMiddleware(strict_mode=True)]
+    )
\ No newline at end of file
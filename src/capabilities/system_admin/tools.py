@@ -1,6 +1,9 @@
+import asyncio
 import requests
 from langchain_core.tools import tool
 from src.core.config import settings
+from src.core.llm import get_ollama_clients
+from src.utils.async_tools import async_variant
 
 def _format_size(size_bytes: int) -> str:
     """Helper to format bytes into GB/MB."""
@@ -8,6 +11,27 @@ def _format_size(size_bytes: int) -> str:
         return f"{size_bytes / (1024**3):.2f} GB"
     return f"{size_bytes / (1024**2):.2f} MB"
 
+def _format_models(data: dict) -> str:
+    models = data.get("models", [])
+    if not models:
+        return "No models found on the Ollama instance."
+
+    # Format for readability
+    output = ["### AVAILABLE MODELS"]
+    for m in models:
+        name = m.get("name") or m.get("model") or "Unknown"
+        size = _format_size(m.get("size", 0))
+        details = m.get("details", {})
+        family = details.get("family", "Unknown")
+        param_size = details.get("parameter_size", "?")
+        quant = details.get("quantization_level", "?")
+
+        output.append(f"- **{name}**")
+        output.append(f"  - Size: {size}")
+        output.append(f"  - Type: {family} ({param_size} params, {quant})")
+
+    return "\n".join(output)
+
 @tool
 def list_ollama_models() -> str:
     """
@@ -21,25 +45,19 @@ def list_ollama_models() -> str:
         response.raise_for_status()
         data = response.json()
         
-        models = data.get("models", [])
-        if not models:
-            return "No models found on the Ollama instance."
-            
-        # Format for readability
-        output = ["### AVAILABLE MODELS"]
-        for m in models:
-            name = m.get("name", "Unknown")
-            size = _format_size(m.get("size", 0))
-            details = m.get("details", {})
-            family = details.get("family", "Unknown")
-            param_size = details.get("parameter_size", "?")
-            quant = details.get("quantization_level", "?")
-            
-            output.append(f"- **{name}**")
-            output.append(f"  - Size: {size}")
-            output.append(f"  - Type: {family} ({param_size} params, {quant})")
-            
-        return "\n".join(output)
+        return _format_models(data)
+
+    except Exception as e:
+        return f"FAILURE: Could not connect to Ollama at {settings.OLLAMA_BASE_URL}. Error: {e}"
+
+@async_variant(list_ollama_models)
+async def alist_ollama_models() -> str:
+    # Same pooled connection as the chat models (/api/tags via the Ollama client).
+    _, client = get_ollama_clients(settings.OLLAMA_BASE_URL)
+
+    try:
+        response = await asyncio.wait_for(client.list(), timeout=5)
+        return _format_models(response.model_dump())
 
     except Exception as e:
-        return f"FAILURE: Could not connect to Ollama at {settings.OLLAMA_BASE_URL}. Error: {e}"
\ No newline at end of file
+        return f"FAILURE: Could not connect to Ollama at {settings.OLLAMA_BASE_URL}. Error: {e}"
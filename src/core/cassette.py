@@ -0,0 +1,311 @@
+# src/core/cassette.py
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from src.core.config import settings
+
+# Only model traffic is recorded; /api/tags, /api/ps etc. pass straight through.
+RECORDED_PATHS = ("/api/chat", "/api/generate", "/api/embed", "/api/embeddings")
+CHARS_PER_TOKEN = 4
+
+def _canonical(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Request body without per-run noise (tool call ids are fresh uuids every run)."""
+    body = json.loads(json.dumps(body))
+    for message in body.get("messages") or []:
+        message.pop("tool_call_id", None)
+        for call in message.get("tool_calls") or []:
+            call.pop("id", None)
+    return body
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:12]
+
+def _prompt_parts(body: Dict[str, Any]) -> List[str]:
+    """One short fingerprint per prompt element, to locate where two prompts diverge."""
+    if "messages" in body:
+        return [f"{m.get('role')}:{_digest(json.dumps(m, sort_keys=True))}" for m in body["messages"]]
+    inputs = body.get("input", body.get("prompt", ""))
+    return [_digest(json.dumps(i)) for i in (inputs if isinstance(inputs, list) else [inputs])]
+
+def _lane(path: str, body: Dict[str, Any]) -> str:
+    """Requests that are interchangeable on divergence: same endpoint, model, tools and format."""
+    tools = sorted(t.get("function", {}).get("name", "") for t in body.get("tools") or [])
+    return f"{path}|{body.get('model')}|{','.join(tools)}|{bool(body.get('format'))}"
+
+class Cassette:
+    """
+    Records every Ollama request/response to a JSONL file, or replays them.
+
+    Replay matches on a hash of the canonical request body. When the prompt
+    changed since recording (edited prompt, different tool output, bigger
+    window) the next unused recording from the same lane is served instead
+    and a divergence warning says where the prompts split and how their size
+    moved, so prompt growth shows up in replay runs.
+    """
+    def __init__(self, path: str, mode: str, replay_timing: bool = False):
+        self.path = path
+        self.mode = mode
+        self.replay_timing = replay_timing
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.entries: List[Dict[str, Any]] = []
+        self.turns: List[Dict[str, Any]] = []
+        self._by_key: Dict[str, deque] = {}
+        self._by_lane: Dict[str, deque] = {}
+        self._used = set()
+        self.stats = {"recorded": 0, "hits": 0, "diverged": 0, "misses": 0, "prompt_chars_delta": 0}
+        if mode == "replay":
+            self._load()
+
+    # --- RECORD ---
+    def _append(self, record: Dict[str, Any]):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def record_turn(self, thread_id: str, text: str):
+        """Marks a user turn, so a replay can drive the graph with the same inputs."""
+        self._append({"kind": "turn", "ts": time.time(), "thread_id": thread_id, "text": text})
+
+    def _entry(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        canonical = _canonical(body)
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        return {
+            "kind": "request",
+            "seq": seq,
+            "path": path,
+            "key": _digest(json.dumps([path, canonical], sort_keys=True)),
+            "lane": _lane(path, body),
+            "parts": _prompt_parts(canonical),
+            "prompt_chars": len(json.dumps(canonical.get("messages", canonical.get("input", "")))),
+        }
+
+    def finish_recording(self, entry: Dict[str, Any], status: int, content_type: str,
+                         data: bytes, ttfb_s: float, elapsed_s: float):
+        text = data.decode("utf-8", errors="replace")
+        final = {}
+        for line in reversed(text.strip().splitlines()):
+            try:
+                final = json.loads(line)
+                break
+            except ValueError:
+                continue
+        entry.update({
+            "status": status,
+            "content_type": content_type,
+            "body": text,
+            "prompt_eval_count": final.get("prompt_eval_count"),
+            "eval_count": final.get("eval_count"),
+            "ttfb_s": round(ttfb_s, 4),
+            "elapsed_s": round(elapsed_s, 4),
+        })
+        self._append(entry)
+        with self._lock:
+            self.stats["recorded"] += 1
+
+    # --- REPLAY ---
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            print(f"[CASSETTE] {self.path} not found. Every model request will fail.")
+            records = []
+        for record in records:
+            if record.get("kind") == "turn":
+                self.turns.append(record)
+                continue
+            index = len(self.entries)
+            self.entries.append(record)
+            self._by_key.setdefault(record["key"], deque()).append(index)
+            self._by_lane.setdefault(record["lane"], deque()).append(index)
+        print(f"[CASSETTE] Replaying {len(self.entries)} recorded requests ({len(self.turns)} user turns).")
+
+    def _take(self, queue: Optional[deque]) -> Optional[int]:
+        while queue:
+            index = queue.popleft()
+            if index not in self._used:
+                self._used.add(index)
+                return index
+        return None
+
+    def match(self, path: str, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        probe = self._entry(path, body)
+        with self._lock:
+            index = self._take(self._by_key.get(probe["key"]))
+            if index is not None:
+                self.stats["hits"] += 1
+                return self.entries[index]
+
+            index = self._take(self._by_lane.get(probe["lane"]))
+            if index is None:
+                self.stats["misses"] += 1
+                print(f"[CASSETTE] No recording left for request #{probe['seq']} ({probe['lane']}).")
+                return None
+            recorded = self.entries[index]
+            self.stats["diverged"] += 1
+            self.stats["prompt_chars_delta"] += probe["prompt_chars"] - recorded["prompt_chars"]
+
+        parts, old = probe["parts"], recorded["parts"]
+        split = next((i for i, (a, b) in enumerate(zip(parts, old)) if a != b), min(len(parts), len(old)))
+        where = parts[split].split(":")[0] if split < len(parts) and ":" in parts[split] else "end"
+        before, now = recorded["prompt_chars"] // CHARS_PER_TOKEN, probe["prompt_chars"] // CHARS_PER_TOKEN
+        print(
+            f"[CASSETTE] Prompt diverged at request #{probe['seq']} ({path}, {recorded['lane'].split('|')[2] or 'no tools'}): "
+            f"element {split} ({where}) differs, {len(old)} -> {len(parts)} elements, "
+            f"~{before} -> ~{now} tokens ({now - before:+d}). Serving recording #{recorded['seq']}."
+        )
+        return recorded
+
+    def replay_response(self, request: httpx.Request):
+        """(response, recorded model latency in seconds) for a request."""
+        body = json.loads(request.content or b"{}")
+        entry = self.match(request.url.path, body)
+        if entry is None:
+            raise httpx.ConnectError(f"[CASSETTE] No recorded response for {request.url.path}", request=request)
+        response = httpx.Response(
+            entry["status"],
+            headers={"content-type": entry["content_type"]},
+            content=entry["body"].encode("utf-8"),
+            request=request,
+        )
+        return response, (entry.get("elapsed_s") or 0) if self.replay_timing else 0
+
+    def summary(self) -> str:
+        s = self.stats
+        if self.mode == "record":
+            return f"[CASSETTE] Recorded {s['recorded']} requests to {self.path}."
+        return (f"[CASSETTE] Replay: {s['hits']} exact, {s['diverged']} diverged, {s['misses']} missing; "
+                f"prompt size drift {s['prompt_chars_delta'] // CHARS_PER_TOKEN:+d} tokens.")
+
+# --- TRANSPORTS ---
+class _RecordingStream(httpx.SyncByteStream):
+    """Passes the (streamed) body through untouched and records it once fully read."""
+    def __init__(self, inner, on_close):
+        self._inner, self._on_close, self._chunks = inner, on_close, []
+
+    def __iter__(self):
+        for chunk in self._inner:
+            self._chunks.append(chunk)
+            yield chunk
+
+    def close(self):
+        self._inner.close()
+        self._on_close(b"".join(self._chunks))
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, inner, on_close):
+        self._inner, self._on_close, self._chunks = inner, on_close, []
+
+    async def __aiter__(self):
+        async for chunk in self._inner:
+            self._chunks.append(chunk)
+            yield chunk
+
+    async def aclose(self):
+        await self._inner.aclose()
+        self._on_close(b"".join(self._chunks))
+
+def _recorded(request: httpx.Request) -> bool:
+    return request.method == "POST" and request.url.path in RECORDED_PATHS
+
+class CassetteTransport(httpx.BaseTransport):
+    def __init__(self, cassette: Cassette, inner: httpx.BaseTransport):
+        self.cassette, self.inner = cassette, inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if not _recorded(request):
+            return self.inner.handle_request(request)
+
+        if self.cassette.mode == "replay":
+            response, delay = self.cassette.replay_response(request)
+            time.sleep(delay)
+            return response
+
+        entry = self.cassette._entry(request.url.path, json.loads(request.content or b"{}"))
+        t0 = time.perf_counter()
+        response = self.inner.handle_request(request)
+        ttfb = time.perf_counter() - t0
+
+        def on_close(data: bytes):
+            self.cassette.finish_recording(entry, response.status_code, response.headers.get("content-type", ""),
+                                           data, ttfb, time.perf_counter() - t0)
+
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_RecordingStream(response.stream, on_close),
+                              extensions=response.extensions, request=request)
+
+    def close(self):
+        self.inner.close()
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette, inner: httpx.AsyncBaseTransport):
+        self.cassette, self.inner = cassette, inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not _recorded(request):
+            return await self.inner.handle_async_request(request)
+
+        if self.cassette.mode == "replay":
+            response, delay = self.cassette.replay_response(request)
+            await asyncio.sleep(delay)
+            return response
+
+        entry = self.cassette._entry(request.url.path, json.loads(request.content or b"{}"))
+        t0 = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        ttfb = time.perf_counter() - t0
+
+        def on_close(data: bytes):
+            self.cassette.finish_recording(entry, response.status_code, response.headers.get("content-type", ""),
+                                           data, ttfb, time.perf_counter() - t0)
+
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_AsyncRecordingStream(response.stream, on_close),
+                              extensions=response.extensions, request=request)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+# --- SINGLETON ---
+_cassette: Optional[Cassette] = None
+
+def get_cassette() -> Optional[Cassette]:
+    """The process-wide cassette, or None when LLM_CASSETTE_MODE is off."""
+    global _cassette
+    if settings.LLM_CASSETTE_MODE not in ("record", "replay"):
+        return None
+    if _cassette is None:
+        _cassette = Cassette(settings.LLM_CASSETTE_PATH, settings.LLM_CASSETTE_MODE,
+                             settings.LLM_CASSETTE_REPLAY_TIMING)
+    return _cassette
+
+def transport_kwargs(limits: httpx.Limits) -> Dict[str, Dict[str, Any]]:
+    """
+    Extra httpx.Client / AsyncClient kwargs: {"sync": {...}, "async": {...}}.
+    Always a transport (the connection pool), so clients given the same
+    kwargs share one pool.
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return {"sync": {"transport": httpx.HTTPTransport(limits=limits)},
+                "async": {"transport": httpx.AsyncHTTPTransport(limits=limits)}}
+    return {
+        "sync": {"transport": CassetteTransport(cassette, httpx.HTTPTransport(limits=limits))},
+        "async": {"transport": AsyncCassetteTransport(cassette, httpx.AsyncHTTPTransport(limits=limits))},
+    }
+
+def record_turn(thread_id: str, text: str):
+    """Called by the entry points (main.py, Chainlit) for every user message."""
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == "record":
+        cassette.record_turn(thread_id, text)
@@ -1,5 +1,6 @@
 # src/core/config.py
 import os
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import computed_field
 
@@ -23,13 +24,160 @@ class Settings(BaseSettings):
     # qwen2.5:14b - recommended starting point, llama3.1:8b for logic, llama3.2:latest for speed
     DEFAULT_MODEL: str = "qwen2.5:14b"
     EMBEDDING_MODEL: str = "nomic-embed-text"
+    # Per-role models; empty = DEFAULT_MODEL. A 1-3B model is enough for the router,
+    # e.g. MODEL_ROLES='{"router": "llama3.2:3b", "home_scout": "llama3.2:3b"}'
+    MODEL_ROLES: Dict[str, str] = {
+        "router": "",         # Supervisor JSON routing decision
+        "home_scout": "",     # Home-control drill-down (pick the domain)
+        "home_executor": "",  # Home-control executor (pick entity + service)
+        "sql": "",            # Finance agent (SQL generation)
+        "research": "",       # Document search + answer
+        "chat": "",           # General chat
+        "summary": "",        # Rolling context summary
+    }
+    # Tried in order when a role's model fails (not pulled, server error); DEFAULT_MODEL is always last.
+    # e.g. MODEL_FALLBACKS='{"router": ["llama3.2:1b"]}'
+    MODEL_FALLBACKS: Dict[str, List[str]] = {}
+
+    # OLLAMA CONNECTION POOL (shared by every cached model client)
+    OLLAMA_POOL_MAX_CONNECTIONS: int = 20
+    OLLAMA_POOL_MAX_KEEPALIVE: int = 10
+    OLLAMA_POOL_KEEPALIVE_EXPIRY: float = 60.0
+    
+    # HOME ASSISTANT REST CLIENT (pooled keep-alive session; GETs retried with exponential backoff)
+    HA_HTTP_POOL_SIZE: int = 10
+    HA_HTTP_TIMEOUT_S: float = 10.0
+    HA_HTTP_RETRIES: int = 2
+    HA_HTTP_BACKOFF_S: float = 0.2       # 0.2s, 0.4s, ...
+
+    # HOME ASSISTANT STATE MIRROR
+    # Entity states are mirrored in memory from the WebSocket API instead of fetched per tool call.
+    HA_STATE_MIRROR_ENABLED: bool = True
+    HA_STATE_TTL_S: float = 10.0         # REST snapshot lifetime while the WebSocket is down
+    HA_STATE_MIRROR_WAIT_S: float = 3.0  # First read waits this long for the WebSocket load
+    HA_WS_HEARTBEAT_S: float = 30.0
+    # Entity listings in the home-control prompts: compact tables, most relevant rows first, capped at this.
+    HOME_ENTITY_TOKEN_BUDGET: int = 1500
+    # Resolve device names from a local index (names, areas, aliases) and skip the drill-down LLM
+    # when at most HOME_RESOLVER_MAX_CANDIDATES entities match. Extra aliases: {"lock.front_door": ["deadbolt"]}.
+    HOME_RESOLVER_ENABLED: bool = True
+    HOME_RESOLVER_MAX_CANDIDATES: int = 5
+    HOME_ENTITY_ALIASES: Dict[str, List[str]] = {}
+    # control_devices: one service call per (domain, service, parameters), at most this many in flight.
+    HOME_CONTROL_MAX_PARALLEL: int = 8
+    # How long a device command waits for the state_changed confirming it, per domain.
+    HOME_CONFIRM_TIMEOUT_S: Dict[str, float] = {"lock": 15.0, "cover": 10.0, "climate": 5.0, "default": 3.0}
+    # Per-thread snapshot of the inventory (domains, entity rows) the home model was shown;
+    # later turns get what changed since, or a one-line reference. Unset = only when
+    # CONTEXT_WINDOW_ENABLED is off (the window already drops old tables; pinning them costs more).
+    HOME_INVENTORY_DIFFS_ENABLED: Optional[bool] = None
+    HOME_INVENTORY_MAX_THREADS: int = 256
+
+    # LLM CASSETTE
+    # "record" appends every Ollama request/response to the cassette, "replay" serves them
+    # back without a model (see src/scripts/replay_cassette.py). Empty = off.
+    LLM_CASSETTE_MODE: str = ""
+    LLM_CASSETTE_PATH: str = "llm_cassette.jsonl"
+    LLM_CASSETTE_REPLAY_TIMING: bool = False  # Sleep the recorded model latency instead of replying instantly
     
+    # ROUTING
+    # The trigger fast-path answers turns with exactly one confident match without calling the LLM.
+    FAST_ROUTER_ENABLED: bool = True
+    FAST_ROUTER_MIN_SCORE: int = 1
+    # Extra phrases / regexes per worker, e.g. ROUTER_ALIASES='{"home_agent": ["lamp", "fan"]}'
+    ROUTER_ALIASES: Dict[str, List[str]] = {}
+    ROUTER_PATTERNS: Dict[str, List[str]] = {}
+    # The embedding classifier runs when the trigger table is ambiguous.
+    SEMANTIC_ROUTER_ENABLED: bool = True
+    SEMANTIC_ROUTER_MIN_SIMILARITY: float = 0.6
+    SEMANTIC_ROUTER_MARGIN: float = 0.05
+    SEMANTIC_ROUTER_CACHE_PATH: str = "semantic_router_cache.npz"
+    # After an embedding error the LLM routes for this long, doubling per failure up to the max.
+    SEMANTIC_ROUTER_RETRY_S: float = 15.0
+    SEMANTIC_ROUTER_RETRY_MAX_S: float = 300.0
+    # End the turn as soon as every worker the supervisor planned has run,
+    # instead of asking the LLM again just to hear "FINISH".
+    SUPERVISOR_COMPLETION_TRACKING: bool = True
+    # Let the supervisor dispatch independent workers concurrently ("parallel": true).
+    SUPERVISOR_PARALLEL_FANOUT: bool = True
+    # While the supervisor LLM decides, prefetch the read-only tool calls of the likeliest worker.
+    SPECULATIVE_TOOLS_ENABLED: bool = True
+    SPECULATION_TTL_S: float = 60  # Confirmed results older than this are not reused
+
+    # CONTEXT WINDOW
+    # Turns older than the last N are folded into a rolling summary (in batches; until
+    # then they stay in the window, within the token budget).
+    CONTEXT_WINDOW_ENABLED: bool = True
+    CONTEXT_KEEP_TURNS: int = 6
+    # Summarize in batches so the fold costs one LLM call every few turns, not every turn.
+    CONTEXT_SUMMARY_BATCH_TURNS: int = 3
+    # Token budget per node (estimated), e.g. CONTEXT_TOKEN_BUDGETS='{"supervisor": 1000}'
+    CONTEXT_DEFAULT_TOKEN_BUDGET: int = 4000
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {
+        "supervisor": 1500,
+        "general_chat": 3000,
+        "home_agent": 4000,
+        "research_agent": 6000,
+        "finance_agent": 3000,
+        "scheduler_agent": 4000,
+        "system_admin": 3000,
+    }
+
     # PERSISTENCE
     STATE_DB_PATH: str = "agent_state.sqlite"
+    CHECKPOINT_BACKEND: str = "sqlite"            # "sqlite" (durable) or "memory"
+    CHECKPOINT_KEEP_LAST: int = 20                # Root checkpoints kept per thread (0 = keep all)
+    CHECKPOINT_THREAD_TTL_HOURS: float = 24 * 30  # Idle threads are deleted after this (0 = never)
+    CHECKPOINT_MAINTENANCE_INTERVAL_S: float = 3600  # Idle-thread eviction + VACUUM cadence
+    FINANCE_DB_PATH: str = "finance_data.db"
+    # Embedded Qdrant (qdrant_client local mode) instead of the server, e.g. for offline benchmarks.
+    QDRANT_LOCAL_PATH: str = ""
+
+    # TRACING
+    TRACING_ENABLED: bool = True
+    TRACE_LOG_PATH: str = "traces.jsonl"     # One JSON span per line; read by src/scripts/trace_view.py
+    TRACE_LOG_MAX_MB: float = 50             # Rotated to <path>.1 past this size (one old file kept; 0 = no cap)
+    # GET /metrics on the Chainlit server (Prometheus). Off by default: it is not behind the chat login.
+    METRICS_ENABLED: bool = False
+    METRICS_TOKEN: str = ""                  # If set, scrapers must send "Authorization: Bearer <token>"
+
+    # CHAT UI (Chainlit)
+    # Streamed tokens are batched into one websocket message per frame.
+    UI_STREAM_FRAME_MS: float = 50
+    UI_STREAM_FRAME_CHARS: int = 400     # ...or sooner, once this much text is waiting
 
     # VOICE SETTINGS
     # Common GLaDOS file names: "glados", "en_US-glados-medium"
     PIPER_VOICE_ID: str = "glados"
+    # Speak answers sentence by sentence while they are generated (Chainlit).
+    VOICE_STREAMING: bool = True
+    VOICE_FIRST_CHUNK_CHARS: int = 20    # First clip goes out as soon as a sentence this long completes
+    VOICE_CHUNK_CHARS: int = 120         # Later clips batch sentences up to this length
+    VOICE_TTS_CONCURRENCY: int = 2       # Piper requests in flight per answer
+    # Wyoming connections to Piper are kept open and reused.
+    VOICE_POOL_SIZE: int = 4
+    VOICE_POOL_IDLE_S: float = 60.0      # Older idle connections are reconnected instead of reused
+    VOICE_CONNECT_TIMEOUT_S: float = 5.0
+    VOICE_READ_TIMEOUT_S: float = 30.0
+    # Synthesized audio cache, keyed by (voice, normalized text). Empty dir = memory only.
+    VOICE_CACHE_DIR: str = "voice_cache"
+    VOICE_CACHE_MEMORY_MB: float = 64
+    VOICE_CACHE_DISK_MB: float = 512
+    VOICE_CACHE_MAX_CHARS: int = 200     # Longer texts are one-offs; don't let them evict stock phrases
+    VOICE_PREWARM_PHRASES: List[str] = [
+        "Done.",
+        "Okay.",
+        "Sure thing.",
+        "Hello. What do you need?",
+        "Good morning.",
+        "The light is off.",
+        "The light is on.",
+        "The lights are off.",
+        "The lights are on.",
+        "I couldn't reach Home Assistant.",
+        "I couldn't find that device.",
+        "Something went wrong. Please try again.",
+    ]
 
     # COMPUTED URLS - automatically generated based on the IP/Port above.
     
@@ -0,0 +1,160 @@
+# src/core/context.py
+from typing import Dict, List, Optional
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from src.core.config import settings
+from src.core.llm import get_llm
+
+# Rough heuristic for Ollama models: ~4 characters per token.
+CHARS_PER_TOKEN = 4
+
+STALE_TOOL_STUB = "[Tool output from an earlier turn omitted]"
+
+# additional_kwargs key naming the node a message is pinned for: it survives
+# cleaning in that node's window (e.g. the home inventory later diffs refer to).
+PINNED_KEY = "pinned_for"
+
+SUMMARY_PROMPT = """You maintain the running summary of a conversation between a user and a home assistant.
+Merge the EXISTING SUMMARY with the NEW MESSAGES into one updated summary.
+Keep facts the user stated, decisions, device names, and open requests. Drop small talk.
+Write at most 10 short bullet points. Output ONLY the summary."""
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """Cheap token estimate (no tokenizer round trip)."""
+    chars = 0
+    for m in messages:
+        chars += len(m.content) if isinstance(m.content, str) else len(str(m.content))
+        for call in getattr(m, "tool_calls", None) or []:
+            chars += len(str(call.get("args", "")))
+    return chars // CHARS_PER_TOKEN
+
+def turn_starts(messages: List[BaseMessage], start: int = 0) -> List[int]:
+    """Indices of the HumanMessages that open each turn, from `start` on."""
+    return [i for i in range(start, len(messages)) if isinstance(messages[i], HumanMessage)]
+
+def _strip_stale(messages: List[BaseMessage], node: Optional[str] = None) -> List[BaseMessage]:
+    """
+    Cleans turns that are already finished:
+    - Tool payloads (entity dumps, search results) become a one-line stub.
+    - Injected SystemMessages (domain scans, guardrails) are dropped.
+    Messages pinned for `node` are kept as they are.
+    """
+    cleaned = []
+    for m in messages:
+        if node and m.additional_kwargs.get(PINNED_KEY) == node:
+            cleaned.append(m)
+            continue
+        if isinstance(m, SystemMessage):
+            continue
+        if isinstance(m, ToolMessage):
+            m = ToolMessage(content=STALE_TOOL_STUB, tool_call_id=m.tool_call_id, name=m.name, id=m.id)
+        cleaned.append(m)
+    return cleaned
+
+def build_context(state: Dict, node: str) -> List[BaseMessage]:
+    """
+    Returns the message list a node should send to the model:
+    [rolling summary] + finished turns (cleaned) + the current turn (verbatim),
+    trimmed oldest-turn-first to the node's token budget.
+    Every finished turn the summary does not cover yet is a candidate: turns
+    past CONTEXT_KEEP_TURNS wait for a batch to be folded, and until then the
+    window is the only place the model can see them.
+    The current turn is never trimmed, so tool call/result pairs stay intact.
+    """
+    messages = state.get("messages", [])
+    if not settings.CONTEXT_WINDOW_ENABLED:
+        return list(messages)
+
+    cursor = state.get("summary_cursor", 0) or 0
+    starts = turn_starts(messages, cursor)
+    if not starts:
+        return list(messages[cursor:])
+
+    current = list(messages[starts[-1]:])
+    previous = [_strip_stale(messages[a:b], node) for a, b in zip(starts[:-1], starts[1:])]
+
+    summary = state.get("summary", "")
+    head = [SystemMessage(content=f"## CONVERSATION SUMMARY (older turns)\n{summary}")] if summary else []
+
+    budget = settings.CONTEXT_TOKEN_BUDGETS.get(node, settings.CONTEXT_DEFAULT_TOKEN_BUDGET)
+    while previous and estimate_tokens(head + sum(previous, []) + current) > budget:
+        previous.pop(0)
+
+    return head + sum(previous, []) + current
+
+def _transcript(messages: List[BaseMessage]) -> str:
+    """Plain-text view of finished turns for the summarizer (no tool payloads)."""
+    lines = []
+    for m in messages:
+        if isinstance(m, HumanMessage):
+            lines.append(f"User: {m.content}")
+        elif isinstance(m, AIMessage) and isinstance(m.content, str) and m.content.strip():
+            lines.append(f"Assistant: {m.content}")
+    return "\n".join(lines)
+
+def _summary_request(state: Dict):
+    """Returns (prompt messages, old cursor, new cursor), or None when there is nothing to fold."""
+    if not settings.CONTEXT_WINDOW_ENABLED:
+        return None
+
+    messages = state.get("messages", [])
+    cursor = state.get("summary_cursor", 0) or 0
+    starts = turn_starts(messages, cursor)
+
+    # Turns older than the newest KEEP_TURNS (+ the current one) are evicted.
+    evicted_turns = len(starts) - 1 - settings.CONTEXT_KEEP_TURNS
+    if evicted_turns < settings.CONTEXT_SUMMARY_BATCH_TURNS:
+        return None
+
+    new_cursor = starts[evicted_turns]
+    transcript = _transcript(messages[cursor:new_cursor])
+    previous = state.get("summary", "")
+    prompt = [
+        SystemMessage(content=SUMMARY_PROMPT),
+        HumanMessage(content=f"EXISTING SUMMARY:\n{previous or '(none)'}\n\nNEW MESSAGES:\n{transcript}"),
+    ]
+    return prompt, cursor, new_cursor
+
+def summarize_evicted(state: Dict) -> Optional[Dict]:
+    """
+    Folds turns that fell out of the verbatim window into the rolling summary.
+    Incremental: only messages between the stored cursor and the new one are
+    sent to the model, together with the previous summary. Runs only once a
+    batch of turns has been evicted, so most turns cost nothing.
+    Returns the state update, or None when there is nothing to fold.
+    """
+    request = _summary_request(state)
+    if request is None:
+        return None
+    prompt, cursor, new_cursor = request
+
+    try:
+        summary = get_llm(temperature=0, role="summary").invoke(prompt).content.strip()
+    except Exception as e:
+        # Keep the window growing rather than losing history.
+        print(f"[CONTEXT ERROR]: Could not update summary: {e}")
+        return None
+
+    print(f"[CONTEXT] Folded {new_cursor - cursor} messages into the summary.")
+    return {"summary": summary, "summary_cursor": new_cursor}
+
+async def asummarize_evicted(state: Dict) -> Optional[Dict]:
+    """Async twin of summarize_evicted() for the Chainlit event loop."""
+    request = _summary_request(state)
+    if request is None:
+        return None
+    prompt, cursor, new_cursor = request
+
+    try:
+        summary = (await get_llm(temperature=0, role="summary").ainvoke(prompt)).content.strip()
+    except Exception as e:
+        print(f"[CONTEXT ERROR]: Could not update summary: {e}")
+        return None
+
+    print(f"[CONTEXT] Folded {new_cursor - cursor} messages into the summary.")
+    return {"summary": summary, "summary_cursor": new_cursor}
@@ -1,14 +1,20 @@
 # src/core/database.py
 from sqlalchemy import create_engine, Column, String, Float, Integer, Text, Date
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from src.core.config import settings
 
 # 1. Database Setup
 # We use a local SQLite file. 'check_same_thread=False' is needed for multi-threaded agents.
-DB_URL = "sqlite:///finance_data.db" 
+DB_URL = f"sqlite:///{settings.FINANCE_DB_PATH}"
 
 engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async twin (aiosqlite) for tools awaited on the Chainlit event loop.
+ASYNC_DB_URL = DB_URL.replace("sqlite:///", "sqlite+aiosqlite:///")
+async_engine = create_async_engine(ASYNC_DB_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # region schemas 
@@ -75,4 +81,8 @@ def get_db_session():
         return db
     except Exception:
         db.close()
-        raise
\ No newline at end of file
+        raise
+
+def get_async_db_session() -> AsyncSession:
+    """Factory to get a new async DB session (use with `async with`)."""
+    return AsyncSessionLocal()
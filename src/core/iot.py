@@ -1,21 +1,129 @@
 # src/core/iot.py
+import json
+import time
+import asyncio
+import threading
+import aiohttp
+import httpx
 import requests
-from typing import Dict, Any, List, Union
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, Any, List, Optional, Union
 from src.core.config import settings
+from src.core.tracing import BUCKETS
+
+# --- REST TRANSPORT ---
+# GETs are retried on connection errors and these statuses, with exponential
+# backoff. Service calls (POST) never are: a retried call could toggle a
+# device twice.
+RETRY_STATUSES = {502, 503, 504}
+
+class LatencyMetrics:
+    """Latency histograms and outcome counters per label value (an endpoint, a device)."""
+    def __init__(self, name: str, label: str, duration_help: str, outcomes_help: str):
+        self.name, self.label = name, label
+        self.duration_help, self.outcomes_help = duration_help, outcomes_help
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, List[float]] = {}   # label value -> [bucket counts..., sum, count]
+        self.outcomes: Dict[tuple, int] = {}            # (label value, outcome) -> count
+
+    def observe(self, key: str, seconds: float, outcome: str):
+        with self._lock:
+            hist = self.histograms.setdefault(key, [0.0] * (len(BUCKETS) + 2))
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+            self.outcomes[(key, outcome)] = self.outcomes.get((key, outcome), 0) + 1
+
+    def count(self, key: str, outcome: str):
+        with self._lock:
+            self.outcomes[(key, outcome)] = self.outcomes.get((key, outcome), 0) + 1
+
+    def prometheus_text(self) -> str:
+        lines = [
+            f"# HELP {self.name}_duration_seconds {self.duration_help}",
+            f"# TYPE {self.name}_duration_seconds histogram",
+        ]
+        with self._lock:
+            histograms, outcomes = dict(self.histograms), dict(self.outcomes)
+        for key, hist in sorted(histograms.items()):
+            labels = f'{self.label}="{key}"'
+            for bound, count in zip(BUCKETS, hist):
+                lines.append(f'{self.name}_duration_seconds_bucket{{{labels},le="{bound}"}} {int(count)}')
+            lines.append(f'{self.name}_duration_seconds_bucket{{{labels},le="+Inf"}} {int(hist[-1])}')
+            lines.append(f"{self.name}_duration_seconds_sum{{{labels}}} {hist[-2]:.6f}")
+            lines.append(f"{self.name}_duration_seconds_count{{{labels}}} {int(hist[-1])}")
+        lines += [
+            f"# HELP {self.name}s_total {self.outcomes_help}",
+            f"# TYPE {self.name}s_total counter",
+        ]
+        for (key, outcome), count in sorted(outcomes.items()):
+            lines.append(f'{self.name}s_total{{{self.label}="{key}",outcome="{outcome}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        with self._lock:
+            parts = [f"{key}: {int(hist[-1])} in {hist[-2] / hist[-1] * 1000:.0f}ms avg"
+                     for key, hist in sorted(self.histograms.items()) if hist[-1]]
+            totals: Dict[str, int] = {}
+            for (_, outcome), n in self.outcomes.items():
+                totals[outcome] = totals.get(outcome, 0) + n
+        return f"{', '.join(parts) or 'nothing yet'} ({', '.join(f'{n} {o}' for o, n in sorted(totals.items()))})"
+
+request_metrics = LatencyMetrics(
+    "glados_ha_request", "endpoint",
+    "Home Assistant REST requests, by endpoint.",
+    "Home Assistant REST attempts by outcome (ok, error, retry).")
+# Service call -> state_changed confirming it, per device (see HomeAssistantStateMirror.expect).
+actuation_metrics = LatencyMetrics(
+    "glados_ha_actuation", "device",
+    "Time from a device command to the state change confirming it.",
+    "Device commands by outcome (confirmed, unconfirmed).")
+
+def _headers() -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {settings.HOME_ASSISTANT_TOKEN}",
+        "Content-Type": "application/json",
+    }
 
 class HomeAssistantClient:
+    """
+    Blocking REST client (CLI path). Every call goes through one pooled
+    keep-alive requests.Session; GETs are retried (see RETRY_STATUSES) and
+    every attempt is timed into request_metrics.
+    Returns data on success, {"error": ...} on failure.
+    """
     def __init__(self):
         self.base_url = settings.HOME_ASSISTANT_URL
-        self.headers = {
-            "Authorization": f"Bearer {settings.HOME_ASSISTANT_TOKEN}",
-            "Content-Type": "application/json",
-        }
+        self.headers = _headers()
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.HA_HTTP_POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, method: str, endpoint: str, path: str, timeout: float, **kwargs) -> requests.Response:
+        retries = settings.HA_HTTP_RETRIES if method == "GET" else 0
+        for attempt in range(retries + 1):
+            t0 = time.perf_counter()
+            try:
+                response = self.session.request(method, f"{self.base_url}{path}", timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                request_metrics.observe(endpoint, time.perf_counter() - t0, "error")
+                if attempt == retries:
+                    raise
+            else:
+                request_metrics.observe(endpoint, time.perf_counter() - t0, "ok" if response.ok else "error")
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+            request_metrics.count(endpoint, "retry")
+            time.sleep(settings.HA_HTTP_BACKOFF_S * 2 ** attempt)
 
     def get_all_states(self) -> Union[List[Dict], Dict]:
         """Fetch ALL states. Returns list of states OR error dict."""
-        url = f"{self.base_url}/api/states"
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self._request("GET", "states", "/api/states", timeout=settings.HA_HTTP_TIMEOUT_S)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.HTTPError as e:
@@ -27,9 +135,8 @@ class HomeAssistantClient:
 
     def get_state(self, entity_id: str) -> Dict[str, Any]:
         """Fetch the state of a specific entity."""
-        url = f"{self.base_url}/api/states/{entity_id}"
         try:
-            response = requests.get(url, headers=self.headers, timeout=5)
+            response = self._request("GET", "state", f"/api/states/{entity_id}", timeout=5)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.HTTPError:
@@ -39,23 +146,407 @@ class HomeAssistantClient:
 
     def call_service(self, domain: str, service: str, service_data: Dict[str, Any]) -> Dict[str, Any]:
         """Call a service (e.g., light.turn_on)."""
-        url = f"{self.base_url}/api/services/{domain}/{service}"
         try:
-            response = requests.post(url, headers=self.headers, json=service_data, timeout=10)
+            response = self._request("POST", "service", f"/api/services/{domain}/{service}",
+                                     timeout=settings.HA_HTTP_TIMEOUT_S, json=service_data)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def get_calendar_events(self, calendar_id: str, start: str, end: str) -> Union[List[Dict], Dict]:
+        """Fetch events of one calendar entity between two ISO timestamps."""
+        try:
+            response = self._request("GET", "calendar", f"/api/calendars/{calendar_id}",
+                                     timeout=5, params={"start": start, "end": end})
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+class AsyncHomeAssistantClient:
+    """
+    Async twin of HomeAssistantClient for the Chainlit (event loop) path.
+    Same return conventions, retry policy and metrics; one pooled
+    httpx.AsyncClient is shared by every call.
+    """
+    def __init__(self):
+        self.base_url = settings.HOME_ASSISTANT_URL
+        self.headers = _headers()
+        self._client = httpx.AsyncClient(
+            headers=self.headers, timeout=settings.HA_HTTP_TIMEOUT_S,
+            limits=httpx.Limits(max_connections=settings.HA_HTTP_POOL_SIZE,
+                                max_keepalive_connections=settings.HA_HTTP_POOL_SIZE),
+        )
+
+    async def _request(self, method: str, endpoint: str, path: str, **kwargs) -> httpx.Response:
+        retries = settings.HA_HTTP_RETRIES if method == "GET" else 0
+        for attempt in range(retries + 1):
+            t0 = time.perf_counter()
+            try:
+                response = await self._client.request(method, f"{self.base_url}{path}", **kwargs)
+            except httpx.TransportError:
+                request_metrics.observe(endpoint, time.perf_counter() - t0, "error")
+                if attempt == retries:
+                    raise
+            else:
+                request_metrics.observe(endpoint, time.perf_counter() - t0,
+                                        "ok" if response.is_success else "error")
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+            request_metrics.count(endpoint, "retry")
+            await asyncio.sleep(settings.HA_HTTP_BACKOFF_S * 2 ** attempt)
+
+    async def get_all_states(self) -> Union[List[Dict], Dict]:
+        """Fetch ALL states. Returns list of states OR error dict."""
+        try:
+            response = await self._request("GET", "states", "/api/states")
             response.raise_for_status()
             return response.json()
+        except httpx.HTTPStatusError as e:
+            return {"error": f"HTTP Error {e.response.status_code}: {e.response.reason_phrase}"}
+        except httpx.ConnectError:
+            return {"error": f"Connection Refused to {self.base_url}. Check IP."}
         except Exception as e:
             return {"error": str(e)}
 
-    def get_all_states(self) -> list:
-        """Fetch ALL states. Expensive call, use sparingly."""
-        url = f"{self.base_url}/api/states"
+    async def get_state(self, entity_id: str) -> Dict[str, Any]:
+        """Fetch the state of a specific entity."""
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = await self._request("GET", "state", f"/api/states/{entity_id}", timeout=5)
             response.raise_for_status()
             return response.json()
+        except httpx.HTTPStatusError:
+            return {"error": f"Entity {entity_id} not found."}
         except Exception as e:
-            return []
+            return {"error": str(e)}
+
+    async def call_service(self, domain: str, service: str, service_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Call a service (e.g., light.turn_on)."""
+        try:
+            response = await self._request("POST", "service", f"/api/services/{domain}/{service}", json=service_data)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def get_calendar_events(self, calendar_id: str, start: str, end: str) -> Union[List[Dict], Dict]:
+        """Fetch events of one calendar entity between two ISO timestamps."""
+        try:
+            response = await self._request(
+                "GET", "calendar", f"/api/calendars/{calendar_id}", params={"start": start, "end": end}, timeout=5
+            )
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+# Singleton instances
+ha_client = HomeAssistantClient()
+async_ha_client = AsyncHomeAssistantClient()
+
+# --- LIVE STATE MIRROR ---
+class StateWaiter:
+    """
+    A pending confirmation: resolved by the first mirrored state of
+    `entity_id` that passes `check` (see HomeAssistantStateMirror.expect).
+    Waitable from a thread (wait) or from the caller's event loop (await_).
+    """
+    def __init__(self, entity_id: str, check: Callable[[Dict], bool],
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.entity_id, self.check = entity_id, check
+        self.state: Optional[Dict] = None
+        self.at: Optional[float] = None  # perf_counter() when it was resolved
+        self._event = threading.Event()
+        self._loop = loop
+        self._future = loop.create_future() if loop else None
+
+    def offer(self, state: Dict):
+        if self._event.is_set() or not self.check(state):
+            return
+        self.state, self.at = state, time.perf_counter()
+        self._event.set()
+        if self._future is not None:
+            self._loop.call_soon_threadsafe(lambda: self._future.done() or self._future.set_result(state))
+
+    def wait(self, timeout: float) -> Optional[Dict]:
+        self._event.wait(max(timeout, 0))
+        return self.state
+
+    async def await_(self, timeout: float) -> Optional[Dict]:
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._future), max(timeout, 0))
+        except asyncio.TimeoutError:
+            return self.state
+
+class HomeAssistantStateMirror:
+    """
+    Process-wide copy of every entity state, indexed by entity_id and by domain.
+
+    Loaded once over the WebSocket API (get_states) and kept current by a
+    state_changed subscription, so tools read memory instead of downloading
+    /api/states on every call. The socket lives on its own thread and event
+    loop (shared by the CLI and Chainlit paths) and reconnects with backoff.
+    While it is down, reads fall back to a REST snapshot that is refreshed
+    once it is older than HA_STATE_TTL_S.
+
+    Reads return the same shapes as the REST clients: a list of states, or
+    {"error": ...} when nothing could be loaded at all.
+
+    The area/device/entity registries are read on every (re)connect for each
+    entity's area name and aliases. `version` changes whenever the set of
+    entities or their names/areas/aliases may have changed, so indexes built
+    on top (the entity resolver) know when to rebuild.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._arefresh_lock: Optional[asyncio.Lock] = None  # astates()' twin, bound to _arefresh_loop
+        self._arefresh_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._by_id: Dict[str, Dict] = {}
+        self._by_domain: Dict[str, Dict[str, Dict]] = {}
+        self._loaded_at: Optional[float] = None
+        self._ready = threading.Event()  # First WebSocket attempt finished (loaded or failed)
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.live = False
+        self.version = 0
+        self.areas: Dict[str, str] = {}            # entity_id -> area name
+        self.aliases: Dict[str, List[str]] = {}    # entity_id -> aliases set in HA
+        self.stats = {"ws_loads": 0, "rest_loads": 0, "events": 0, "disconnects": 0}
+        self._waiters: Dict[str, List[StateWaiter]] = {}
+
+    def start(self):
+        """Starts the WebSocket subscription (idempotent; reads call it too)."""
+        if not settings.HA_STATE_MIRROR_ENABLED:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="ha-state-mirror", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Ends the subscription and forgets the house; the next read starts over (tests, reconfiguration)."""
+        with self._lock:
+            thread, loop, task = self._thread, self._loop, self._task
+        if loop is not None and task is not None:
+            loop.call_soon_threadsafe(task.cancel)
+        if thread is not None:
+            thread.join(timeout=5)
+        with self._lock:
+            self._thread = self._loop = self._task = None
+            self._by_id, self._by_domain, self._loaded_at = {}, {}, None
+            self.areas, self.aliases = {}, {}
+            self.live = False
+            self.version += 1
+            self._ready.clear()
+
+    def _run(self):
+        try:
+            asyncio.run(self._supervise())
+        except asyncio.CancelledError:
+            pass
+
+    # --- INDEX ---
+    def _load(self, states: List[Dict], source: str):
+        by_id = {s["entity_id"]: s for s in states if "entity_id" in s}
+        by_domain: Dict[str, Dict[str, Dict]] = {}
+        for entity_id, state in by_id.items():
+            by_domain.setdefault(entity_id.split(".")[0], {})[entity_id] = state
+        with self._lock:
+            self._by_id, self._by_domain, self._loaded_at = by_id, by_domain, time.monotonic()
+            self.stats[f"{source}_loads"] += 1
+            self.version += 1
+            for entity_id, waiters in self._waiters.items():
+                for waiter in waiters:
+                    if entity_id in by_id:
+                        waiter.offer(by_id[entity_id])
+
+    def _apply(self, data: Dict[str, Any]):
+        entity_id, new_state = data.get("entity_id", ""), data.get("new_state")
+        domain = entity_id.split(".")[0]
+        with self._lock:
+            old_state = self._by_id.get(entity_id)
+            if new_state is None:  # Entity removed
+                self._by_id.pop(entity_id, None)
+                self._by_domain.get(domain, {}).pop(entity_id, None)
+                self.version += 1
+            else:
+                if old_state is None or _name(old_state) != _name(new_state):
+                    self.version += 1
+                self._by_id[entity_id] = new_state
+                self._by_domain.setdefault(domain, {})[entity_id] = new_state
+                for waiter in self._waiters.get(entity_id, ()):
+                    waiter.offer(new_state)
+            self.stats["events"] += 1
+
+    def _snapshot(self, domain: Optional[str]) -> List[Dict]:
+        with self._lock:
+            index = self._by_id if domain is None else self._by_domain.get(domain, {})
+            return list(index.values())
+
+    def _fresh(self) -> bool:
+        return self._loaded_at is not None and (
+            self.live or time.monotonic() - self._loaded_at < settings.HA_STATE_TTL_S)
+
+    def _refreshed(self, states: Union[List[Dict], Dict], domain: Optional[str]) -> Union[List[Dict], Dict]:
+        if isinstance(states, list):
+            self._load(states, "rest")
+        elif self._loaded_at is None:
+            return states
+        else:
+            # A stale house beats no house; the error is logged, not returned.
+            print(f"[HA MIRROR] REST refresh failed, serving the last known states: {states.get('error')}")
+        return self._snapshot(domain)
+
+    # --- READS ---
+    def states(self, domain: Optional[str] = None) -> Union[List[Dict], Dict]:
+        """Every state, or one domain's. Blocks only when the mirror has to refresh over REST."""
+        if not settings.HA_STATE_MIRROR_ENABLED:
+            return _in_domain(ha_client.get_all_states(), domain)
+        self.start()
+        if self._loaded_at is None:
+            self._ready.wait(settings.HA_STATE_MIRROR_WAIT_S)
+        if not self._fresh():
+            with self._refresh_lock:
+                if not self._fresh():
+                    return self._refreshed(ha_client.get_all_states(), domain)
+        return self._snapshot(domain)
+
+    async def astates(self, domain: Optional[str] = None) -> Union[List[Dict], Dict]:
+        """Async twin of states() (the REST fallback uses the pooled async client)."""
+        if not settings.HA_STATE_MIRROR_ENABLED:
+            return _in_domain(await async_ha_client.get_all_states(), domain)
+        self.start()
+        if self._loaded_at is None:
+            await asyncio.to_thread(self._ready.wait, settings.HA_STATE_MIRROR_WAIT_S)
+        if not self._fresh():
+            loop = asyncio.get_running_loop()
+            if loop is not self._arefresh_loop:
+                self._arefresh_lock, self._arefresh_loop = asyncio.Lock(), loop
+            async with self._arefresh_lock:
+                if not self._fresh():
+                    return self._refreshed(await async_ha_client.get_all_states(), domain)
+        return self._snapshot(domain)
+
+    def _load_registries(self, areas: List[Dict], devices: List[Dict], entities: List[Dict]):
+        area_names = {a["area_id"]: a.get("name", a["area_id"]) for a in areas}
+        device_areas = {d["id"]: d.get("area_id") for d in devices}
+        entity_areas, aliases = {}, {}
+        for entry in entities:
+            area_id = entry.get("area_id") or device_areas.get(entry.get("device_id"))
+            if area_id in area_names:
+                entity_areas[entry["entity_id"]] = area_names[area_id]
+            if entry.get("aliases"):
+                aliases[entry["entity_id"]] = list(entry["aliases"])
+        with self._lock:
+            self.areas, self.aliases = entity_areas, aliases
+            self.version += 1
+
+    def get(self, entity_id: str) -> Optional[Dict]:
+        """Last known state of one entity, without any network call."""
+        with self._lock:
+            return self._by_id.get(entity_id)
+
+    # --- CONFIRMATION ---
+    def expect(self, entity_id: str, check: Callable[[Dict], bool],
+               loop: Optional[asyncio.AbstractEventLoop] = None) -> StateWaiter:
+        """
+        Registers a waiter for the state_changed that confirms a command.
+        Call it BEFORE sending the command (so a fast event can't be missed)
+        and forget() it afterwards. Pass the running loop to await it.
+        """
+        waiter = StateWaiter(entity_id, check, loop)
+        with self._lock:
+            self._waiters.setdefault(entity_id, []).append(waiter)
+        return waiter
+
+    def forget(self, waiter: StateWaiter):
+        with self._lock:
+            waiters = self._waiters.get(waiter.entity_id, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                self._waiters.pop(waiter.entity_id, None)
+
+    # --- WEBSOCKET ---
+    async def _supervise(self):
+        self._loop, self._task = asyncio.get_running_loop(), asyncio.current_task()
+        delay = 1.0
+        while True:
+            try:
+                await self._subscribe()
+            except Exception as e:
+                print(f"[HA MIRROR] WebSocket error: {e}")
+            self._ready.set()
+            if self.live:
+                delay = 1.0  # It was up; retry quickly
+                with self._lock:
+                    # The index was current until now: the TTL fallback counts from here.
+                    self._loaded_at = time.monotonic()
+                    self.live = False
+                    self.stats["disconnects"] += 1
+                print(f"[HA MIRROR] Subscription lost. Falling back to REST (TTL {settings.HA_STATE_TTL_S}s).")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    async def _subscribe(self):
+        url = settings.HOME_ASSISTANT_URL.replace("http", "ws", 1) + "/api/websocket"
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(sock_connect=5)) as session:
+            # max_msg_size=0: get_states for a big house is several MB.
+            async with session.ws_connect(url, heartbeat=settings.HA_WS_HEARTBEAT_S, max_msg_size=0) as ws:
+                await ws.receive_json()  # auth_required
+                await ws.send_json({"type": "auth", "access_token": settings.HOME_ASSISTANT_TOKEN})
+                auth = await ws.receive_json()
+                if auth.get("type") != "auth_ok":
+                    raise PermissionError(f"Authentication failed: {auth.get('message', auth.get('type'))}")
+
+                # Subscribe first, then snapshot: events queued before the snapshot are older than it.
+                await ws.send_json({"id": 1, "type": "subscribe_events", "event_type": "state_changed"})
+                await ws.send_json({"id": 2, "type": "get_states"})
+                registries: Dict[int, List[Dict]] = {}
+                for msg_id, kind in REGISTRY_REQUESTS.items():
+                    await ws.send_json({"id": msg_id, "type": kind})
+                async for message in ws:
+                    if message.type != aiohttp.WSMsgType.TEXT:
+                        break
+                    data = json.loads(message.data)
+                    if data.get("type") == "event":
+                        self._apply(data["event"]["data"])
+                    elif data.get("id") in REGISTRY_REQUESTS:
+                        # Optional (admin-only on some setups): without them there are just no areas/aliases.
+                        registries[data["id"]] = (data.get("result") or []) if data.get("success") else []
+                        if len(registries) == len(REGISTRY_REQUESTS):
+                            self._load_registries(*(registries[i] for i in REGISTRY_REQUESTS))
+                    elif data.get("type") == "result" and not data.get("success"):
+                        raise RuntimeError(f"Request {data.get('id')} failed: {data.get('error')}")
+                    elif data.get("id") == 2:
+                        self._load(data["result"], "ws")
+                        self.live = True
+                        self._ready.set()
+                        print(f"[HA MIRROR] Live: {len(data['result'])} entities, following state_changed.")
+
+# WebSocket request id -> registry command (the order _load_registries takes them in)
+REGISTRY_REQUESTS = {3: "config/area_registry/list", 4: "config/device_registry/list", 5: "config/entity_registry/list"}
+
+def _name(state: Dict) -> str:
+    return state.get("attributes", {}).get("friendly_name", "")
+
+def _in_domain(states: Union[List[Dict], Dict], domain: Optional[str]) -> Union[List[Dict], Dict]:
+    if domain is None or not isinstance(states, list):
+        return states
+    return [s for s in states if s.get("entity_id", "").startswith(f"{domain}.")]
+
+state_mirror = HomeAssistantStateMirror()
 
-# Singleton instance
-ha_client = HomeAssistantClient()
\ No newline at end of file
+def prometheus_text() -> str:
+    """REST request and device actuation latency, and state mirror counters, in Prometheus text format."""
+    lines = [
+        "# HELP glados_ha_mirror_total State mirror loads (WebSocket/REST), state_changed events and disconnects.",
+        "# TYPE glados_ha_mirror_total counter",
+    ]
+    for event, count in state_mirror.stats.items():
+        lines.append(f'glados_ha_mirror_total{{event="{event}"}} {count}')
+    return request_metrics.prometheus_text() + actuation_metrics.prometheus_text() + "\n".join(lines) + "\n"
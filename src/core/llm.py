@@ -1,32 +1,219 @@
 # src/core/llm.py
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from ollama import AsyncClient, Client, ResponseError
 from langchain_ollama import ChatOllama, OllamaEmbeddings
 from src.core.config import settings
+from src.core.cassette import transport_kwargs
+
+# --- CLIENT CACHE ---
+# ChatOllama objects are stateless between calls, so one instance per
+# (model chain, temperature, json_mode, format schema) is shared by every node.
+_LLM_CACHE: Dict[Tuple, ChatOllama] = {}
+_EMBEDDINGS_CACHE: Dict[Tuple, OllamaEmbeddings] = {}
+
+# One sync + async httpx transport (connection pool) per Ollama base URL, shared
+# by every client talking to it (keep-alive across hops).
+_POOLS: Dict[str, Dict[str, Dict[str, Any]]] = {}
+_CLIENTS: Dict[str, Tuple[Client, AsyncClient]] = {}
+
+_lock = threading.Lock()
+
+# Counters: cache hits/misses, HTTP requests sent, and TCP connections opened.
+# Requests minus new connections = requests that reused a kept-alive socket.
+LLM_STATS = {"cache_hits": 0, "cache_misses": 0, "requests": 0, "new_connections": 0}
+
+def _count_connect(event_name: str, info: dict):
+    if event_name == "connection.connect_tcp.complete":
+        LLM_STATS["new_connections"] += 1
+
+async def _acount_connect(event_name: str, info: dict):
+    _count_connect(event_name, info)
+
+def _on_request(request: httpx.Request):
+    LLM_STATS["requests"] += 1
+    request.extensions["trace"] = _count_connect
+
+async def _aon_request(request: httpx.Request):
+    LLM_STATS["requests"] += 1
+    request.extensions["trace"] = _acount_connect
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.OLLAMA_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OLLAMA_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.OLLAMA_POOL_KEEPALIVE_EXPIRY,
+    )
+
+def pool_kwargs(base_url: str) -> Dict[str, Dict[str, Any]]:
+    """
+    httpx client kwargs ({"sync": {...}, "async": {...}}) on the shared pool
+    for a base URL, created once. Passed to ChatOllama / OllamaEmbeddings as
+    sync_client_kwargs / async_client_kwargs.
+    """
+    with _lock:
+        if base_url not in _POOLS:
+            # Pool limits, or a record/replay transport wrapping the pool (LLM_CASSETTE_MODE).
+            transports = transport_kwargs(_pool_limits())
+            _POOLS[base_url] = {
+                "sync": {"event_hooks": {"request": [_on_request]}, **transports["sync"]},
+                "async": {"event_hooks": {"request": [_aon_request]}, **transports["async"]},
+            }
+        return _POOLS[base_url]
+
+def get_ollama_clients(base_url: str) -> Tuple[Client, AsyncClient]:
+    """Returns shared (sync, async) Ollama clients for a base URL, on the pooled transports."""
+    clients = _CLIENTS.get(base_url)
+    if clients is None:
+        pools = pool_kwargs(base_url)
+        clients = _CLIENTS.setdefault(base_url, (Client(host=base_url, **pools["sync"]),
+                                                  AsyncClient(host=base_url, **pools["async"])))
+    return clients
+
+def llm_stats() -> Dict[str, int]:
+    """Snapshot of the cache and connection-reuse counters."""
+    stats = dict(LLM_STATS)
+    stats["reused_connections"] = max(0, stats["requests"] - stats["new_connections"])
+    stats["cached_models"] = len(_LLM_CACHE)
+    return stats
+
+# --- MODEL TIERS ---
+# Errors that mean "this model can't answer right now" (not pulled, server down,
+# out of memory): worth retrying on the next model in the role's chain.
+FALLBACK_ERRORS = (ResponseError, httpx.HTTPError, ConnectionError)
 
-def get_llm(temperature: float = 0, json_mode: bool = False) -> ChatOllama:
+class TieredChatOllama(ChatOllama):
+    """
+    ChatOllama that retries a failed request on the next model of its
+    fallback chain. Streams only fall back before the first chunk arrives.
+    Still a ChatOllama, so bind_tools() / create_agent() keep working.
+    """
+    fallback_models: List[str] = []
+
+    def _chain(self) -> List[str]:
+        return [self.model] + [m for m in self.fallback_models if m != self.model]
+
+    def _fall_back(self, failed: str, e: Exception, nxt: Optional[str]):
+        if nxt is None:
+            raise e
+        print(f"[LLM] Model '{failed}' failed ({type(e).__name__}: {e}). Falling back to '{nxt}'.")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        chain = self._chain()
+        for i, model in enumerate(chain):
+            try:
+                return super()._generate(messages, stop, run_manager, **{**kwargs, "model": model})
+            except FALLBACK_ERRORS as e:
+                self._fall_back(model, e, chain[i + 1] if i + 1 < len(chain) else None)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        chain = self._chain()
+        for i, model in enumerate(chain):
+            try:
+                return await super()._agenerate(messages, stop, run_manager, **{**kwargs, "model": model})
+            except FALLBACK_ERRORS as e:
+                self._fall_back(model, e, chain[i + 1] if i + 1 < len(chain) else None)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        chain = self._chain()
+        for i, model in enumerate(chain):
+            started = False
+            try:
+                for chunk in super()._stream(messages, stop, run_manager, **{**kwargs, "model": model}):
+                    started = True
+                    yield chunk
+                return
+            except FALLBACK_ERRORS as e:
+                if started:
+                    raise
+                self._fall_back(model, e, chain[i + 1] if i + 1 < len(chain) else None)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        chain = self._chain()
+        for i, model in enumerate(chain):
+            started = False
+            try:
+                async for chunk in super()._astream(messages, stop, run_manager, **{**kwargs, "model": model}):
+                    started = True
+                    yield chunk
+                return
+            except FALLBACK_ERRORS as e:
+                if started:
+                    raise
+                self._fall_back(model, e, chain[i + 1] if i + 1 < len(chain) else None)
+
+def role_models(role: Optional[str]) -> List[str]:
+    """Model chain for a role: its model, its configured fallbacks, then DEFAULT_MODEL."""
+    primary = settings.MODEL_ROLES.get(role or "") or settings.DEFAULT_MODEL
+    chain = [primary, *settings.MODEL_FALLBACKS.get(role or "", []), settings.DEFAULT_MODEL]
+    return list(dict.fromkeys(chain))
+
+def get_llm(temperature: float = 0, json_mode: bool = False,
+            format_schema: Optional[Dict[str, Any]] = None,
+            model: Optional[str] = None,
+            role: Optional[str] = None) -> ChatOllama:
     """
     Returns the configured Chat Model (The Brain).
-    
+    Instances are cached, so calling this per node invocation is cheap and
+    every caller shares the same pooled connection to Ollama.
+
     Args:
         temperature: 0 for factual/math (Admin), 0.7 for creative (Writing).
         json_mode: If True, enforces valid JSON output (critical for Tools).
+        format_schema: Optional JSON schema for structured output (overrides json_mode).
+        model: Optional model name; skips the role lookup and fallbacks.
+        role: Which tier to use ("router", "home_executor", "sql", ...; see settings.MODEL_ROLES).
+              Unconfigured roles use settings.DEFAULT_MODEL.
     """
-    return ChatOllama(
-        model=settings.DEFAULT_MODEL,        # Loaded from .env (e.g., "llama3.2:latest")
+    chain = [model] if model else role_models(role)
+    schema_key = json.dumps(format_schema, sort_keys=True) if format_schema else ""
+    key = (tuple(chain), float(temperature), json_mode, schema_key)
+
+    cached = _LLM_CACHE.get(key)
+    if cached is not None:
+        LLM_STATS["cache_hits"] += 1
+        return cached
+
+    if format_schema:
+        output_format = format_schema
+    else:
+        output_format = "json" if json_mode else ""  # Enforces structured output if requested
+
+    llm = TieredChatOllama(
+        model=chain[0],                      # Role model or DEFAULT_MODEL from .env (e.g., "llama3.2:latest")
+        fallback_models=chain[1:],
         base_url=settings.OLLAMA_BASE_URL,   # Loaded from .env (e.g., "http://10.0.0.201:11434")
         temperature=temperature,
-        format="json" if json_mode else "",  # Enforces structured output if requested
+        format=output_format,
         # Keep-alive ensures the model stays in VRAM for faster subsequent responses
-        keep_alive="5m"  
+        keep_alive="5m",
+        sync_client_kwargs=pool_kwargs(settings.OLLAMA_BASE_URL)["sync"],
+        async_client_kwargs=pool_kwargs(settings.OLLAMA_BASE_URL)["async"],
     )
 
+    with _lock:
+        LLM_STATS["cache_misses"] += 1
+        return _LLM_CACHE.setdefault(key, llm)
+
 def get_embeddings() -> OllamaEmbeddings:
     """
     Returns the configured Embedding Model (The Translator).
     Used by the Vector Store to turn text into numbers.
     """
-    return OllamaEmbeddings(
+    key = (settings.EMBEDDING_MODEL, settings.OLLAMA_BASE_URL)
+    cached = _EMBEDDINGS_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    embeddings = OllamaEmbeddings(
         model=settings.EMBEDDING_MODEL,      # Loaded from .env (e.g., "nomic-embed-text")
         base_url=settings.OLLAMA_BASE_URL,
+        sync_client_kwargs=pool_kwargs(settings.OLLAMA_BASE_URL)["sync"],
+        async_client_kwargs=pool_kwargs(settings.OLLAMA_BASE_URL)["async"],
     )
 
-llm = get_llm(temperature=0.5)
\ No newline at end of file
+    with _lock:
+        return _EMBEDDINGS_CACHE.setdefault(key, embeddings)
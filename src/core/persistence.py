@@ -1,16 +1,233 @@
 # src/core/persistence.py
+import time
+import asyncio
+import sqlite3
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from src.core.config import settings
+
+# langgraph's savers own the checkpoints/writes tables; this one is ours (for the TTL).
+ACTIVITY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thread_activity (
+    thread_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+)
+"""
+
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",   # Durable across app crashes; WAL makes fsync-per-commit unnecessary
+    "PRAGMA busy_timeout=5000",    # The sync (CLI) and async (Chainlit) connections share the file
+]
+
+Statement = Tuple[str, tuple]
+
+class SqliteCheckpointer(BaseCheckpointSaver[str]):
+    """
+    Durable checkpointer on a single SQLite file (WAL mode): langgraph's
+    SqliteSaver for the sync methods (graph.invoke from main.py) and an
+    AsyncSqliteSaver, opened lazily on the running loop, for the async ones
+    (astream_events from Chainlit). Both read and write the same tables.
+
+    On top of them, RETENTION:
+    - Only the newest `keep_last` root checkpoints of a thread are kept.
+      Subgraph checkpoints older than the oldest kept root one go with them.
+    - Threads idle for longer than `thread_ttl_s` are deleted.
+    - Idle-thread eviction and VACUUM run every `maintenance_interval_s` on a
+      daemon thread with its own connection, never on the write path.
+    """
+    def __init__(self, path: str, keep_last: int = 20, thread_ttl_s: float = 0,
+                 maintenance_interval_s: float = 3600, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_last = keep_last
+        self.thread_ttl_s = thread_ttl_s
+        self.maintenance_interval_s = maintenance_interval_s
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        for pragma in PRAGMAS:
+            self.conn.execute(pragma)
+        self.saver = SqliteSaver(self.conn, serde=self.serde)
+        self.saver.setup()
+        with self.saver.cursor() as cur:
+            cur.execute(ACTIVITY_SCHEMA)
+
+        self._asaver: Optional[AsyncSqliteSaver] = None
+
+        self._closed = threading.Event()
+        if maintenance_interval_s > 0:
+            threading.Thread(target=self._maintenance_loop, name="checkpointer-maintenance", daemon=True).start()
+
+    # --- RETENTION SQL (shared by the sync and async paths) ---
+    def _retention_statements(self, config: RunnableConfig) -> List[Statement]:
+        thread_id = str(config["configurable"]["thread_id"])
+        statements = [(
+            "INSERT INTO thread_activity (thread_id, last_seen) VALUES (?, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET last_seen = excluded.last_seen",
+            (thread_id, time.time()),
+        )]
+        if self.keep_last > 0 and config["configurable"].get("checkpoint_ns", "") == "":
+            # checkpoint ids are time-ordered (uuid6), so "older than the K-th newest
+            # root checkpoint" is a plain string comparison across namespaces too.
+            cutoff = (
+                "(SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+                "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?)"
+            )
+            params = (thread_id, thread_id, self.keep_last - 1)
+            statements += [
+                (f"DELETE FROM writes WHERE thread_id = ? AND checkpoint_id < {cutoff}", params),
+                (f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id < {cutoff}", params),
+            ]
+        return statements
+
+    def _maintenance_statements(self) -> List[Statement]:
+        if self.thread_ttl_s <= 0:
+            return []
+        stale = "(SELECT thread_id FROM thread_activity WHERE last_seen < ?)"
+        cutoff = (time.time() - self.thread_ttl_s,)
+        return [
+            (f"DELETE FROM writes WHERE thread_id IN {stale}", cutoff),
+            (f"DELETE FROM checkpoints WHERE thread_id IN {stale}", cutoff),
+            ("DELETE FROM thread_activity WHERE last_seen < ?", cutoff),
+        ]
+
+    # --- SYNC (main.py) ---
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.saver.get_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        return self.saver.list(config, filter=filter, before=before, limit=limit)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        saved = self.saver.put(config, checkpoint, metadata, new_versions)
+        with self.saver.cursor() as cur:
+            for query, params in self._retention_statements(config):
+                cur.execute(query, params)
+        return saved
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]],
+                   task_id: str, task_path: str = "") -> None:
+        self.saver.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.saver.delete_thread(thread_id)
+        with self.saver.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    # --- ASYNC (Chainlit) ---
+    async def _async_saver(self) -> AsyncSqliteSaver:
+        loop = asyncio.get_running_loop()
+        if self._asaver is None or self._asaver.loop is not loop:
+            # aiosqlite connections are bound to the loop that opened them.
+            if self._asaver is not None:
+                self._asaver.conn.stop()
+            pending = aiosqlite.connect(self.path)
+            # Every commit is already on disk, so the worker thread must not
+            # keep the interpreter alive once the event loop is gone.
+            getattr(pending, "_thread", pending).daemon = True
+            conn = await pending
+            for pragma in PRAGMAS:
+                await conn.execute(pragma)
+            self._asaver = AsyncSqliteSaver(conn, serde=self.serde)
+        return self._asaver
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await (await self._async_saver()).aget_tuple(config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None,
+                    limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        saver = await self._async_saver()
+        async for item in saver.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        saver = await self._async_saver()
+        saved = await saver.aput(config, checkpoint, metadata, new_versions)
+        async with saver.lock:
+            for query, params in self._retention_statements(config):
+                await saver.conn.execute(query, params)
+            await saver.conn.commit()
+        return saved
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]],
+                          task_id: str, task_path: str = "") -> None:
+        await (await self._async_saver()).aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        saver = await self._async_saver()
+        await saver.adelete_thread(thread_id)
+        async with saver.lock:
+            await saver.conn.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+            await saver.conn.commit()
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        return self.saver.get_next_version(current, channel)
+
+    # --- MAINTENANCE (background thread) ---
+    def maintain(self):
+        """
+        Evicts idle threads, then VACUUMs and truncates the WAL. Runs on a
+        connection of its own: reads and writes don't wait on the savers'
+        locks, only on SQLite's busy_timeout while the VACUUM holds the
+        write lock.
+        """
+        t0 = time.perf_counter()
+        conn = sqlite3.connect(self.path)
+        try:
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            for query, params in self._maintenance_statements():
+                conn.execute(query, params)
+            conn.commit()
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+        print(f"[CHECKPOINTER] Maintenance done in {time.perf_counter() - t0:.2f}s")
+
+    def _maintenance_loop(self):
+        while not self._closed.wait(self.maintenance_interval_s):
+            try:
+                self.maintain()
+            except Exception as e:
+                print(f"[CHECKPOINTER ERROR] Maintenance failed: {e}")
+
+    def close(self):
+        """Stops the maintenance thread. The connections close with the process."""
+        self._closed.set()
 
 def get_checkpointer():
     """
-    Returns an In-Memory checkpointer.
-    
-    PROS:
-    - Fast
-    - No database locks
-    - Works with Async (Chainlit) and Sync (CLI)
-    
-    CONS:
-    - History is lost when the script stops.
+    Returns the conversation checkpointer.
+
+    "sqlite" (default): durable across restarts, pruned (see SqliteCheckpointer).
+    Works with Async (Chainlit) and Sync (CLI).
+    "memory": MemorySaver. Fast, but history is lost when the script stops and
+    every checkpoint stays in RAM.
     """
-    return MemorySaver()
\ No newline at end of file
+    if settings.CHECKPOINT_BACKEND == "memory":
+        return MemorySaver()
+    return SqliteCheckpointer(
+        settings.STATE_DB_PATH,
+        keep_last=settings.CHECKPOINT_KEEP_LAST,
+        thread_ttl_s=settings.CHECKPOINT_THREAD_TTL_HOURS * 3600,
+        maintenance_interval_s=settings.CHECKPOINT_MAINTENANCE_INTERVAL_S,
+    )
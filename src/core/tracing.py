@@ -0,0 +1,256 @@
+# src/core/tracing.py
+import os
+import json
+import time
+import threading
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.core.config import settings
+
+# Histogram buckets (seconds) for the Prometheus endpoint.
+BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+class Span:
+    __slots__ = ("span_id", "parent_id", "kind", "name", "node", "start", "t0", "end_t",
+                 "first_token_t", "ttft_s", "input_tokens", "output_tokens", "error")
+
+    def __init__(self, span_id: str, parent_id: Optional[str], kind: str, name: str, node: str):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.kind = kind            # "turn" | "graph" | "node" | "tool" | "llm"
+        self.name = name
+        self.node = node            # langgraph_node the span ran under
+        self.start = time.time()
+        self.t0 = time.perf_counter()
+        self.end_t: Optional[float] = None
+        self.first_token_t: Optional[float] = None
+        self.ttft_s: Optional[float] = None
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.error: Optional[str] = None
+
+    @property
+    def duration_s(self) -> float:
+        return (self.end_t or time.perf_counter()) - self.t0
+
+class TurnTracer(BaseCallbackHandler):
+    """
+    LangChain callback handler that turns one graph invocation into a span tree.
+    Recorded: the turn itself, every graph node (supervisor, workers, subgraph
+    nodes), nested subgraphs, every tool call and every chat-model request
+    (wall time, time-to-first-token, token counts). Internal runnables such as
+    prompts and routing functions are skipped; their children attach to the
+    nearest recorded ancestor.
+
+    When the root run ends the tree is appended to settings.TRACE_LOG_PATH
+    (one JSON object per span) and folded into the Prometheus counters. Past
+    settings.TRACE_LOG_MAX_MB the file is rotated to "<path>.1", so at most
+    twice that is kept on disk.
+    """
+    # Cheap bookkeeping only: run on the event loop instead of an executor.
+    run_inline = True
+
+    def __init__(self, log_path: Optional[str] = None):
+        self.log_path = log_path or settings.TRACE_LOG_PATH
+        self._lock = threading.Lock()
+        self._parents: Dict[str, Optional[str]] = {}    # every run -> parent run
+        self._spans: Dict[str, Span] = {}               # recorded runs only
+        self._traces: Dict[str, List[Span]] = {}        # root run -> its spans
+        self._roots: Dict[str, str] = {}                # run -> root run
+        self._threads: Dict[str, str] = {}              # root run -> thread_id
+
+        # Prometheus state
+        self.histograms: Dict[tuple, List[float]] = {}  # (kind, name) -> [bucket counts..., sum, count]
+        self.tokens: Dict[tuple, int] = {}              # (node, direction) -> tokens
+
+    # --- SPAN BOOKKEEPING ---
+    def _recorded_ancestor(self, parent_id: Optional[str]) -> Optional[str]:
+        while parent_id is not None and parent_id not in self._spans:
+            parent_id = self._parents.get(parent_id)
+        return parent_id
+
+    def _open(self, run_id: UUID, parent_run_id: Optional[UUID], kind: Optional[str],
+              name: str, metadata: Optional[Dict[str, Any]]):
+        run, parent = str(run_id), (str(parent_run_id) if parent_run_id else None)
+        with self._lock:
+            self._parents[run] = parent
+            root = self._roots.get(parent, run) if parent else run
+            self._roots[run] = root
+            if parent is None:
+                kind = "turn"
+                self._traces[root] = []
+                self._threads[root] = str((metadata or {}).get("thread_id", ""))
+            if kind is None:
+                return
+            span = Span(run, self._recorded_ancestor(parent), kind, name,
+                        (metadata or {}).get("langgraph_node", ""))
+            self._spans[run] = span
+            self._traces.setdefault(root, []).append(span)
+
+    def _close(self, run_id: UUID, error: Optional[BaseException] = None) -> Optional[Span]:
+        run = str(run_id)
+        with self._lock:
+            span = self._spans.get(run)
+            if span is not None:
+                span.end_t = time.perf_counter()
+                if error is not None:
+                    span.error = f"{type(error).__name__}: {error}"
+            finished = self._parents.get(run, "") is None
+        if finished:
+            self._flush(run)
+        return span
+
+    # --- CALLBACKS ---
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name", "")
+        node = (metadata or {}).get("langgraph_node")
+        if parent_run_id is not None and name == "LangGraph":
+            kind = "graph"      # nested subgraph (e.g. the home_agent pipeline)
+        elif node and name == node:
+            kind = "node"
+        else:
+            kind = None
+        self._open(run_id, parent_run_id, kind, name, metadata)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name", "tool")
+        self._open(run_id, parent_run_id, "tool", name, metadata)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = (metadata or {}).get("ls_model_name") or kwargs.get("name") or "chat_model"
+        self._open(run_id, parent_run_id, "llm", name, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self._open(run_id, parent_run_id, "llm", kwargs.get("name") or "llm", metadata)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        span = self._spans.get(str(run_id))
+        if span is not None and span.first_token_t is None:
+            span.first_token_t = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._close(run_id)
+        if span is None:
+            return
+        if span.first_token_t is not None:
+            span.ttft_s = span.first_token_t - span.t0
+        for generations in response.generations:
+            for gen in generations:
+                message = getattr(gen, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                span.input_tokens += usage.get("input_tokens", 0)
+                span.output_tokens += usage.get("output_tokens", 0)
+                if span.ttft_s is None:
+                    # Non-streaming call: Ollama reports load + prompt eval in nanoseconds.
+                    meta = getattr(message, "response_metadata", None) or {}
+                    ns = (meta.get("load_duration") or 0) + (meta.get("prompt_eval_duration") or 0)
+                    if ns:
+                        span.ttft_s = ns / 1e9
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error)
+
+    # --- OUTPUT ---
+    def _flush(self, root: str):
+        with self._lock:
+            spans = self._traces.pop(root, [])
+            thread_id = self._threads.pop(root, "")
+            for run in [r for r, rt in self._roots.items() if rt == root]:
+                self._roots.pop(run, None)
+                self._parents.pop(run, None)
+                self._spans.pop(run, None)
+
+            for span in spans:
+                self._observe(span)
+
+        if not spans or not self.log_path:
+            return
+        try:
+            self._rotate()
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                for span in spans:
+                    f.write(json.dumps({
+                        "trace_id": root,
+                        "thread_id": thread_id,
+                        "span_id": span.span_id,
+                        "parent_id": span.parent_id,
+                        "kind": span.kind,
+                        "name": span.name,
+                        "node": span.node,
+                        "start": span.start,
+                        "duration_s": round(span.duration_s, 6),
+                        "ttft_s": round(span.ttft_s, 6) if span.ttft_s is not None else None,
+                        "input_tokens": span.input_tokens,
+                        "output_tokens": span.output_tokens,
+                        "error": span.error,
+                    }) + "\n")
+        except Exception as e:
+            print(f"[TRACE ERROR]: Could not write {self.log_path}: {e}")
+
+    def _rotate(self):
+        limit = settings.TRACE_LOG_MAX_MB * 1024 * 1024
+        if limit > 0 and os.path.exists(self.log_path) and os.path.getsize(self.log_path) >= limit:
+            os.replace(self.log_path, self.log_path + ".1")
+
+    def _observe(self, span: Span):
+        # Model requests are labelled by the node that made them (supervisor, executor, ...).
+        label = (span.node or span.name) if span.kind == "llm" else span.name
+        hist = self.histograms.setdefault((span.kind, label), [0.0] * (len(BUCKETS) + 2))
+        for i, bound in enumerate(BUCKETS):
+            if span.duration_s <= bound:
+                hist[i] += 1
+        hist[-2] += span.duration_s
+        hist[-1] += 1
+        if span.kind == "llm":
+            for direction, count in (("input", span.input_tokens), ("output", span.output_tokens)):
+                key = (label, direction)
+                self.tokens[key] = self.tokens.get(key, 0) + count
+
+    def prometheus_text(self) -> str:
+        """Span latency histograms and token counters in Prometheus text format."""
+        lines = [
+            "# HELP glados_span_duration_seconds Wall time of graph turns, nodes, tools and model requests.",
+            "# TYPE glados_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            histograms = dict(self.histograms)
+            tokens = dict(self.tokens)
+        for (kind, name), hist in sorted(histograms.items()):
+            labels = f'kind="{kind}",name="{name}"'
+            for bound, count in zip(BUCKETS, hist):
+                lines.append(f'glados_span_duration_seconds_bucket{{{labels},le="{bound}"}} {int(count)}')
+            lines.append(f'glados_span_duration_seconds_bucket{{{labels},le="+Inf"}} {int(hist[-1])}')
+            lines.append(f"glados_span_duration_seconds_sum{{{labels}}} {hist[-2]:.6f}")
+            lines.append(f"glados_span_duration_seconds_count{{{labels}}} {int(hist[-1])}")
+
+        lines += [
+            "# HELP glados_llm_tokens_total Tokens sent to / received from Ollama, by calling node.",
+            "# TYPE glados_llm_tokens_total counter",
+        ]
+        for (node, direction), count in sorted(tokens.items()):
+            lines.append(f'glados_llm_tokens_total{{node="{node}",direction="{direction}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+# Process-wide tracer shared by main.py and the Chainlit app.
+tracer = TurnTracer()
+
+def traced(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds the tracer to a graph config when tracing is enabled."""
+    if not settings.TRACING_ENABLED:
+        return config
+    return {**config, "callbacks": [*(config.get("callbacks") or []), tracer]}
@@ -4,11 +4,20 @@ from langchain_qdrant import QdrantVectorStore
 from src.core.config import settings
 from src.core.llm import get_embeddings
 
+# Local mode locks its directory, so the process shares one embedded client.
+_local_client = None
+
 def get_qdrant_client() -> QdrantClient:
     """
     Returns the raw Qdrant client.
     Used for administrative tasks: creating collections, deleting data, checking health.
     """
+    global _local_client
+    if settings.QDRANT_LOCAL_PATH:
+        if _local_client is None:
+            _local_client = QdrantClient(path=settings.QDRANT_LOCAL_PATH)
+        return _local_client
+
     return QdrantClient(
         url=settings.QDRANT_URL,  # Loaded from .env (http://10.0.0.201:6333)
         timeout=60,               # Increased timeout to prevent crashes on large queries
@@ -1,80 +1,524 @@
 # src/core/voice.py
 import io
+import os
+import re
+import time
 import wave
-from typing import Optional
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from src.core.config import settings
 from wyoming.client import AsyncTcpClient
 from wyoming.event import Event
-from wyoming.audio import AudioChunk, AudioStart, AudioStop 
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
 
-async def generate_speech(text: str) -> Optional[bytes]:
-    """
-    Connects to the Piper Wyoming Docker container via TCP.
-    Sends text -> Receives Raw PCM -> Converts to WAV -> Returns Bytes.
-    """
-    if not text or not text.strip():
-        return None
+# (pcm, sample_rate, sample_width, channels)
+Pcm = Tuple[bytes, int, int, int]
+
+class PiperConnectionLost(ConnectionError):
+    """Piper closed the connection before sending any audio."""
 
+async def _request(client: AsyncTcpClient, text: str) -> Tuple[Optional[Pcm], bool]:
+    """One synthesize exchange on an open connection: (pcm, connection still usable)."""
     # Default settings (will be updated by the AudioStart event)
     audio_data = bytearray()
     sample_rate = 22050
     sample_width = 2
     channels = 1
 
+    # We manually build the payload to avoid typing issues with the Synthesize helper.
+    # Piper expects 'voice' to be a dictionary with 'name'.
+    payload = {
+        "text": text,
+        "voice": {"name": settings.PIPER_VOICE_ID}
+    }
+    await client.write_event(Event(type="synthesize", data=payload))
+
+    reusable = False
+    while True:
+        event = await client.read_event()
+        if event is None:
+            # Older servers hang up after each request instead of sending AudioStop.
+            if not audio_data:
+                raise PiperConnectionLost("Piper closed the connection")
+            break
+
+        if AudioStart.is_type(event.type):
+            start = AudioStart.from_event(event)
+            sample_rate = start.rate
+            sample_width = start.width
+            channels = start.channels
+
+        elif AudioChunk.is_type(event.type):
+            chunk = AudioChunk.from_event(event)
+            audio_data.extend(chunk.audio)
+
+        elif AudioStop.is_type(event.type):
+            reusable = True
+            break
+
+    if not audio_data:
+        print("[VOICE WARNING] Piper returned no audio data.")
+        return None, reusable
+    return (bytes(audio_data), sample_rate, sample_width, channels), reusable
+
+async def _close(client: AsyncTcpClient):
     try:
-        # 1. Connect to Unraid
-        client = AsyncTcpClient(settings.UNRAID_IP, settings.PORT_PIPER)
+        await client.disconnect()
+    except Exception:
+        pass
+
+# --- CONNECTION POOL ---
+class PiperPool:
+    """
+    Keeps Wyoming connections to Piper open between requests, so a sentence
+    doesn't pay a TCP handshake. Before reuse, a connection is dropped if the
+    server has closed it or it sat idle past VOICE_POOL_IDLE_S (Docker/NAT
+    may have forgotten it). A request that fails on a reused connection is
+    retried once on a fresh one.
+    Connections belong to an event loop, so the pool empties when the loop changes.
+    """
+    def __init__(self):
+        self._idle: List[Tuple[AsyncTcpClient, float]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"connects": 0, "reuses": 0, "stale": 0, "retries": 0}
+
+    def _healthy(self, client: AsyncTcpClient, idle_since: float) -> bool:
+        reader = client._reader
+        return (reader is not None and not reader.at_eof()
+                and time.monotonic() - idle_since < settings.VOICE_POOL_IDLE_S)
+
+    async def _acquire(self, fresh: bool = False) -> Tuple[AsyncTcpClient, bool]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._idle, self._loop = [], loop
+        while self._idle and not fresh:
+            client, idle_since = self._idle.pop()
+            if self._healthy(client, idle_since):
+                self.stats["reuses"] += 1
+                return client, True
+            self.stats["stale"] += 1
+            await _close(client)
+
+        client = AsyncTcpClient(settings.UNRAID_IP, settings.PORT_PIPER,
+                                connect_timeout=settings.VOICE_CONNECT_TIMEOUT_S,
+                                read_timeout=settings.VOICE_READ_TIMEOUT_S)
         await client.connect()
+        self.stats["connects"] += 1
+        return client, False
 
-        # 2. Send Request (Manual Event Construction)
-        # We manually build the payload to avoid typing issues with the Synthesize helper.
-        # Piper expects 'voice' to be a dictionary with 'name'.
-        payload = {
-            "text": text,
-            "voice": {"name": settings.PIPER_VOICE_ID} 
-        }
-        
-        # Create the raw Wyoming Event
-        event = Event(type="synthesize", data=payload)
-        
-        await client.write_event(event)
-
-        # 3. Read Response Stream
-        while True:
-            event = await client.read_event()
-            if event is None:
-                break
+    async def _release(self, client: AsyncTcpClient, reusable: bool):
+        if reusable and len(self._idle) < settings.VOICE_POOL_SIZE and self._healthy(client, time.monotonic()):
+            self._idle.append((client, time.monotonic()))
+        else:
+            await _close(client)
 
-            if AudioStart.is_type(event.type):
-                start = AudioStart.from_event(event)
-                sample_rate = start.rate
-                sample_width = start.width
-                channels = start.channels
+    async def synthesize(self, text: str) -> Optional[Pcm]:
+        client, reused = await self._acquire()
+        try:
+            pcm, reusable = await _request(client, text)
+        except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+            await _close(client)
+            if not reused:
+                raise
+            # The server dropped a pooled connection; one retry on a new one.
+            self.stats["retries"] += 1
+            client, _ = await self._acquire(fresh=True)
+            try:
+                pcm, reusable = await _request(client, text)
+            except BaseException:
+                await _close(client)
+                raise
+        except BaseException:
+            # Cancelled or timed out mid-stream: the connection is in an unknown state.
+            await _close(client)
+            raise
+        await self._release(client, reusable)
+        return pcm
 
-            elif AudioChunk.is_type(event.type):
-                chunk = AudioChunk.from_event(event)
-                audio_data.extend(chunk.audio)
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for client, _ in idle:
+            await _close(client)
 
-            elif AudioStop.is_type(event.type):
-                break
+# --- AUDIO CACHE ---
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
 
-        await client.disconnect()
+class AudioCache:
+    """
+    Content-addressed cache of synthesized speech, keyed by (voice id, normalized text).
+
+    The memory LRU is only touched from the event loop; disk reads and writes
+    run in worker threads. A byte-bounded LRU in memory in front of a directory of WAV files
+    (also byte-bounded, least recently used files are pruned first), so
+    stock phrases survive restarts. Only texts up to VOICE_CACHE_MAX_CHARS
+    are stored: long answers never repeat and would only evict phrases that do.
+    """
+    def __init__(self, directory: str, memory_bytes: int, disk_bytes: int):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory: "OrderedDict[str, Pcm]" = OrderedDict()
+        self._memory_used = 0
+        self._disk_used: Optional[int] = None  # Scanned on first write
+        self._disk_lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(f"{settings.PIPER_VOICE_ID}\0{_normalize(text)}".encode()).hexdigest()[:32]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def remember(self, key: str, pcm: Pcm):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = pcm
+        self._memory_used += len(pcm[0])
+        while self._memory_used > self.memory_bytes and len(self._memory) > 1:
+            _, old = self._memory.popitem(last=False)
+            self._memory_used -= len(old[0])
+            self.stats["evictions"] += 1
+
+    def get_memory(self, key: str) -> Optional[Pcm]:
+        pcm = self._memory.get(key)
+        if pcm is not None:
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+        return pcm
 
-        if not audio_data:
-            print("[VOICE WARNING] Piper returned no audio data.")
+    def read_disk(self, key: str) -> Optional[Pcm]:
+        """Blocking; call from a worker thread."""
+        if not self.directory:
             return None
+        path = self._path(key)
+        try:
+            with wave.open(path, "rb") as wav_file:
+                pcm = (wav_file.readframes(wav_file.getnframes()), wav_file.getframerate(),
+                       wav_file.getsampwidth(), wav_file.getnchannels())
+            os.utime(path)  # mtime doubles as the disk LRU clock
+        except (FileNotFoundError, wave.Error, EOFError):
+            return None
+        return pcm
+
+    def write_disk(self, key: str, pcm: Pcm):
+        """Blocking; call from a worker thread."""
+        if not self.directory or self.disk_bytes <= 0:
+            return
+        path = self._path(key)
+        data = _to_wav(pcm)
+        with self._disk_lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                if self._disk_used is None:
+                    self._disk_used = sum(entry.stat().st_size for entry in os.scandir(self.directory)
+                                          if entry.name.endswith(".wav"))
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"[VOICE WARNING] Could not write the audio cache: {e}")
+                return
+            self._disk_used += len(data)
+            if self._disk_used > self.disk_bytes:
+                self._prune()
+
+    def _prune(self):
+        files = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith(".wav")),
+                       key=lambda entry: entry.stat().st_mtime)
+        used = sum(entry.stat().st_size for entry in files)
+        target = int(self.disk_bytes * 0.9)  # Headroom, so every write doesn't rescan
+        for entry in files:
+            if used <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            used -= size
+            self.stats["disk_evictions"] += 1
+        self._disk_used = used
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"[VOICE] Audio cache: {self.hit_rate():.0%} hit rate ({s['memory_hits']} memory, "
+                f"{s['disk_hits']} disk, {s['misses']} synthesized), {len(self._memory)} clips / "
+                f"{self._memory_used / 1e6:.1f} MB in memory.")
+
+# Process-wide pool and cache, shared by one-shot and streaming speech.
+pool = PiperPool()
+cache = AudioCache(settings.VOICE_CACHE_DIR, int(settings.VOICE_CACHE_MEMORY_MB * 1e6),
+                   int(settings.VOICE_CACHE_DISK_MB * 1e6))
+_inflight: Dict[str, "asyncio.Future[Optional[Pcm]]"] = {}
+
+async def _synthesize(text: str) -> Optional[Pcm]:
+    """Text in, raw PCM out: memory cache, then disk cache, then Piper."""
+    if len(text) > settings.VOICE_CACHE_MAX_CHARS:
+        return await pool.synthesize(text)
+
+    key = cache.key(text)
+    pcm = cache.get_memory(key)
+    if pcm is not None:
+        return pcm
+    # Identical text already being synthesized (e.g. by the pre-warm): share it.
+    pending = _inflight.get(key)
+    if pending is not None:
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise
+            # Only the other request was cancelled (a retracted answer); synthesize ourselves.
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        pcm = await asyncio.to_thread(cache.read_disk, key)
+        if pcm is not None:
+            cache.stats["disk_hits"] += 1
+            cache.remember(key, pcm)
+        else:
+            cache.stats["misses"] += 1
+            pcm = await pool.synthesize(text)
+            if pcm is not None:
+                cache.remember(key, pcm)
+                await asyncio.to_thread(cache.write_disk, key, pcm)
+        future.set_result(pcm)
+        return pcm
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved: there may be no other waiter
+        raise
+    finally:
+        if _inflight.get(key) is future:
+            _inflight.pop(key)
+
+async def prewarm(phrases: Optional[List[str]] = None):
+    """Synthesizes the stock phrases not cached yet (runs in the background at startup)."""
+    phrases = settings.VOICE_PREWARM_PHRASES if phrases is None else phrases
+    t0 = time.monotonic()
+    misses = cache.stats["misses"]
+    for phrase in phrases:
+        try:
+            await _synthesize(phrase)
+        except Exception as e:
+            print(f"[VOICE WARNING] Pre-warm stopped, Piper unavailable: {e}")
+            return
+    print(f"[VOICE] Pre-warmed {len(phrases)} phrases ({cache.stats['misses'] - misses} synthesized) "
+          f"in {time.monotonic() - t0:.2f}s.")
 
-        # 4. Convert Raw PCM to WAV
-        # Browsers require a WAV container header to play the audio.
-        wav_buffer = io.BytesIO()
-        with wave.open(wav_buffer, "wb") as wav_file:
-            wav_file.setnchannels(channels)
-            wav_file.setsampwidth(sample_width)
-            wav_file.setframerate(sample_rate)
-            wav_file.writeframes(audio_data)
-        
-        return wav_buffer.getvalue()
+def prometheus_text() -> str:
+    """Audio cache and Piper connection counters in Prometheus text format."""
+    lines = [
+        "# HELP glados_voice_cache_total Speech clips served from the audio cache or synthesized by Piper.",
+        "# TYPE glados_voice_cache_total counter",
+    ]
+    for result in ("memory_hits", "disk_hits", "misses", "evictions", "disk_evictions"):
+        lines.append(f'glados_voice_cache_total{{result="{result}"}} {cache.stats[result]}')
+    lines += [
+        "# HELP glados_voice_connections_total Wyoming connections to Piper opened, reused, dropped as stale or retried.",
+        "# TYPE glados_voice_connections_total counter",
+    ]
+    for event in ("connects", "reuses", "stale", "retries"):
+        lines.append(f'glados_voice_connections_total{{event="{event}"}} {pool.stats[event]}')
+    return "\n".join(lines) + "\n"
 
+def _to_wav(pcm: Pcm) -> bytes:
+    # Browsers require a WAV container header to play the audio.
+    audio, rate, width, channels = pcm
+    wav_buffer = io.BytesIO()
+    with wave.open(wav_buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(width)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(audio)
+    return wav_buffer.getvalue()
+
+def _duration(pcm: Pcm) -> float:
+    audio, rate, width, channels = pcm
+    return len(audio) / float(rate * width * channels)
+
+async def generate_speech(text: str) -> Optional[bytes]:
+    """
+    Connects to the Piper Wyoming Docker container via TCP.
+    Sends text -> Receives Raw PCM -> Converts to WAV -> Returns Bytes.
+    """
+    if not text or not text.strip():
+        return None
+
+    try:
+        pcm = await _synthesize(text)
+        return _to_wav(pcm) if pcm else None
     except Exception as e:
         print(f"[VOICE ERROR] Wyoming Protocol Failed: {e}")
-        return None
\ No newline at end of file
+        return None
+
+# --- STREAMING SPEECH ---
+def speakable(text: str) -> str:
+    """Markdown -> something Piper can read aloud."""
+    text = re.sub(r"\[([^\]]+)\]\([^)]*\)", r"\1", text)    # [label](url) -> label
+    text = re.sub(r"^\s*(#+|[-*+]|\d+\.)\s+", "", text, flags=re.MULTILINE)  # headers, bullets
+    text = re.sub(r"[*_`|>]+", "", text)                     # emphasis, inline code, tables, quotes
+    return re.sub(r"\s+", " ", text).strip()
+
+# End of a sentence: punctuation (+ closing quote/bracket) then whitespace, or a line break.
+SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+|\n+")
+
+class SentenceSplitter:
+    """
+    Turns a token stream into speakable chunks as soon as sentences complete.
+    Fenced code blocks are dropped incrementally (the fence may arrive split
+    across tokens). The first chunk is emitted as early as possible; later
+    ones are batched up to `min_chars` so Piper gets fewer, longer requests.
+    """
+    def __init__(self, first_min_chars: int = 20, min_chars: int = 120):
+        self.first_min_chars = first_min_chars
+        self.min_chars = min_chars
+        self._raw = ""          # not yet checked for code fences
+        self._text = ""         # prose waiting for a sentence boundary
+        self._in_code = False
+        self._emitted = 0
+
+    def _strip_code(self):
+        while True:
+            fence = self._raw.find("```")
+            if self._in_code:
+                if fence < 0:
+                    self._raw = self._raw[-2:]  # could be the start of the closing fence
+                    return
+                self._raw, self._in_code = self._raw[fence + 3:], False
+                continue
+            if fence < 0:
+                # Hold back trailing backticks: they may become a fence with the next token.
+                keep = len(self._raw) - len(self._raw.rstrip("`"))
+                self._text += self._raw[:len(self._raw) - keep]
+                self._raw = self._raw[len(self._raw) - keep:]
+                return
+            self._text += self._raw[:fence]
+            self._raw, self._in_code = self._raw[fence + 3:], True
+
+    def feed(self, token: str) -> List[str]:
+        self._raw += token
+        self._strip_code()
+
+        chunks = []
+        while True:
+            target = self.first_min_chars if self._emitted == 0 and not chunks else self.min_chars
+            end = None
+            for match in SENTENCE_END.finditer(self._text):
+                end = match.end()
+                if end >= target:
+                    break
+            if end is None or end < target:
+                return chunks
+            chunk, self._text = speakable(self._text[:end]), self._text[end:]
+            if chunk:
+                chunks.append(chunk)
+                self._emitted += 1
+
+    def flush(self) -> List[str]:
+        rest = "" if self._in_code else self._raw
+        chunk, self._text, self._raw = speakable(self._text + rest), "", ""
+        return [chunk] if chunk else []
+
+class AudioPacer:
+    """
+    Sends clips so each one starts when the previous one finishes playing
+    (clips auto-play on arrival). Shared by every speech stream of a turn,
+    so fanned-out answers don't talk over each other.
+    """
+    LEAD_S = 0.15  # Send slightly early to cover network + decode time
+
+    def __init__(self):
+        self._free_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def play(self, send: Callable[[bytes], Awaitable[None]], wav: bytes, duration_s: float):
+        async with self._lock:
+            wait = self._free_at - time.monotonic() - self.LEAD_S
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await send(wav)
+            self._free_at = max(time.monotonic(), self._free_at) + duration_s
+
+class SpeechStream:
+    """
+    Speaks an answer while it is still being generated.
+
+    feed() tokens as they arrive; each completed chunk is synthesized right
+    away (up to VOICE_TTS_CONCURRENCY at once) and handed to `send` in order
+    through the pacer. close() flushes the tail; cancel() drops what hasn't
+    played yet (e.g. the text turned out to be a preamble to tool calls).
+    """
+    def __init__(self, send: Callable[[bytes], Awaitable[None]], pacer: Optional[AudioPacer] = None):
+        self.send = send
+        self.pacer = pacer or AudioPacer()
+        self.splitter = SentenceSplitter(settings.VOICE_FIRST_CHUNK_CHARS, settings.VOICE_CHUNK_CHARS)
+        self._semaphore = asyncio.Semaphore(settings.VOICE_TTS_CONCURRENCY)
+        self._jobs: asyncio.Queue = asyncio.Queue()
+        self._consumer = asyncio.create_task(self._deliver())
+        self.t0 = time.monotonic()
+        self.first_audio_s: Optional[float] = None
+        self.clips = 0
+        self.audio_s = 0.0
+
+    async def _tts(self, text: str) -> Optional[Pcm]:
+        async with self._semaphore:
+            try:
+                return await _synthesize(text)
+            except Exception as e:
+                print(f"[VOICE ERROR] Wyoming Protocol Failed: {e}")
+                return None
+
+    def _submit(self, chunks: List[str]):
+        for chunk in chunks:
+            self._jobs.put_nowait(asyncio.create_task(self._tts(chunk)))
+
+    def feed(self, token: str):
+        self._submit(self.splitter.feed(token))
+
+    async def _deliver(self):
+        while True:
+            job = await self._jobs.get()
+            if job is None:
+                return
+            pcm = await job
+            if not pcm:
+                continue
+            duration = _duration(pcm)
+            await self.pacer.play(self.send, _to_wav(pcm), duration)
+            if self.first_audio_s is None:
+                self.first_audio_s = time.monotonic() - self.t0
+            self.clips += 1
+            self.audio_s += duration
+
+    async def close(self):
+        """Speaks the remaining text and waits until every clip has been sent."""
+        self._submit(self.splitter.flush())
+        self._jobs.put_nowait(None)
+        await self._consumer
+        if self.clips:
+            print(f"[VOICE] First audio {self.first_audio_s:.2f}s after the first token "
+                  f"({self.clips} clips, {self.audio_s:.1f}s of speech).")
+
+    def cancel(self):
+        self._consumer.cancel()
+        while not self._jobs.empty():
+            job = self._jobs.get_nowait()
+            if job is not None:
+                job.cancel()
@@ -0,0 +1,94 @@
+# src/orchestrator/capabilities.py
+import time
+import threading
+import importlib
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+class CapabilityRegistry:
+    """
+    Lazy loader for worker subgraphs.
+    Nothing under src/capabilities is imported until a worker is first
+    dispatched (or warmed up in the background). Each capability is loaded
+    once; the import and the build/compile are timed separately for the
+    startup report. `on_load(name, module)` runs before the worker is handed
+    out (the orchestrator wraps tools there). Callables in `preload` run at
+    the start of the warm-up, for other startup work that should stay off
+    the first request.
+    """
+    def __init__(self, specs: Dict[str, Dict[str, str]],
+                 on_load: Optional[Callable[[str, Any], None]] = None):
+        # {"home_agent": {"module": "src.capabilities.home_control.agent", "builder": "build_home_agent"}}
+        self.specs = specs
+        self.on_load = on_load
+        self._agents: Dict[str, Any] = {}
+        self._locks = {name: threading.Lock() for name in specs}
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self.preload: List[Callable[[], Any]] = []
+        self._warm_up_thread: Optional[threading.Thread] = None
+
+    def get(self, name: str):
+        """Returns the compiled worker, importing and building it on first use."""
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+
+        with self._locks[name]:
+            if name not in self._agents:
+                spec = self.specs[name]
+
+                t0 = time.perf_counter()
+                module = importlib.import_module(spec["module"])
+                t1 = time.perf_counter()
+                agent = getattr(module, spec["builder"])()
+                if self.on_load is not None:
+                    self.on_load(name, module)
+                t2 = time.perf_counter()
+
+                self.timings[name] = {"import_s": t1 - t0, "build_s": t2 - t1}
+                self._agents[name] = agent
+                print(f"[CAPABILITIES] Loaded {name} (import {t1 - t0:.2f}s, build {t2 - t1:.2f}s)")
+        return self._agents[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._agents
+
+    def warm_up(self, names: Optional[Iterable[str]] = None):
+        """Runs `preload`, then loads the given capabilities (default: all). Errors are logged, not raised."""
+        for job in self.preload:
+            try:
+                job()
+            except Exception as e:
+                print(f"[CAPABILITIES ERROR] Preload {getattr(job, '__qualname__', job)} failed: {e}")
+        for name in names or self.specs:
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"[CAPABILITIES ERROR] Warm-up of {name} failed: {e}")
+
+    def start_background_warm_up(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Starts warm_up() in a daemon thread once; later calls return the same thread."""
+        if self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(
+                target=self.warm_up, args=(names,), name="capability-warm-up", daemon=True
+            )
+            self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def startup_report(self) -> str:
+        """Per-capability import/build cost of everything loaded so far."""
+        lines = ["### STARTUP REPORT", f"{'capability':<18}{'import':>10}{'build':>10}{'total':>10}"]
+        total_import = total_build = 0.0
+        for name in self.specs:
+            t = self.timings.get(name)
+            if not t:
+                lines.append(f"{name:<18}{'(not loaded)':>30}")
+                continue
+            total_import += t["import_s"]
+            total_build += t["build_s"]
+            lines.append(
+                f"{name:<18}{t['import_s']:>9.2f}s{t['build_s']:>9.2f}s{t['import_s'] + t['build_s']:>9.2f}s"
+            )
+        lines.append(
+            f"{'TOTAL':<18}{total_import:>9.2f}s{total_build:>9.2f}s{total_import + total_build:>9.2f}s"
+        )
+        return "\n".join(lines)
@@ -1,53 +1,144 @@
 # src/orchestrator/graph.py
 import json
-from langchain_core.messages import SystemMessage
+import time
+import asyncio
+from langchain_core.messages import SystemMessage, HumanMessage
 from langgraph.graph import StateGraph, END, START
+from langgraph.types import Send
+from langchain_core.runnables import RunnableConfig
 
+from src.core.config import settings
 from src.core.llm import get_llm
+from src.core.context import build_context, summarize_evicted, asummarize_evicted
 from src.core.persistence import get_checkpointer
 from src.orchestrator.state import GlobalState
+from src.orchestrator.router import TriggerRouter, latest_human_text, looks_compound, log_decision
+from src.orchestrator.semantic_router import SemanticRouter
+from src.orchestrator.capabilities import CapabilityRegistry
+from src.orchestrator.speculation import speculator
 from src.utils.parsing import parse_json_markdown
+from src.utils.async_tools import dual_node
 
-# IMPORT AGENTS
-from src.capabilities.research.agent import research_agent
-from src.capabilities.home_control.agent import home_agent
-from src.capabilities.system_admin.agent import system_admin_agent
-from src.capabilities.finance.agent import finance_agent
-from src.capabilities.scheduler.agent import scheduler_agent
+_graph_t0 = time.perf_counter()
 
 # --- DYNAMIC REGISTRY ---
 WORKER_REGISTRY = {
     "home_agent": {
         "description": "Controls physical smart devices (lights, switches, locks, thermostat, garage).",
-        "triggers": ["turn on", "turn off", "lights", "garage", "temperature", "switch", "status"]
+        "module": "src.capabilities.home_control.agent",
+        "builder": "build_home_agent",
+        "triggers": ["turn on", "turn off", "lights", "garage", "temperature", "switch", "status"],
+        "patterns": [r"\b(dim|brighten)\b", r"\b(un)?lock\b", r"\bset (the )?thermostat\b"],
+        "examples": [
+            "Turn off the kitchen lights",
+            "Dim the living room to 30 percent",
+            "Is the front door locked?",
+            "Set the thermostat to 70",
+            "Open the garage door",
+        ]
     },
     "research_agent": {
         "description": "Searches documents, manuals, receipts, and saved knowledge in the Vector DB.",
-        "triggers": ["how do i", "warranty", "manual", "receipt", "who makes", "specs"]
+        "module": "src.capabilities.research.agent",
+        "builder": "build_research_agent",
+        "triggers": ["how do i", "warranty", "manual", "receipt", "who makes", "specs"],
+        "patterns": [r"\b(search|look up) (my )?(documents|docs|knowledge)\b"],
+        "examples": [
+            "Is my blender still under warranty?",
+            "How do I descale the coffee machine?",
+            "Find the receipt for the washing machine",
+            "What does the manual say about the filter?",
+        ]
     },
     "system_admin": {
         "description": "Manages server infrastructure, checks installed AI models, and monitors system status.",
-        "triggers": ["list models", "what models", "ollama", "server status", "unraid"]
+        "module": "src.capabilities.system_admin.agent",
+        "builder": "build_system_admin_agent",
+        "triggers": ["list models", "what models", "ollama", "server status", "unraid"],
+        "patterns": [r"\bmodels? (are )?installed\b"],
+        "examples": [
+            "Which AI models do we have?",
+            "Is the server healthy?",
+            "Show me the Ollama models",
+            "How big is the qwen model?",
+        ]
     },
     "finance_agent": {
         "description": "Analyzes spending history, amazon orders, and financial totals.",
-        "triggers": ["how much did i spend", "price of", "amazon history", "bought", "cost"]
+        "module": "src.capabilities.finance.agent",
+        "builder": "build_finance_agent",
+        "triggers": ["how much did i spend", "price of", "amazon history", "bought", "cost"],
+        "patterns": [r"\bamazon orders?\b", r"\bspen[dt] on\b"],
+        "examples": [
+            "How much did I spend on Amazon last year?",
+            "When did I buy the UPS?",
+            "List my most expensive orders",
+            "What was the total for groceries in March?",
+        ]
     },
     "scheduler_agent": {
         "description": "Handles the Morning Briefing, Calendar Events, Weather, and Maintenance Logs.",
-        "triggers": ["morning briefing", "schedule", "calendar", "weather", "maintenance"]
+        "module": "src.capabilities.scheduler.agent",
+        "builder": "build_scheduler_agent",
+        "triggers": ["morning briefing", "schedule", "calendar", "weather", "maintenance"],
+        "patterns": [r"\bwhat'?s on (the|my) agenda\b", r"\bstart my day\b"],
+        "examples": [
+            "Good morning, what's today look like?",
+            "Do I have anything on the calendar tomorrow?",
+            "Will it rain today?",
+            "I changed the fridge filter",
+            "Is any maintenance due?",
+        ]
     },
     "general_chat": {
         "description": "Handles casual conversation, jokes, greetings, and personality.",
-        "triggers": ["hello", "joke", "who are you", "hi"]
+        "triggers": ["hello", "joke", "who are you", "hi"],
+        "patterns": [r"^(hey|thanks|thank you)\b"],
+        "examples": [
+            "Tell me something funny",
+            "How are you today?",
+            "What's your name?",
+            "Thanks, that's all",
+        ]
     }
 }
 
+# --- LAZY CAPABILITIES ---
+# Worker subgraphs (and their model clients) are built on first dispatch or by
+# the background warm-up, not when this module is imported.
+# Their read-only tools are wrapped for speculation as they load (see SPECULATIVE_CALLS).
+capabilities = CapabilityRegistry({
+    name: {"module": info["module"], "builder": info["builder"]}
+    for name, info in WORKER_REGISTRY.items() if "module" in info
+}, on_load=speculator.wrap_tools)
+
+# --- FAST-PATH ROUTER ---
+# Built once from the registry; answers single-intent turns without an LLM call.
+fast_router = TriggerRouter(
+    WORKER_REGISTRY,
+    aliases=settings.ROUTER_ALIASES,
+    patterns=settings.ROUTER_PATTERNS,
+    min_score=settings.FAST_ROUTER_MIN_SCORE,
+)
+
+# --- SEMANTIC ROUTER ---
+# Second tier: nearest worker by embedding similarity. The example bank is
+# embedded by the background warm-up (or on first use) and cached on disk.
+semantic_router = SemanticRouter(
+    WORKER_REGISTRY,
+    cache_path=settings.SEMANTIC_ROUTER_CACHE_PATH,
+    min_similarity=settings.SEMANTIC_ROUTER_MIN_SIMILARITY,
+    margin=settings.SEMANTIC_ROUTER_MARGIN,
+)
+if settings.SEMANTIC_ROUTER_ENABLED:
+    capabilities.preload.append(semantic_router.warm_up)
+
 # --- TOOL MAPPING (Recovery) ---
 TOOL_TO_AGENT = {
     "get_active_domains": "home_agent",
     "list_entities_in_domain": "home_agent",
     "control_device": "home_agent",
+    "control_devices": "home_agent",
     "search_knowledge_base": "research_agent",
     "list_ollama_models": "system_admin",
     "query_amazon_orders": "finance_agent",
@@ -77,26 +168,105 @@ Your job is to schedule the next step in the workflow.
    - Example: User said "Lights and Joke". History has "Lights off" and "Joke". -> Next: "FINISH".
 3. If the user's request is fully satisfied, route to "FINISH".
 4. If the user's request is simple chat, route to "general_chat", then "FINISH" after that.
+5. On a NEW user request, also list every worker the request needs in "plan" (in order).
+   - Example: "Lights and Joke" -> "plan": ["home_agent", "general_chat"].
+   - Example: "What models are installed?" -> "plan": ["system_admin"].
+6. If the planned workers do NOT depend on each other's results, add "parallel": true
+   and they will run at the same time.
+   - Example: "Morning briefing and turn on the kitchen lights" -> parallel.
+   - Example: "If it's raining, close the garage" -> NOT parallel (the garage depends on the weather).
 
 ### OUTPUT FORMAT
 Return strictly valid JSON:
-{{"next_step": "WORKER_NAME"}}
+{{"next_step": "WORKER_NAME", "plan": ["WORKER_NAME", ...], "parallel": false}}
 or
 {{"next_step": "FINISH"}}
 """
 
-def supervisor_node(state: GlobalState):
-    system_prompt = build_supervisor_prompt()
+def _dispatch(state: GlobalState, next_step: str, source: str, plan=None, fanout=None):
+    """
+    Builds the supervisor's state update.
+    A `plan` is only passed at the start of a turn and replaces the previous
+    turn's plan; mid-turn decisions keep the plan and just record the dispatch.
+    A `fanout` list dispatches several independent workers at once.
+    """
+    if plan is None:
+        plan = state.get("plan") or []
+        dispatched = list(state.get("dispatched") or [])
+    else:
+        dispatched = []
+
+    fanout = fanout or []
+    for worker in fanout or [next_step]:
+        if worker in WORKER_REGISTRY:
+            dispatched.append(worker)
+
+    return {
+        "next_step": next_step,
+        "route_source": source,
+        "plan": plan,
+        "dispatched": dispatched,
+        "fanout": fanout,
+    }
+
+def _turn_info(state: GlobalState):
+    """(latest user text, is this the start of a turn, does it look compound)."""
+    user_text = latest_human_text(state["messages"])
+    turn_start = bool(state["messages"]) and isinstance(state["messages"][-1], HumanMessage)
+
+    # A pre-routed compound request ("... and ...") gets no plan, so the
+    # supervisor loop stays in charge of the remaining parts.
+    return user_text, turn_start, looks_compound(user_text)
+
+def _fast_path(state: GlobalState, user_text: str, compound: bool):
+    # --- FAST PATH ---
+    # Only at the start of a turn: a single confident trigger match skips the LLM.
+    if settings.FAST_ROUTER_ENABLED and user_text:
+        worker, scores = fast_router.route(user_text)
+        if worker:
+            log_decision("fast_path", worker, f"scores={scores}")
+            return _dispatch(state, worker, "fast_path", [] if compound else [worker])
+    return None
+
+def _semantic_path(state: GlobalState, worker, scores, compound: bool):
+    # --- SEMANTIC PATH ---
+    # One embed call + a dot product; escalates to the LLM below the margin.
+    if worker:
+        best = {w: round(s, 3) for w, s in scores.items() if w == worker}
+        log_decision("semantic", worker, f"similarity={best}")
+        return _dispatch(state, worker, "semantic", [] if compound else [worker])
+    return None
+
+def _intent_guess(state: GlobalState, user_text: str, turn_start: bool, semantic_scores):
+    """Cheapest guess at the worker the supervisor LLM will pick, for speculation."""
+    done = set() if turn_start else set(state.get("dispatched") or [])
+    trigger = {w: s for w, s in fast_router.score(user_text).items() if s > 0 and w not in done}
+    if trigger:
+        return max(trigger, key=trigger.get)
+    semantic = {w: s for w, s in (semantic_scores or {}).items() if w not in done}
+    return max(semantic, key=semantic.get) if semantic else None
+
+def _settle_speculation(config: RunnableConfig, routed: dict):
+    chosen = (routed.get("fanout") or [routed["next_step"]]) + (routed.get("plan") or [])
+    speculator.settle(config["configurable"].get("thread_id"), list(dict.fromkeys(chosen)))
+
+def _supervisor_messages(state: GlobalState):
+    # We pass the (windowed) history so the supervisor knows what has happened
+    return [SystemMessage(content=build_supervisor_prompt())] + build_context(state, "supervisor")
+
+def _supervisor_llm():
     # We use a slightly higher temperature (0.1) so it's not too rigid, but still structured
-    llm = get_llm(temperature=0.1, json_mode=True)
-    
-    # We pass the full history so the supervisor knows what has happened
-    messages = [SystemMessage(content=system_prompt)] + state['messages']
-    
+    return get_llm(temperature=0.1, json_mode=True, role="router")
+
+def _llm_path(state: GlobalState, turn_start: bool, response):
+    """Turns the supervisor model's reply (or the exception it raised) into a dispatch."""
     try:
-        response = llm.invoke(messages)
+        if isinstance(response, Exception):
+            raise response
         decision = parse_json_markdown(response.content)
         next_step = decision.get("next_step")
+        raw_plan = decision.get("plan")
+        parallel = decision.get("parallel") is True
 
         # --- RECOVERY LOGIC ---
         if not next_step and "name" in decision:
@@ -115,35 +285,186 @@ def supervisor_node(state: GlobalState):
     except Exception as e:
         print(f"[SUPERVISOR ERROR]: {e}")
         next_step = "general_chat"
+        raw_plan = None
+        parallel = False
+
+    plan = None
+    fanout = None
+    if turn_start:
+        # Unknown workers are dropped; a missing/invalid plan disables the shortcut.
+        plan = [w for w in raw_plan if w in WORKER_REGISTRY] if isinstance(raw_plan, list) else []
+        if plan and next_step in WORKER_REGISTRY and next_step not in plan:
+            plan.insert(0, next_step)
+
+        # --- FAN-OUT ---
+        # Independent workers run in the same superstep instead of one per hop.
+        distinct = list(dict.fromkeys(plan))
+        if settings.SUPERVISOR_PARALLEL_FANOUT and parallel and len(distinct) > 1:
+            fanout = distinct
+
+    detail = f"fanout={fanout}" if fanout else (f"plan={plan}" if plan else "")
+    log_decision("llm", next_step, detail)
+    return _dispatch(state, next_step, "llm", plan, fanout)
+
+def supervisor_node(state: GlobalState, config: RunnableConfig):
+    # Prefetches live for one turn: the previous turn's leftovers go before
+    # anything can claim them, and nothing unclaimed outlives a FINISH.
+    thread_id = config["configurable"].get("thread_id")
+    if _turn_info(state)[1]:
+        speculator.discard(thread_id)
+    routed = _supervise(state, config)
+    if routed["next_step"] == "FINISH":
+        speculator.discard(thread_id)
+    return routed
+
+async def asupervisor_node(state: GlobalState, config: RunnableConfig):
+    """Async supervisor_node(); same tiers, awaited on the event loop."""
+    thread_id = config["configurable"].get("thread_id")
+    if _turn_info(state)[1]:
+        speculator.discard(thread_id)
+    routed = await _asupervise(state, config)
+    if routed["next_step"] == "FINISH":
+        speculator.discard(thread_id)
+    return routed
+
+def _supervise(state: GlobalState, config: RunnableConfig):
+    user_text, turn_start, compound = _turn_info(state)
+
+    routed = _fast_path(state, user_text, compound)
+    if routed:
+        return routed
+
+    semantic_scores = {}
+    if settings.SEMANTIC_ROUTER_ENABLED and user_text:
+        worker, semantic_scores = semantic_router.route(user_text)
+        routed = _semantic_path(state, worker, semantic_scores, compound)
+        if routed:
+            return routed
 
-    return {"next_step": next_step}
+    # --- SPECULATION ---
+    # Read-only tools of the likeliest worker run while the LLM decides.
+    if user_text:
+        speculator.start(config["configurable"].get("thread_id"),
+                         _intent_guess(state, user_text, turn_start, semantic_scores), user_text)
+
+    try:
+        response = _supervisor_llm().invoke(_supervisor_messages(state))
+    except Exception as e:
+        response = e
+    routed = _llm_path(state, turn_start, response)
+    _settle_speculation(config, routed)
+    return routed
+
+async def _asupervise(state: GlobalState, config: RunnableConfig):
+    user_text, turn_start, compound = _turn_info(state)
+
+    routed = _fast_path(state, user_text, compound)
+    if routed:
+        return routed
+
+    semantic_scores = {}
+    if settings.SEMANTIC_ROUTER_ENABLED and user_text:
+        worker, semantic_scores = await semantic_router.aroute(user_text)
+        routed = _semantic_path(state, worker, semantic_scores, compound)
+        if routed:
+            return routed
+
+    if user_text:
+        speculator.start(config["configurable"].get("thread_id"),
+                         _intent_guess(state, user_text, turn_start, semantic_scores), user_text)
+
+    try:
+        response = await _supervisor_llm().ainvoke(_supervisor_messages(state))
+    except Exception as e:
+        response = e
+    routed = _llm_path(state, turn_start, response)
+    _settle_speculation(config, routed)
+    return routed
 
 def general_chat_node(state: GlobalState):
     """
     Simple LLM response for chat/jokes.
     """
-    llm = get_llm(temperature=0.7) # Creative for jokes
-    response = llm.invoke(state["messages"])
+    llm = get_llm(temperature=0.7, role="chat") # Creative for jokes
+    response = llm.invoke(build_context(state, "general_chat"))
+    return {"messages": [response]}
+
+async def ageneral_chat_node(state: GlobalState):
+    llm = get_llm(temperature=0.7, role="chat")
+    response = await llm.ainvoke(build_context(state, "general_chat"))
     return {"messages": [response]}
 
+def context_node(state: GlobalState):
+    """
+    Runs once per turn, before routing.
+    Folds evicted turns into the rolling summary (only when a batch is due).
+    """
+    return summarize_evicted(state) or {}
+
+async def acontext_node(state: GlobalState):
+    return await asummarize_evicted(state) or {}
+
+def windowed_worker(name: str):
+    """
+    Wraps a worker subgraph so it receives the windowed context instead of
+    the whole thread, and hands back only the messages it produced.
+    The subgraph itself is loaded from the capability registry on first use.
+    Returns a runnable with both a sync and an async implementation.
+    """
+    def run(state: GlobalState, config: RunnableConfig):
+        window = build_context(state, name)
+        agent = capabilities.get(name)
+        try:
+            result = agent.invoke({"messages": window}, config)
+        finally:
+            speculator.discard(config["configurable"].get("thread_id"), name)
+        return {"messages": result["messages"][len(window):]}
+
+    async def arun(state: GlobalState, config: RunnableConfig):
+        window = build_context(state, name)
+        # A first-time import/compile is blocking work: keep it off the event loop.
+        if capabilities.is_loaded(name):
+            agent = capabilities.get(name)
+        else:
+            agent = await asyncio.to_thread(capabilities.get, name)
+        try:
+            result = await agent.ainvoke({"messages": window}, config)
+        finally:
+            speculator.discard(config["configurable"].get("thread_id"), name)
+        return {"messages": result["messages"][len(window):]}
+
+    return dual_node(run, arun)
+
 # --- GRAPH DEFINITION ---
 workflow = StateGraph(GlobalState)
 
-workflow.add_node("supervisor", supervisor_node)
-workflow.add_node("general_chat", general_chat_node)
-workflow.add_node("research_agent", research_agent)
-workflow.add_node("home_agent", home_agent)
-workflow.add_node("system_admin", system_admin_agent)
-workflow.add_node("finance_agent", finance_agent)
-workflow.add_node("scheduler_agent", scheduler_agent)
+# Every node has an async twin: graph.invoke (main.py) runs the sync code,
+# graph.astream_events (Chainlit) stays on the event loop end to end.
+workflow.add_node("context", dual_node(context_node, acontext_node))
+workflow.add_node("supervisor", dual_node(supervisor_node, asupervisor_node))
+workflow.add_node("general_chat", dual_node(general_chat_node, ageneral_chat_node))
+for worker in capabilities.specs:
+    workflow.add_node(worker, windowed_worker(worker))
 
-# Start -> Supervisor
-workflow.add_edge(START, "supervisor")
+# Start -> Context -> Supervisor
+workflow.add_edge(START, "context")
+workflow.add_edge("context", "supervisor")
 
 # Supervisor Decision
+def route_supervisor(state: GlobalState):
+    """
+    Single route by name, or one `Send` per fan-out worker. Each branch gets
+    the same state; their messages are merged in fan-out order by the
+    `add_messages` reducer when the superstep completes.
+    """
+    fanout = state.get("fanout") or []
+    if fanout:
+        return [Send(worker, state) for worker in fanout]
+    return state["next_step"]
+
 workflow.add_conditional_edges(
     "supervisor",
-    lambda state: state["next_step"],
+    route_supervisor,
     {
         **{key: key for key in WORKER_REGISTRY.keys()},
         "FINISH": END
@@ -151,8 +472,27 @@ workflow.add_conditional_edges(
 )
 
 # --- CRITICAL CHANGE: THE LOOP ---
-# All workers now return to the Supervisor to check for more work.
+# All workers return to the Supervisor to check for more work...
+def route_after_worker(state: GlobalState):
+    """
+    ...unless completion tracking shows every planned worker has been
+    dispatched this turn. Then the supervisor call would only answer
+    "FINISH", so we go straight to END.
+    """
+    if settings.SUPERVISOR_COMPLETION_TRACKING:
+        plan = state.get("plan") or []
+        if plan and set(plan) <= set(state.get("dispatched") or []):
+            print(f"[SUPERVISOR] Plan {plan} served. Skipping FINISH round trip.")
+            return END
+    return "supervisor"
+
 for worker in WORKER_REGISTRY.keys():
-    workflow.add_edge(worker, "supervisor")
+    workflow.add_conditional_edges(worker, route_after_worker, ["supervisor", END])
+
+graph = workflow.compile(checkpointer=get_checkpointer())
+
+ORCHESTRATOR_BUILD_S = time.perf_counter() - _graph_t0
 
-graph = workflow.compile(checkpointer=get_checkpointer())
\ No newline at end of file
+def startup_report() -> str:
+    """Orchestrator build time plus per-capability import/compile cost."""
+    return f"Orchestrator graph: {ORCHESTRATOR_BUILD_S:.2f}s\n{capabilities.startup_report()}"
\ No newline at end of file
@@ -0,0 +1,94 @@
+# src/orchestrator/router.py
+import re
+from typing import Dict, List, Optional, Tuple
+from langchain_core.messages import BaseMessage, HumanMessage
+
+# --- DECISION COUNTERS ---
+# How many routing decisions were made by the trigger table, the embedding
+# classifier and the LLM supervisor.
+ROUTER_STATS = {"fast_path": 0, "semantic": 0, "llm": 0}
+
+def latest_human_text(messages: List[BaseMessage]) -> Optional[str]:
+    """
+    Returns the text of the last message if it is a fresh HumanMessage.
+    Returns None mid-turn (after a worker has replied), where only the LLM
+    can judge whether there is unfinished work.
+    """
+    if not messages or not isinstance(messages[-1], HumanMessage):
+        return None
+    content = messages[-1].content
+    return content if isinstance(content, str) else None
+
+# Conjunctions that usually join two separate requests ("lights off and tell me a joke").
+COMPOUND_PATTERN = re.compile(r"\b(and|then|also|plus)\b|;", re.IGNORECASE)
+
+def looks_compound(text: Optional[str]) -> bool:
+    """Cheap check for requests that may carry more than one intent."""
+    return bool(text and COMPOUND_PATTERN.search(text))
+
+class TriggerRouter:
+    """
+    Deterministic pre-router.
+    Scores the user's message against each worker's `triggers` (plain phrases)
+    and `patterns` (regexes) and only answers when exactly ONE worker matches.
+    Anything ambiguous (no match, or several workers) is left to the LLM.
+    """
+    def __init__(self, registry: Dict[str, dict],
+                 aliases: Optional[Dict[str, List[str]]] = None,
+                 patterns: Optional[Dict[str, List[str]]] = None,
+                 min_score: int = 1):
+        self.min_score = min_score
+        self.rules: List[Tuple[str, re.Pattern, int]] = []
+
+        aliases = aliases or {}
+        patterns = patterns or {}
+
+        for worker, info in registry.items():
+            # Phrases weigh by word count, so "server status" beats "status".
+            for phrase in info.get("triggers", []) + aliases.get(worker, []):
+                regex = re.compile(rf"\b{re.escape(phrase.lower())}\b")
+                self.rules.append((worker, regex, len(phrase.split())))
+
+            for pattern in info.get("patterns", []) + patterns.get(worker, []):
+                self.rules.append((worker, re.compile(pattern, re.IGNORECASE), 2))
+
+    def score(self, text: str) -> Dict[str, int]:
+        """
+        Returns {worker: score} for every worker with a surviving match.
+        Overlapping matches are resolved longest-first, so a phrase that is
+        part of a longer trigger for another worker does not count twice.
+        """
+        text = text.lower()
+        hits = []
+        for worker, regex, weight in self.rules:
+            for m in regex.finditer(text):
+                hits.append((m.end() - m.start(), m.start(), m.end(), worker, weight))
+
+        hits.sort(key=lambda h: (-h[0], h[1]))
+        taken = []
+        scores: Dict[str, int] = {}
+        for _, start, end, worker, weight in hits:
+            if any(start < t_end and t_start < end for t_start, t_end in taken):
+                continue
+            taken.append((start, end))
+            scores[worker] = scores.get(worker, 0) + weight
+        return scores
+
+    def route(self, text: str) -> Tuple[Optional[str], Dict[str, int]]:
+        """Returns (worker, scores). worker is None when the match is not confident."""
+        scores = self.score(text)
+        confident = {w: s for w, s in scores.items() if s >= self.min_score}
+        if len(confident) == 1:
+            return next(iter(confident)), scores
+        return None, scores
+
+def log_decision(source: str, next_step: str, detail: str = ""):
+    """Prints which path made the routing decision, plus the running tally."""
+    ROUTER_STATS[source] += 1
+    total = sum(ROUTER_STATS.values())
+    saved = total - ROUTER_STATS["llm"]
+    suffix = f" {detail}" if detail else ""
+    print(
+        f"[ROUTER] {source} -> {next_step}{suffix} "
+        f"(LLM skipped {saved}/{total} decisions)"
+    )
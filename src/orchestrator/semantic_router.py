@@ -0,0 +1,161 @@
+# src/orchestrator/semantic_router.py
+import os
+import asyncio
+import json
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.config import settings
+from src.core.llm import get_embeddings
+
+class SemanticRouter:
+    """
+    Embedding-based intent classifier.
+    Each worker is represented by its registry description plus its curated
+    `examples`. A request goes to the worker owning the nearest vector, but
+    only if it clears both the similarity floor and the margin over the
+    runner-up worker. Otherwise the caller escalates to the LLM supervisor.
+
+    The example bank is embedded once and cached on disk, keyed by a
+    fingerprint of the embedding model and the texts, so a restart with an
+    unchanged registry costs zero embed calls. When embedding fails (server
+    down, timeout) the router steps aside for an exponential backoff and
+    then tries again.
+    """
+    def __init__(self, registry: Dict[str, dict], cache_path: str,
+                 min_similarity: float, margin: float):
+        self.cache_path = cache_path
+        self.min_similarity = min_similarity
+        self.margin = margin
+
+        self.labels: List[str] = []
+        self.texts: List[str] = []
+        for worker, info in registry.items():
+            for text in [info["description"]] + info.get("examples", []):
+                self.labels.append(worker)
+                self.texts.append(text)
+        self.workers = sorted(set(self.labels))
+
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def _fingerprint(self) -> str:
+        payload = json.dumps([settings.EMBEDDING_MODEL, self.labels, self.texts])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+
+    def _load_cache(self, fingerprint: str) -> Optional[np.ndarray]:
+        if not os.path.exists(self.cache_path):
+            return None
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                if str(data["fingerprint"]) != fingerprint:
+                    return None
+                return data["vectors"]
+        except Exception as e:
+            print(f"[SEMANTIC ROUTER] Ignoring unreadable cache {self.cache_path}: {e}")
+            return None
+
+    def _save_cache(self, fingerprint: str, vectors: np.ndarray):
+        try:
+            with open(self.cache_path, "wb") as f:
+                np.savez(f, fingerprint=np.array(fingerprint), vectors=vectors)
+        except Exception as e:
+            print(f"[SEMANTIC ROUTER] Could not write cache {self.cache_path}: {e}")
+
+    def load(self) -> np.ndarray:
+        """Builds (or loads) the normalized example matrix. Safe to call repeatedly."""
+        if self._matrix is not None:
+            return self._matrix
+        with self._lock:
+            if self._matrix is None:
+                fingerprint = self._fingerprint()
+                vectors = self._load_cache(fingerprint)
+                if vectors is None:
+                    print(f"[SEMANTIC ROUTER] Embedding {len(self.texts)} examples...")
+                    vectors = np.asarray(get_embeddings().embed_documents(self.texts), dtype=np.float32)
+                    self._save_cache(fingerprint, vectors)
+                self._matrix = self._normalize(vectors)
+        return self._matrix
+
+    def _best_per_worker(self, matrix: np.ndarray, embedding) -> Dict[str, float]:
+        query = self._normalize(np.asarray(embedding, dtype=np.float32))
+        sims = matrix @ query
+
+        labels = np.asarray(self.labels)
+        return {w: float(sims[labels == w].max()) for w in self.workers}
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Returns the best cosine similarity per worker."""
+        matrix = self.load()
+        return self._best_per_worker(matrix, get_embeddings().embed_query(text))
+
+    async def ascores(self, text: str) -> Dict[str, float]:
+        """Async scores(); the one-off bank load runs off the event loop."""
+        matrix = self._matrix if self._matrix is not None else await asyncio.to_thread(self.load)
+        return self._best_per_worker(matrix, await get_embeddings().aembed_query(text))
+
+    def _pick(self, scores: Dict[str, float]) -> Optional[str]:
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        best, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+
+        if best_score >= self.min_similarity and best_score - runner_up >= self.margin:
+            return best
+        return None
+
+    def _back_off(self, e: Exception):
+        # Embedding server down: let the LLM route until the backoff expires.
+        self._failures += 1
+        delay = min(settings.SEMANTIC_ROUTER_RETRY_S * 2 ** (self._failures - 1), settings.SEMANTIC_ROUTER_RETRY_MAX_S)
+        self._retry_at = time.monotonic() + delay
+        print(f"[SEMANTIC ROUTER] Paused for {delay:.0f}s after error #{self._failures}: {e}")
+
+    def _recovered(self):
+        if self._failures:
+            print(f"[SEMANTIC ROUTER] Embeddings back after {self._failures} error(s).")
+            self._failures = 0
+
+    def warm_up(self):
+        """Embeds (or loads) the example bank ahead of the first request. Errors back off, not raise."""
+        if time.monotonic() < self._retry_at:
+            return
+        try:
+            self.load()
+            self._recovered()
+        except Exception as e:
+            self._back_off(e)
+
+    def route(self, text: str) -> Tuple[Optional[str], Dict[str, float]]:
+        """Returns (worker, scores). worker is None when below the threshold or margin."""
+        if time.monotonic() < self._retry_at:
+            return None, {}
+        try:
+            scores = self.scores(text)
+        except Exception as e:
+            self._back_off(e)
+            return None, {}
+        self._recovered()
+        return self._pick(scores), scores
+
+    async def aroute(self, text: str) -> Tuple[Optional[str], Dict[str, float]]:
+        """Async route()."""
+        if time.monotonic() < self._retry_at:
+            return None, {}
+        try:
+            scores = await self.ascores(text)
+        except Exception as e:
+            self._back_off(e)
+            return None, {}
+        self._recovered()
+        return self._pick(scores), scores
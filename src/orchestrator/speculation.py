@@ -0,0 +1,225 @@
+# src/orchestrator/speculation.py
+import re
+import json
+import time
+import asyncio
+import inspect
+import functools
+import threading
+from types import ModuleType
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from langchain_core.runnables.config import ensure_config
+from langchain_core.tools import BaseTool
+
+from src.core.config import settings
+
+# --- SPECULATIVE CALLS ---
+# worker -> [(tool name, regex the request must match or None, args from the request)].
+# Read-only tools only: control_device(s) and log_maintenance must never appear here.
+# Any other tool of the worker (a write like log_maintenance) drops the thread's
+# prefetches when it runs, so a later read in the same turn sees the write.
+# A prefetch is only used when the model's call has the same arguments (after
+# defaults), so free-text arguments (search_knowledge_base's query) never qualify.
+SPECULATIVE_CALLS: Dict[str, List[Tuple[str, Optional[str], Callable[[str], Dict[str, Any]]]]] = {
+    "system_admin": [
+        ("list_ollama_models", r"\bmodels?\b", lambda text: {}),
+    ],
+    "scheduler_agent": [
+        ("get_weather_report", r"weather|rain|forecast|temperature|briefing|start my day|good morning", lambda text: {}),
+        ("get_calendar_events", r"calendar|schedule|agenda|today|tomorrow|briefing|start my day|good morning",
+         lambda text: {"days": 1}),
+        ("check_maintenance_status", r"maintenance|\bdue\b|overdue|briefing|start my day|good morning", lambda text: {}),
+    ],
+}
+
+def _args_key(args: Dict[str, Any]) -> str:
+    return json.dumps(args, sort_keys=True, default=str)
+
+def _thread_id() -> Optional[str]:
+    """thread_id of the graph run the caller is part of (read from the runnable context)."""
+    return ensure_config().get("configurable", {}).get("thread_id")
+
+class Speculator:
+    """
+    Starts the likeliest worker's read-only tool calls while the supervisor
+    LLM is still deciding, so Qdrant / Home Assistant / SQLite latency hides
+    behind the routing call.
+
+    start()  : before the supervisor LLM call, from a cheap intent guess.
+    settle() : after the decision. A guess the supervisor dispatched or
+               planned keeps its results; a wrong one is discarded (running
+               calls finish and are ignored).
+    claim()  : the worker's tool call picks up a confirmed result when the
+               tool name and arguments match exactly, otherwise runs normally.
+    discard(): when that worker finishes or runs a non-speculative tool,
+               or when the turn ends, unused results are dropped.
+    """
+    def __init__(self, max_workers: int = 4):
+        self._funcs: Dict[str, Callable[..., Any]] = {}
+        self._defaults: Dict[str, Dict[str, Any]] = {}  # tool name -> default arguments
+        self._invalidating: Set[str] = set()  # names of the other tools of speculative workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculate")
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}  # thread_id -> speculation
+        self.stats = {"started": 0, "confirmed": 0, "discarded": 0, "calls": 0, "used": 0}
+        self.by_worker: Dict[str, Dict[str, int]] = {}  # worker -> confirmed prefetches and how many were used
+
+    def register(self, name: str, func: Callable[..., Any]):
+        self._funcs[name] = func
+        self._defaults[name] = {p.name: p.default for p in inspect.signature(func).parameters.values()
+                                if p.default is not inspect.Parameter.empty}
+
+    def _key(self, name: str, args: Dict[str, Any]) -> Tuple[str, str]:
+        # {} and {"days": 1} are the same call of get_calendar_events(days=1).
+        return name, _args_key({**self._defaults.get(name, {}), **args})
+
+    def wrap_tools(self, worker: str, module: ModuleType):
+        """
+        Makes the tools SPECULATIVE_CALLS lists for `worker` claim prefetched
+        results, and its other tools drop them. Called by the capability
+        registry when it loads the worker, so capability modules know nothing
+        about speculation.
+        """
+        if worker not in SPECULATIVE_CALLS:
+            return
+        names = {name for name, _, _ in SPECULATIVE_CALLS[worker]}
+        for value in vars(module).values():
+            if not isinstance(value, BaseTool) or value.name in self._funcs or value.name in self._invalidating:
+                continue
+            if value.name in names:
+                speculative(value)
+            else:
+                self._invalidating.add(value.name)
+                invalidating(value, worker)
+
+    def start(self, thread_id: Optional[str], worker: Optional[str], text: str):
+        if not settings.SPECULATIVE_TOOLS_ENABLED or not thread_id or worker not in SPECULATIVE_CALLS:
+            return
+        with self._lock:
+            spec = self._pending.get(thread_id)
+            if spec is not None and spec["confirmed"]:
+                return  # Planned worker that has not run yet (multi-step turn): keep its results.
+        self.discard(thread_id)
+
+        calls: Dict[Tuple[str, str], Future] = {}
+        for name, pattern, make_args in SPECULATIVE_CALLS[worker]:
+            # Tools register when their capability module loads; nothing to run before that.
+            func = self._funcs.get(name)
+            if func is None or (pattern and not re.search(pattern, text.lower())):
+                continue
+            args = make_args(text)
+            calls[self._key(name, args)] = self._pool.submit(func, **args)
+        if not calls:
+            return
+
+        with self._lock:
+            self._pending[thread_id] = {"worker": worker, "calls": calls, "confirmed": False,
+                                       "total": len(calls), "used": 0, "t0": time.monotonic()}
+            self.stats["started"] += 1
+            self.stats["calls"] += len(calls)
+
+    def settle(self, thread_id: Optional[str], chosen: List[str]):
+        with self._lock:
+            spec = self._pending.get(thread_id)
+            if spec is None or spec["confirmed"]:
+                return
+            hit = spec["worker"] in chosen
+            if hit:
+                spec["confirmed"] = True
+                self.stats["confirmed"] += 1
+                usage = self.by_worker.setdefault(spec["worker"], {"calls": 0, "used": 0})
+                usage["calls"] += spec["total"]
+            else:
+                self._pending.pop(thread_id)
+                self.stats["discarded"] += 1
+            rate = f"{self.stats['confirmed']}/{self.stats['started']}"
+
+        if not hit:
+            for future in spec["calls"].values():
+                future.cancel()
+        names = [name for name, _ in spec["calls"]]
+        print(f"[SPECULATION] {'HIT' if hit else 'MISS'}: guessed {spec['worker']} {names}, "
+              f"supervisor chose {chosen} (hit rate {rate})")
+
+    def claim(self, thread_id: Optional[str], name: str, args: Dict[str, Any]) -> Optional[Future]:
+        with self._lock:
+            spec = self._pending.get(thread_id)
+            if spec is None or not spec["confirmed"]:
+                return None
+            if time.monotonic() - spec["t0"] > settings.SPECULATION_TTL_S:
+                self._pending.pop(thread_id)
+                return None
+            future = spec["calls"].pop(self._key(name, args), None)
+            if future is not None:
+                spec["used"] += 1
+                self.stats["used"] += 1
+                self.by_worker[spec["worker"]]["used"] += 1
+            return future
+
+    def discard(self, thread_id: Optional[str], worker: Optional[str] = None):
+        """Drops a thread's speculation (only if it was for `worker`, when given)."""
+        with self._lock:
+            spec = self._pending.get(thread_id)
+            if spec is None or (worker is not None and spec["worker"] != worker):
+                return
+            self._pending.pop(thread_id)
+        for future in spec["calls"].values():
+            future.cancel()
+        if spec["confirmed"]:
+            usage = self.by_worker[spec["worker"]]
+            print(f"[SPECULATION] {spec['worker']} used {spec['used']}/{spec['total']} prefetched call(s) "
+                  f"({spec['worker']} overall {usage['used']}/{usage['calls']})")
+
+# Process-wide speculator, shared by the supervisor and the tool wrappers.
+speculator = Speculator()
+
+def speculative(base_tool: BaseTool) -> BaseTool:
+    """
+    Marks a read-only tool as safe to start early. Its sync/async bodies
+    first look for a confirmed speculative result for the current thread.
+    Applied by Speculator.wrap_tools once the tool's @async_variant is registered.
+    """
+    func, coroutine = base_tool.func, base_tool.coroutine
+    speculator.register(base_tool.name, func)
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        future = None if args else speculator.claim(_thread_id(), base_tool.name, kwargs)
+        return future.result() if future is not None else func(*args, **kwargs)
+    base_tool.func = run
+
+    if coroutine is not None:
+        @functools.wraps(coroutine)
+        async def arun(*args, **kwargs):
+            future = None if args else speculator.claim(_thread_id(), base_tool.name, kwargs)
+            if future is not None:
+                return await asyncio.wrap_future(future)
+            return await coroutine(*args, **kwargs)
+        base_tool.coroutine = arun
+
+    return base_tool
+
+def invalidating(base_tool: BaseTool, worker: str) -> BaseTool:
+    """
+    Marks a tool that may change what `worker`'s prefetched reads returned
+    (e.g. log_maintenance before check_maintenance_status): running it drops
+    the thread's speculation for that worker first.
+    """
+    func, coroutine = base_tool.func, base_tool.coroutine
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        speculator.discard(_thread_id(), worker)
+        return func(*args, **kwargs)
+    base_tool.func = run
+
+    if coroutine is not None:
+        @functools.wraps(coroutine)
+        async def arun(*args, **kwargs):
+            speculator.discard(_thread_id(), worker)
+            return await coroutine(*args, **kwargs)
+        base_tool.coroutine = arun
+
+    return base_tool
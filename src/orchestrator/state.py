@@ -1,14 +1,32 @@
 # src/orchestrator/state.py
-import operator
 from typing import Annotated, TypedDict, List, Literal
 from langchain_core.messages import BaseMessage
+from langgraph.graph.message import add_messages
 
 class GlobalState(TypedDict):
     # HISTORY: Holds the entire conversation
-    messages: Annotated[List[BaseMessage], operator.add]
+    # `add_messages` merges by message id: worker subgraphs hand back the whole
+    # history, and parallel branches must not append duplicate copies of it.
+    messages: Annotated[List[BaseMessage], add_messages]
     
     # ROUTING: The Supervisor writes to this (e.g., "research_agent")
     next_step: str
+
+    # ROUTING SOURCE: Which path made the last decision ("fast_path", "semantic" or "llm")
+    route_source: str
+
+    # COMPLETION TRACKING: Workers planned at the start of the turn, and the
+    # ones dispatched so far. When every planned worker has run, we END.
+    plan: List[str]
+    dispatched: List[str]
+
+    # FAN-OUT: Independent workers dispatched concurrently by the supervisor
+    fanout: List[str]
+
+    # ROLLING SUMMARY: Older turns folded into text. messages[:summary_cursor]
+    # are covered by the summary and no longer sent to the models.
+    summary: str
+    summary_cursor: int
     
     # CONTEXT: Tracks which agent sent the last message
     # Useful for the UI to know if "Finance" or "Research" is speaking
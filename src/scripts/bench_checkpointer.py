@@ -0,0 +1,134 @@
+# src/scripts/bench_checkpointer.py
+"""
+Checkpointer benchmark: write latency and resident memory after N turns.
+
+Runs a minimal add_messages graph (one user + one assistant message per turn,
+spread over a few threads) against MemorySaver and the SQLite checkpointer,
+so only checkpoint cost is measured. No Ollama or Home Assistant needed.
+Each backend runs in its own process so the RSS figures don't mix.
+
+Usage:
+    python src/scripts/bench_checkpointer.py [turns] [threads]
+"""
+import sys
+import os
+import gc
+import time
+import tempfile
+import statistics
+import subprocess
+from typing import Annotated, List, TypedDict
+
+# Path Hack
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.core.config import settings
+from src.core.persistence import SqliteCheckpointer
+
+REPLY = "Done. " * 40  # ~240 chars, roughly a short assistant answer
+
+class BenchState(TypedDict):
+    messages: Annotated[List[BaseMessage], add_messages]
+
+def rss_mb() -> float:
+    """Current resident set size (Linux /proc), falling back to peak RSS."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class TimedSaver:
+    """Wraps a checkpointer's put() to time each checkpoint write."""
+    def __init__(self, saver):
+        self.saver = saver
+        self.samples: List[float] = []
+        original = saver.put
+
+        def timed_put(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.samples.append(time.perf_counter() - t0)
+        saver.put = timed_put
+
+def build_graph(checkpointer):
+    workflow = StateGraph(BenchState)
+    workflow.add_node("reply", lambda state: {"messages": [AIMessage(content=REPLY)]})
+    workflow.add_edge(START, "reply")
+    workflow.add_edge("reply", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+def pct(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+def run(name: str, saver, turns: int, threads: int):
+    gc.collect()
+    rss_before = rss_mb()
+    timed = TimedSaver(saver)
+    graph = build_graph(saver)
+
+    t0 = time.perf_counter()
+    for i in range(turns):
+        config = {"configurable": {"thread_id": f"bench-{i % threads}"}}
+        graph.invoke({"messages": [HumanMessage(content=f"turn {i}: turn off the kitchen lights")]}, config)
+    wall = time.perf_counter() - t0
+
+    gc.collect()
+    samples = timed.samples
+    print(
+        f"{name:<10}{turns:>8}{wall:>9.1f}s"
+        f"{statistics.mean(samples) * 1000:>9.2f}{pct(samples, 0.5):>9.2f}{pct(samples, 0.95):>9.2f}{pct(samples, 0.99):>9.2f}"
+        f"{rss_mb() - rss_before:>11.1f}"
+    )
+
+def run_backend(backend: str, turns: int, threads: int):
+    if backend == "memory":
+        run("memory", MemorySaver(), turns, threads)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_state.sqlite")
+        saver = SqliteCheckpointer(
+            path,
+            keep_last=settings.CHECKPOINT_KEEP_LAST,
+            thread_ttl_s=settings.CHECKPOINT_THREAD_TTL_HOURS * 3600,
+            maintenance_interval_s=0,  # VACUUM timing is reported separately below
+        )
+        run("sqlite", saver, turns, threads)
+
+        size_before = os.path.getsize(path)
+        t0 = time.perf_counter()
+        saver.maintain()
+        print(f"  SQLite file: {size_before / 1024:.0f} KB before maintenance, "
+              f"{os.path.getsize(path) / 1024:.0f} KB after ({time.perf_counter() - t0:.2f}s)")
+        rows = saver.conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+        print(f"  Checkpoints retained: {rows} (keep_last={settings.CHECKPOINT_KEEP_LAST} x {threads} threads)")
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    if len(sys.argv) > 3:
+        # Child process: one backend only.
+        run_backend(sys.argv[3], turns, threads)
+        return
+
+    print(f"--- CHECKPOINTER BENCHMARK ({turns} turns over {threads} threads) ---")
+    print(f"{'backend':<10}{'turns':>8}{'wall':>10}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'+RSS MB':>11}")
+    for backend in ("memory", "sqlite"):
+        subprocess.run([sys.executable, os.path.abspath(__file__), str(turns), str(threads), backend], check=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# src/scripts/bench_e2e.py
+"""
+End-to-end benchmark of the real compiled graph, fully offline.
+
+Ollama and Home Assistant are replaced by the stand-ins in standins.py
+(scripted replies with configurable token delays, a synthetic house with N
+entities); Qdrant runs in embedded local mode and both SQLite files live in a
+temp dir. Every scenario is a scripted conversation on its own thread.
+
+Per scenario it reports LLM calls, prompt tokens, tool calls and Home
+Assistant requests per turn, plus p50/p95 turn latency, so routing/context/
+tool changes can be compared before and after without any hardware.
+
+Usage:
+    python src/scripts/bench_e2e.py [--scenario NAME ...] [--entities 500]
+                                    [--token-delay 0.02] [--prefill-delay 0.0002]
+                                    [--ha-latency 0.005] [--async] [--repeat 1]
+"""
+import sys
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+# Path Hack
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+
+from src.scripts.standins import FakeOllama, FakeHomeAssistant, EMBED_DIM
+
+SCENARIOS = {
+    "lights": [
+        "turn off the kitchen lights",
+        "set the bedroom light to 40%",
+        "turn on the office switch",
+        "turn off the porch light",
+    ],
+    "compound": [
+        "turn off the porch light and tell me a joke",
+        "what's the weather and is any maintenance due",
+        "turn on the kitchen light, also how much did I spend on amazon",
+    ],
+    "chat": ["hello there", "tell me a joke", "who are you", "thanks"],
+    "research": [
+        "find the warranty for the blender",
+        "how do I descale the espresso machine",
+        "where is the receipt for the dishwasher",
+    ],
+    "finance": ["how much did I spend on amazon", "what was the most expensive thing I bought"],
+    "scheduler": ["what's the weather", "what's on my calendar today", "is any maintenance due"],
+}
+# A long conversation exercises the context window / rolling summary.
+SCENARIOS["long_thread"] = [turn for _ in range(4) for turn in
+                            SCENARIOS["lights"][:2] + SCENARIOS["chat"][:2] + SCENARIOS["scheduler"][:2]]
+
+DOCUMENTS = [
+    ("Ninja Blender warranty: 2 years limited warranty, register online within 30 days.", "Blender Warranty"),
+    ("Espresso machine manual: descale every 3 months using the descaling program.", "Espresso Manual"),
+    ("Dishwasher receipt, Home Depot, installed by contractor, 1 year labour warranty.", "Dishwasher Receipt"),
+    ("Electric bill January: 812 kWh, due on the 15th.", "Electric Bill January"),
+]
+
+class ToolCounter(BaseCallbackHandler):
+    run_inline = True
+
+    def __init__(self):
+        self.count = 0
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.count += 1
+
+def pct(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def configure_environment(ollama: FakeOllama, ha: FakeHomeAssistant, tmp: str):
+    """Points settings at the stand-ins. Must run before anything imports src.core.config."""
+    os.environ.update({
+        "UNRAID_IP": "127.0.0.1",
+        "PORT_OLLAMA": str(ollama.port),
+        "HOME_ASSISTANT_IP": "127.0.0.1",
+        "PORT_HOME_ASSISTANT": str(ha.port),
+        "HOME_ASSISTANT_TOKEN": "standin",
+        "STATE_DB_PATH": os.path.join(tmp, "agent_state.sqlite"),
+        "FINANCE_DB_PATH": os.path.join(tmp, "finance_data.db"),
+        "QDRANT_LOCAL_PATH": os.path.join(tmp, "qdrant"),
+        "SEMANTIC_ROUTER_CACHE_PATH": os.path.join(tmp, "semantic_router_cache.npz"),
+        "TRACE_LOG_PATH": os.path.join(tmp, "traces.jsonl"),
+    })
+
+def seed_data():
+    from qdrant_client.http import models
+    from src.core.database import init_db, get_db_session, AmazonOrder, MaintenanceLog
+    from src.core.vector import get_qdrant_client, get_vector_store
+
+    init_db()
+    db = get_db_session()
+    try:
+        today = date.today()
+        for i, (item, price) in enumerate([("Ninja Blender", 99.99), ("USB-C Cable", 12.49),
+                                           ("Espresso Machine", 449.0), ("Fridge Water Filter", 38.5)]):
+            db.add(AmazonOrder(account_owner="bench", order_id=f"113-{i:07d}", date=today - timedelta(days=30 * i),
+                               item_description=item, item_price=price, quantity=1, category="Physical", link=""))
+        db.add(MaintenanceLog(task_name="Fridge filter", date_performed=today - timedelta(days=200),
+                              next_due_date=today - timedelta(days=17), status="completed"))
+        db.add(MaintenanceLog(task_name="HVAC filter", date_performed=today - timedelta(days=30),
+                              next_due_date=today + timedelta(days=60), status="completed"))
+        db.commit()
+    finally:
+        db.close()
+
+    client = get_qdrant_client()
+    client.create_collection("personal_knowledge",
+                             vectors_config=models.VectorParams(size=EMBED_DIM, distance=models.Distance.COSINE))
+    get_vector_store("personal_knowledge").add_texts(
+        [text for text, _ in DOCUMENTS],
+        metadatas=[{"title": title, "source": "bench"} for _, title in DOCUMENTS],
+    )
+
+def report_row(name: str, turns: int, latencies, ollama_stats: dict, ha_stats: dict, tool_calls: int) -> str:
+    return (
+        f"{name:<13}{turns:>6}"
+        f"{ollama_stats['chat_calls'] / turns:>10.2f}{ollama_stats['prompt_tokens'] / turns:>12.0f}"
+        f"{ollama_stats['embed_calls'] / turns:>9.2f}{tool_calls / turns:>9.2f}"
+        f"{ha_stats['requests'] / turns:>9.2f}"
+        f"{pct(latencies, 0.5) * 1000:>10.0f}{pct(latencies, 0.95) * 1000:>10.0f}"
+    )
+
+def run_scenarios(graph, names, ollama, ha, use_async: bool, repeat: int) -> list:
+    """Runs each scenario and returns one report row per scenario."""
+    from src.core.tracing import traced
+
+    # One loop for the whole run: the async clients are bound to the loop that first used them.
+    loop = asyncio.new_event_loop() if use_async else None
+
+    def invoke(message, config):
+        if loop is None:
+            return graph.invoke(message, config)
+        return loop.run_until_complete(graph.ainvoke(message, config))
+
+    rows = []
+    for name in names:
+        latencies, tool_calls = [], 0
+        ollama.reset()
+        ha.reset()
+        for r in range(repeat):
+            counter = ToolCounter()
+            config = traced({"configurable": {"thread_id": f"bench-{name}-{r}"}, "callbacks": [counter]})
+            for text in SCENARIOS[name]:
+                t0 = time.perf_counter()
+                invoke({"messages": [HumanMessage(content=text)]}, config)
+                latencies.append(time.perf_counter() - t0)
+            tool_calls += counter.count
+        rows.append(report_row(name, len(latencies), latencies, dict(ollama.stats), dict(ha.stats), tool_calls))
+
+    if loop is not None:
+        loop.close()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark against local stand-ins.")
+    parser.add_argument("--scenario", nargs="*", choices=sorted(SCENARIOS), help="Default: all")
+    parser.add_argument("--entities", type=int, default=300, help="Synthetic Home Assistant entities")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds per generated token")
+    parser.add_argument("--prefill-delay", type=float, default=0.0, help="Seconds per prompt token")
+    parser.add_argument("--ha-latency", type=float, default=0.0, help="Seconds added to every HA request")
+    parser.add_argument("--repeat", type=int, default=1, help="Run each conversation N times (fresh threads)")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Use graph.ainvoke (Chainlit path)")
+    args = parser.parse_args()
+
+    ollama = FakeOllama(token_delay_s=args.token_delay, prefill_s_per_token=args.prefill_delay).start()
+    ha = FakeHomeAssistant(entity_count=args.entities, latency_s=args.ha_latency).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(ollama, ha, tmp)
+        seed_data()
+
+        from src.orchestrator.graph import graph, capabilities
+        capabilities.warm_up()
+
+        names = args.scenario or list(SCENARIOS)
+        rows = run_scenarios(graph, names, ollama, ha, args.use_async, args.repeat)
+
+        # Printed last so the graph's own logging doesn't interleave with the table.
+        mode = "async" if args.use_async else "sync"
+        print(f"\n--- E2E BENCHMARK ({mode}, {args.entities} entities, "
+              f"{args.token_delay * 1000:.0f}ms/token, {args.prefill_delay * 1000:.2f}ms/prompt token) ---")
+        print(f"{'scenario':<13}{'turns':>6}{'llm/turn':>10}{'prompt tok':>12}{'embed':>9}{'tools':>9}"
+              f"{'ha req':>9}{'p50 ms':>10}{'p95 ms':>10}")
+        print("\n".join(rows))
+
+    ollama.stop()
+    ha.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# src/scripts/bench_resolver.py
+"""
+Entity resolver accuracy and latency on a synthetic house (no LLM, no HA).
+
+Builds the resolver index over synthetic_states() from standins.py (areas
+from the room names, a few user aliases) and resolves generated requests:
+exact names, typos, entity_id spellings, aliases, plus room+device phrases
+that match dozens of entities and must NOT be resolved confidently (those
+still go to the drill-down LLM).
+
+Usage:
+    python src/scripts/bench_resolver.py [--entities 5000] [--queries 2000] [--seed 7]
+"""
+import sys
+import os
+import time
+import random
+import argparse
+
+# Path Hack
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from src.core.config import settings
+from src.scripts.standins import synthetic_states, ROOMS
+from src.capabilities.home_control.resolver import EntityIndex
+
+ALIASES = ["christmas tree", "reading nook", "aquarium", "espresso machine", "space heater",
+           "bar cart", "fish tank", "heated floor", "salt lamp", "back gate"]
+VERBS = ["turn on the {}", "turn off the {}", "switch off the {}", "set the {} to 40%", "is the {} on?"]
+
+def pct(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+def typo(word: str, rng: random.Random) -> str:
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1:]  # dropped letter: "kitchen" -> "kitchn"
+
+def build_queries(states, aliases, count: int, rng: random.Random):
+    """(text, expected entity_id or None for 'should stay ambiguous', kind)."""
+    named = [s for s in states if s["entity_id"].split(".")[0] in ("light", "switch", "lock", "cover", "climate")
+             and s["state"] not in ("unavailable", "unknown")]
+    queries = []
+    while len(queries) < count:
+        kind = rng.choice(["name", "name", "typo", "entity_id", "alias", "ambiguous"])
+        verb = rng.choice(VERBS)
+        if kind == "alias":
+            entity_id, names = rng.choice(list(aliases.items()))
+            queries.append((verb.format(names[0]), entity_id, kind))
+        elif kind == "ambiguous":
+            room, device = rng.choice(ROOMS), rng.choice(["lights", "switches", "sensors"])
+            queries.append((verb.format(f"{room} {device}"), None, kind))
+        else:
+            s = rng.choice(named)
+            name = s["attributes"]["friendly_name"]
+            if kind == "typo":
+                name = " ".join(typo(w, rng) if w.isalpha() else w for w in name.split())
+            elif kind == "entity_id":
+                name = s["entity_id"]
+            queries.append((verb.format(name), s["entity_id"], kind))
+    return queries
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the deterministic entity resolver.")
+    parser.add_argument("--entities", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    states = synthetic_states(args.entities, seed=args.seed)
+    rooms = {room.replace(" ", "_"): room.title() for room in ROOMS}
+    areas = {}
+    for s in states:
+        room = s["entity_id"].split(".", 1)[1].rstrip("0123456789").rstrip("_")
+        if room in rooms:
+            areas[s["entity_id"]] = rooms[room]
+    aliases = {s["entity_id"]: [alias] for s, alias in
+               zip(rng.sample([s for s in states if s["entity_id"].startswith(("light.", "switch."))], len(ALIASES)),
+                   ALIASES)}
+
+    t0 = time.perf_counter()
+    index = EntityIndex(states, areas, aliases)
+    build_ms = (time.perf_counter() - t0) * 1000
+    inactive = {s["entity_id"] for s in states if s["state"] in ("unavailable", "unknown")}
+    active = lambda entity_id: entity_id not in inactive
+
+    queries = build_queries(states, aliases, args.queries, rng)
+    limit = settings.HOME_RESOLVER_MAX_CANDIDATES
+    latencies, by_kind = [], {}
+    for text, expected, kind in queries:
+        t0 = time.perf_counter()
+        resolution = index.resolve(text, limit, active)
+        latencies.append((time.perf_counter() - t0) * 1e6)
+        row = by_kind.setdefault(kind, {"n": 0, "top1": 0, "top5": 0, "confident": 0, "right": 0})
+        row["n"] += 1
+        row["confident"] += resolution.confident
+        if expected is None:
+            row["right"] += not resolution.confident  # the drill-down LLM still gets these
+        else:
+            row["top1"] += resolution.candidates[:1] == [expected]
+            row["top5"] += expected in resolution.candidates
+            row["right"] += resolution.confident and expected in resolution.candidates
+
+    print(f"\n--- ENTITY RESOLVER ({len(index.entity_ids)} entities, {len(index.postings)} terms, "
+          f"index built in {build_ms:.0f}ms) ---")
+    print(f"latency: p50 {pct(latencies, 0.5):.0f}µs, p95 {pct(latencies, 0.95):.0f}µs, "
+          f"max {max(latencies):.0f}µs over {len(queries)} requests")
+    print(f"\n{'kind':<12}{'requests':>10}{'top-1':>8}{'top-5':>8}{'confident':>11}{'correct':>9}")
+    for kind, r in sorted(by_kind.items()):
+        n = r["n"]
+        top1 = "-" if kind == "ambiguous" else f"{r['top1'] / n:.0%}"
+        top5 = "-" if kind == "ambiguous" else f"{r['top5'] / n:.0%}"
+        print(f"{kind:<12}{n:>10}{top1:>8}{top5:>8}{r['confident'] / n:>11.0%}{r['right'] / n:>9.0%}")
+    print("\ncorrect = resolved confidently with the right entity among the candidates "
+          "(ambiguous: left to the drill-down LLM).")
+    confident = sum(r["confident"] for r in by_kind.values())
+    wrong = sum(r["confident"] - r["right"] for k, r in by_kind.items() if k != "ambiguous") \
+        + by_kind.get("ambiguous", {}).get("confident", 0)
+    print(f"drill-down skipped on {confident / len(queries):.0%} of requests; "
+          f"{wrong} confident resolutions were wrong.")
+
+if __name__ == "__main__":
+    main()
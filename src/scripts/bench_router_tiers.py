@@ -0,0 +1,169 @@
+# src/scripts/bench_router_tiers.py
+"""
+Routing accuracy vs latency per model tier, on a fixed corpus.
+
+Sends the real supervisor prompt for every utterance to each model and
+scores the JSON decision (next_step, and the plan for compound requests).
+The trigger and semantic tiers are scored on the same corpus for reference,
+so it's clear how often the router model is even consulted.
+
+Usage:
+    python src/scripts/bench_router_tiers.py [--models llama3.2:3b qwen2.5:14b] [--repeat 3] [--standins]
+
+--standins runs against the scripted Ollama from standins.py (plumbing check, not a real accuracy number).
+"""
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+# Path Hack
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from langchain_core.messages import SystemMessage, HumanMessage
+
+from src.core.config import settings
+
+# (utterance, expected next_step, expected plan for multi-worker requests)
+CORPUS = [
+    ("Turn off the kitchen lights", "home_agent", None),
+    ("Dim the bedroom lamp to 20 percent", "home_agent", None),
+    ("Is the front door locked?", "home_agent", None),
+    ("Open the garage", "home_agent", None),
+    ("Make it warmer in here", "home_agent", None),
+    ("Kill the fan in the office", "home_agent", None),
+    ("Is my blender still under warranty?", "research_agent", None),
+    ("How do I descale the espresso machine?", "research_agent", None),
+    ("Find the receipt for the dishwasher", "research_agent", None),
+    ("What does the furnace manual say about filters?", "research_agent", None),
+    ("Which AI models are installed?", "system_admin", None),
+    ("Is the Unraid server healthy?", "system_admin", None),
+    ("How big is the qwen model?", "system_admin", None),
+    ("How much did I spend on Amazon last month?", "finance_agent", None),
+    ("When did I buy the UPS battery?", "finance_agent", None),
+    ("List my five most expensive orders", "finance_agent", None),
+    ("Will it rain today?", "scheduler_agent", None),
+    ("What's on my calendar tomorrow?", "scheduler_agent", None),
+    ("Good morning, what does today look like?", "scheduler_agent", None),
+    ("I changed the fridge filter", "scheduler_agent", None),
+    ("Is any maintenance due?", "scheduler_agent", None),
+    ("Tell me a joke", "general_chat", None),
+    ("Who are you?", "general_chat", None),
+    ("Thanks, that's all", "general_chat", None),
+    ("How are you doing today?", "general_chat", None),
+    ("Turn off the lights and tell me a joke", "home_agent", ["home_agent", "general_chat"]),
+    ("Morning briefing and turn on the kitchen lights", "scheduler_agent", ["scheduler_agent", "home_agent"]),
+    ("What models do we have and how much did I spend on Amazon?", "system_admin", ["system_admin", "finance_agent"]),
+    ("If it's going to rain, close the garage", "scheduler_agent", ["scheduler_agent", "home_agent"]),
+    ("Find the TV warranty and tell me when I bought it", "research_agent", ["research_agent", "finance_agent"]),
+]
+
+def pct(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+def score_model(model: str, repeat: int):
+    from src.core.llm import get_llm
+    from src.orchestrator.graph import build_supervisor_prompt
+    from src.utils.parsing import parse_json_markdown
+
+    llm = get_llm(temperature=0.1, json_mode=True, model=model)
+    prompt = SystemMessage(content=build_supervisor_prompt())
+    latencies, correct, plans_ok, plans_total, invalid, errors = [], 0, 0, 0, 0, 0
+
+    # One unmeasured call so the model load isn't counted as routing latency.
+    try:
+        llm.invoke([prompt, HumanMessage(content="hello")])
+    except Exception as e:
+        print(f"[TIERS] {model}: {e}")
+        return None
+
+    for _ in range(repeat):
+        for text, expected, expected_plan in CORPUS:
+            t0 = time.perf_counter()
+            try:
+                response = llm.invoke([prompt, HumanMessage(content=text)])
+            except Exception as e:
+                errors += 1
+                print(f"[TIERS] {model} failed on {text!r}: {e}")
+                continue
+            latencies.append(time.perf_counter() - t0)
+            try:
+                decision = parse_json_markdown(response.content)
+            except Exception:
+                decision = None
+            if not isinstance(decision, dict):
+                invalid += 1
+                continue
+            correct += decision.get("next_step") == expected
+            if expected_plan:
+                plans_total += 1
+                plan = decision.get("plan")
+                plans_ok += isinstance(plan, list) and set(plan) == set(expected_plan)
+
+    n = len(CORPUS) * repeat
+    return {
+        "accuracy": correct / n,
+        "plan_accuracy": plans_ok / plans_total if plans_total else 0.0,
+        "invalid": invalid / n,
+        "errors": errors,
+        "p50": pct(latencies, 0.5),
+        "p95": pct(latencies, 0.95),
+    }
+
+def score_cheap_tiers():
+    """Coverage/accuracy of the trigger and semantic tiers (what never reaches the router model)."""
+    from src.orchestrator.graph import fast_router, semantic_router
+    rows = []
+    for name, route in (("trigger", fast_router.route), ("semantic", semantic_router.route)):
+        answered = right = 0
+        t0 = time.perf_counter()
+        for text, expected, expected_plan in CORPUS:
+            try:
+                worker, _ = route(text)
+            except Exception as e:
+                print(f"[TIERS] {name} tier unavailable: {e}")
+                break
+            if worker:
+                answered += 1
+                right += worker == expected and not expected_plan
+        per_call = (time.perf_counter() - t0) / len(CORPUS)
+        rows.append((name, answered / len(CORPUS), right / answered if answered else 0.0, per_call))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare router model tiers on a fixed routing corpus.")
+    parser.add_argument("--models", nargs="*", help="Default: the router role model and DEFAULT_MODEL")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--standins", action="store_true", help="Use the scripted Ollama stand-in")
+    args = parser.parse_args()
+
+    if args.standins:
+        from src.scripts.standins import FakeOllama
+        ollama = FakeOllama().start()
+        settings.UNRAID_IP, settings.PORT_OLLAMA = "127.0.0.1", ollama.port
+        tmp = tempfile.mkdtemp(prefix="tiers_")
+        settings.STATE_DB_PATH = os.path.join(tmp, "agent_state.sqlite")
+        settings.SEMANTIC_ROUTER_CACHE_PATH = os.path.join(tmp, "semantic_router_cache.npz")
+
+    models = args.models or list(dict.fromkeys([settings.MODEL_ROLES.get("router") or settings.DEFAULT_MODEL,
+                                                 settings.DEFAULT_MODEL]))
+    results = [(model, score_model(model, args.repeat)) for model in models]
+    cheap = score_cheap_tiers()
+
+    print(f"\n--- ROUTER TIERS ({len(CORPUS)} utterances x {args.repeat}) ---")
+    print(f"{'model':<24}{'accuracy':>10}{'plan acc':>10}{'bad JSON':>10}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for model, r in results:
+        if r is None:
+            print(f"{model:<24}{'unavailable':>10}")
+            continue
+        print(f"{model:<24}{r['accuracy']:>10.0%}{r['plan_accuracy']:>10.0%}{r['invalid']:>10.0%}"
+              f"{r['errors']:>8}{r['p50'] * 1000:>9.0f}{r['p95'] * 1000:>9.0f}")
+
+    print(f"\n{'no-LLM tier':<24}{'answers':>10}{'accuracy':>10}{'ms/call':>10}")
+    for name, coverage, accuracy, per_call in cheap:
+        print(f"{name:<24}{coverage:>10.0%}{accuracy:>10.0%}{per_call * 1000:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# src/scripts/replay_cassette.py
+"""
+Replays a recorded session (LLM_CASSETTE_MODE=record) through the graph without a model.
+
+Every user turn in the cassette is sent again, in order, on its original
+thread; model requests are answered from the recording, instantly unless
+--timing is given. What's left of the turn latency is orchestration:
+routing, checkpointing, middleware, formatting and tools. Prompt changes
+since the recording are reported as divergence warnings.
+
+Tools never reach the real house: Home Assistant is replaced by the
+synthetic stand-in (src/scripts/standins.py) and the finance DB is a copy.
+
+Usage:
+    python src/scripts/replay_cassette.py [--file llm_cassette.jsonl] [--timing] [--async] [--entities 300]
+"""
+import sys
+import os
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+# Path Hack
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from langchain_core.messages import HumanMessage
+
+from src.core.config import settings
+from src.scripts.standins import FakeHomeAssistant
+
+def pct(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded LLM cassette against the graph.")
+    parser.add_argument("--file", default=settings.LLM_CASSETTE_PATH)
+    parser.add_argument("--timing", action="store_true", help="Replay with the recorded model latency")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Use graph.ainvoke (Chainlit path)")
+    parser.add_argument("--entities", type=int, default=300, help="Entities in the stand-in house")
+    args = parser.parse_args()
+
+    ha = FakeHomeAssistant(entity_count=args.entities).start()
+    tmp = tempfile.mkdtemp(prefix="replay_")
+
+    # Settings are read when the graph modules import, so override them first.
+    settings.LLM_CASSETTE_MODE = "replay"
+    settings.LLM_CASSETTE_PATH = args.file
+    settings.LLM_CASSETTE_REPLAY_TIMING = args.timing
+    settings.HOME_ASSISTANT_IP, settings.PORT_HOME_ASSISTANT = "127.0.0.1", ha.port
+    settings.STATE_DB_PATH = os.path.join(tmp, "agent_state.sqlite")
+    settings.TRACE_LOG_PATH = os.path.join(tmp, "traces.jsonl")
+    finance_copy = os.path.join(tmp, "finance_data.db")
+    if os.path.exists(settings.FINANCE_DB_PATH):
+        shutil.copy(settings.FINANCE_DB_PATH, finance_copy)
+    settings.FINANCE_DB_PATH = finance_copy
+
+    from src.core.cassette import get_cassette
+    from src.core.tracing import traced
+    from src.orchestrator.graph import graph, capabilities
+
+    cassette = get_cassette()
+    if not cassette.turns:
+        print("No user turns in the cassette. Record with LLM_CASSETTE_MODE=record via main.py or Chainlit.")
+        return
+    capabilities.warm_up()
+
+    loop = asyncio.new_event_loop() if args.use_async else None
+    latencies = []
+    t_start = time.perf_counter()
+    for turn in cassette.turns:
+        config = traced({"configurable": {"thread_id": f"replay-{turn['thread_id']}"}})
+        inputs = {"messages": [HumanMessage(content=turn["text"])]}
+        t0 = time.perf_counter()
+        try:
+            if loop is None:
+                graph.invoke(inputs, config)
+            else:
+                loop.run_until_complete(graph.ainvoke(inputs, config))
+        except Exception as e:
+            print(f"[REPLAY] Turn failed ({turn['text'][:40]!r}): {e}")
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - t_start
+    if loop is not None:
+        loop.close()
+
+    recorded_model_s = sum(e.get("elapsed_s") or 0 for e in cassette.entries)
+    print(f"\n--- CASSETTE REPLAY ({len(latencies)} turns, {'recorded' if args.timing else 'instant'} model timing) ---")
+    print(f"Turn latency: mean {statistics.mean(latencies) * 1000:.0f}ms | "
+          f"p50 {pct(latencies, 0.5) * 1000:.0f}ms | p95 {pct(latencies, 0.95) * 1000:.0f}ms | total {wall:.2f}s")
+    print(f"Recorded model time: {recorded_model_s:.2f}s over {len(cassette.entries)} requests")
+    print(cassette.summary())
+    print(f"Span log: {settings.TRACE_LOG_PATH}")
+    ha.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,668 @@
+# src/scripts/standins.py
+"""
+Local stand-ins for the services the graph talks to, for offline benchmarks.
+
+- FakeOllama: /api/chat (streamed, scripted router / tool-calling / chat
+  replies with configurable prefill and per-token delays), /api/embed
+  (deterministic bag-of-words vectors) and /api/tags.
+- FakeHomeAssistant: REST API over a synthetic house with a configurable
+  number of entities (/api/states, /api/services, /api/calendars), plus the
+  WebSocket API subset the state mirror uses (auth, get_states,
+  subscribe_events state_changed, area/device/entity registries, ping).
+
+Both run on 127.0.0.1 in a daemon thread and count what they serve, so a
+benchmark can report LLM calls, prompt tokens and HA requests per turn.
+Qdrant and SQLite need no stand-in: see QDRANT_LOCAL_PATH / FINANCE_DB_PATH.
+"""
+import re
+import json
+import math
+import time
+import base64
+import random
+import socket
+import struct
+import hashlib
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+CHARS_PER_TOKEN = 4
+EMBED_DIM = 256
+
+# --- SCRIPTED MODEL BEHAVIOUR ---
+# Which worker a request goes to (first match wins) and which tool a worker calls.
+ROUTES = [
+    ("home_agent", r"\b(light|lights|lamp|switch|fan|thermostat|lock|unlock|garage|dim|turn (on|off))\b"),
+    ("scheduler_agent", r"\b(weather|rain|calendar|schedule|maintenance|briefing|agenda|filter|due)\b"),
+    ("finance_agent", r"\b(spend|spent|amazon|orders?|bought|cost|price)\b"),
+    ("research_agent", r"\b(warranty|manual|receipt|document|descale|specs)\b"),
+    ("system_admin", r"\b(models?|ollama|server|unraid)\b"),
+    ("general_chat", r"\b(joke|hello|hi|thanks|who are you|funny)\b"),
+]
+
+TOOL_WORKER = {
+    "list_entities_in_domain": "home_agent",
+    "control_device": "home_agent",
+    "control_devices": "home_agent",
+    "search_knowledge_base": "research_agent",
+    "query_amazon_orders": "finance_agent",
+    "list_ollama_models": "system_admin",
+    "get_calendar_events": "scheduler_agent",
+    "get_weather_report": "scheduler_agent",
+    "check_maintenance_status": "scheduler_agent",
+    "log_maintenance": "scheduler_agent",
+}
+
+DOMAIN_WORDS = [
+    ("climate", r"\b(thermostat|temperature|heat|cool)\b"),
+    ("lock", r"\b(lock|unlock|door)\b"),
+    ("cover", r"\bgarage\b"),
+    ("switch", r"\b(switch|fan|plug)\b"),
+    ("light", r"\b(light|lights|lamp|dim|bright)"),
+]
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+def split_parts(text: str) -> List[str]:
+    return [p for p in re.split(r"\band\b|\balso\b|,|;", text.lower()) if p.strip()]
+
+def route_parts(text: str) -> List[str]:
+    """Workers a user request needs, in order (one per clause)."""
+    plan = []
+    for part in split_parts(text):
+        for worker, pattern in ROUTES:
+            if re.search(pattern, part):
+                if worker not in plan:
+                    plan.append(worker)
+                break
+    return plan or ["general_chat"]
+
+def pick_tool(tools: List[str], text: str) -> str:
+    t = text.lower()
+    if "get_weather_report" in tools and re.search(r"weather|rain|temperature outside", t):
+        return "get_weather_report"
+    if "check_maintenance_status" in tools and re.search(r"maintenance|due", t) and not re.search(r"changed|replaced|did", t):
+        return "check_maintenance_status"
+    if "log_maintenance" in tools and re.search(r"changed|replaced|did the", t):
+        return "log_maintenance"
+    if "get_calendar_events" in tools and re.search(r"calendar|schedule|today|tomorrow|agenda|briefing", t):
+        return "get_calendar_events"
+    if "control_devices" in tools and re.search(r"\ball\b|\b(lights|lamps|switches|plugs)\b", t):
+        return "control_devices"
+    return tools[0]
+
+ENTITY_ROW = re.compile(r"^([a-z_]+\.[a-z0-9_]+)\|([^|\n]*)\|([^|\n]*)\|", re.MULTILINE)
+
+def entities_from(messages: List[dict]) -> List[dict]:
+    """Entity listings (JSON arrays with "id", or entity tables) visible in the prompt, newest last."""
+    found = []
+    for m in messages:
+        content = m.get("content") or ""
+        rows = ENTITY_ROW.findall(content)
+        if rows:
+            found += [{"id": entity_id, "name": name, "state": state} for entity_id, name, state in rows]
+            continue
+        start = content.find("[")
+        if start < 0 or '"id"' not in content:
+            continue
+        try:
+            data = json.loads(content[start:])
+        except ValueError:
+            continue
+        if isinstance(data, list):
+            found += [e for e in data if isinstance(e, dict) and "id" in e]
+    return found
+
+def _overlap(entity: dict, words: set) -> int:
+    return len(words & set(re.findall(r"[a-z]+", f"{entity['id']} {entity.get('name', '')}".lower())))
+
+def best_entity(entities: List[dict], text: str) -> Optional[dict]:
+    words = set(re.findall(r"[a-z]+", text.lower()))
+    scored = [(_overlap(e, words), e) for e in entities]
+    scored.sort(key=lambda s: s[0], reverse=True)
+    return scored[0][1] if scored else None
+
+def matching_entities(entities: List[dict], text: str) -> List[dict]:
+    """Every listed entity that matches the request as well as the best one ("all the kitchen lights")."""
+    words = set(re.findall(r"[a-z]+", text.lower().replace("lights", "light")))
+    best = max((_overlap(e, words) for e in entities), default=0)
+    return list({e["id"]: e for e in entities if best and _overlap(e, words) == best}.values())
+
+def tool_arguments(tool: str, text: str, messages: List[dict]) -> Dict[str, Any]:
+    t = text.lower()
+    if tool == "list_entities_in_domain":
+        domain = next((d for d, pattern in DOMAIN_WORDS if re.search(pattern, t)), "light")
+        return {"domain": domain}
+    if tool == "control_device":
+        entity = best_entity(entities_from(messages), text)
+        service = "turn_off" if re.search(r"\boff\b", t) else "turn_on"
+        params = {}
+        if m := re.search(r"(\d+)\s*(%|percent)", t):
+            params["brightness_pct"] = int(m.group(1))
+        return {"entity_id": entity["id"] if entity else "light.unknown", "service": service, "parameters": params}
+    if tool == "control_devices":
+        single = tool_arguments("control_device", text, messages)
+        entities = matching_entities(entities_from(messages), text) or [{"id": single["entity_id"]}]
+        return {"commands": [{"entity_id": e["id"], "service": single["service"], "parameters": single["parameters"]}
+                             for e in entities]}
+    if tool == "search_knowledge_base":
+        return {"query": " ".join(re.findall(r"[a-z]{4,}", t)[:4])}
+    if tool == "query_amazon_orders":
+        return {"sql_query": "SELECT date, item_description, item_price FROM amazon_orders ORDER BY item_price DESC LIMIT 20"}
+    if tool == "get_calendar_events":
+        return {"days": 1}
+    if tool == "log_maintenance":
+        return {"task_name": "Fridge filter", "date_performed": datetime.now().strftime("%Y-%m-%d"), "next_due_months": 6}
+    return {}
+
+class ScriptedModel:
+    """Decides what the fake Ollama says, from the prompt it receives."""
+    def __init__(self, reply_tokens: int = 40):
+        self.reply_tokens = reply_tokens
+
+    def respond(self, messages: List[dict], tools: List[dict]) -> Dict[str, Any]:
+        system = " ".join(m["content"] for m in messages if m["role"] == "system")
+        human_at = max((i for i, m in enumerate(messages) if m["role"] == "user"), default=-1)
+        human = messages[human_at]["content"] if human_at >= 0 else ""
+        turn = messages[human_at + 1:]
+        called = {
+            call["function"]["name"]
+            for m in turn if m["role"] == "assistant"
+            for call in (m.get("tool_calls") or [])
+        }
+
+        if "SUPERVISOR ROUTER" in system:
+            plan = route_parts(human)
+            done = {TOOL_WORKER.get(name) for name in called}
+            done |= {w for w in plan for m in turn if m["role"] == "assistant" and f"({w})" in (m.get("content") or "")}
+            pending = [w for w in plan if w not in done]
+            if not pending:
+                return {"content": json.dumps({"next_step": "FINISH"})}
+            return {"content": json.dumps({"next_step": pending[0], "plan": plan, "parallel": False})}
+
+        if "running summary" in system:
+            return {"content": self._words("Summary:", self.reply_tokens)}
+
+        tool_names = [t["function"]["name"] for t in tools or []]
+        if tool_names:
+            worker = TOOL_WORKER.get(tool_names[0], "worker")
+            tool = pick_tool(tool_names, human)
+            if tool not in called:
+                return {"tool_calls": [{"function": {"name": tool, "arguments": tool_arguments(tool, human, messages)}}]}
+            return {"content": self._words(f"Done ({worker}).", self.reply_tokens)}
+
+        return {"content": self._words("Sure (general_chat).", self.reply_tokens)}
+
+    @staticmethod
+    def _words(prefix: str, n: int) -> str:
+        filler = "the house is fine and everything is handled as requested".split()
+        words = [filler[i % len(filler)] for i in range(n)]
+        # Sentences of ~9 words, so sentence-level consumers (TTS) see realistic text.
+        sentences = [" ".join(words[i:i + 9]).capitalize() + "." for i in range(0, n, 9)]
+        return prefix + " " + " ".join(sentences)
+
+def embed(text: str) -> List[float]:
+    """Deterministic bag-of-words vector: similar wording -> similar vectors."""
+    vec = [0.0] * EMBED_DIM
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        h = int(hashlib.md5(word.encode()).hexdigest(), 16)
+        vec[h % EMBED_DIM] += 1.0 if (h >> 8) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+class _Server:
+    def __init__(self, handler_cls, port: int = 0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler_cls)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def count(self, **deltas):
+        with self.lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def stop(self):
+        self.httpd.shutdown()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Headers and body go out separately; don't stall keep-alive clients
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _json(self, obj: Any, status: int = 200):
+        data = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+# --- OLLAMA ---
+class _OllamaHandler(_Handler):
+    def do_GET(self):
+        owner = self.server.owner
+        if self.path.startswith("/api/tags"):
+            return self._json({"models": [{"name": owner.model_name, "model": owner.model_name, "size": 9 * 1024 ** 3,
+                                           "details": {"family": "qwen2", "parameter_size": "14B",
+                                                       "quantization_level": "Q4_K_M"}}]})
+        self._json({"version": "0.0.0-standin"})
+
+    def do_POST(self):
+        owner = self.server.owner
+        body = self._body()
+        if self.path in ("/api/embed", "/api/embeddings"):
+            inputs = body.get("input", body.get("prompt", ""))
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            owner.count(embed_calls=1)
+            time.sleep(owner.embed_delay_s)
+            if self.path == "/api/embeddings":
+                return self._json({"embedding": embed(inputs[0])})
+            return self._json({"model": body.get("model"), "embeddings": [embed(t) for t in inputs]})
+        if self.path == "/api/chat":
+            return self._chat(owner, body)
+        self._json({"error": "not found"}, 404)
+
+    def _chat(self, owner: "FakeOllama", body: dict):
+        if owner.available_models is not None and body.get("model") not in owner.available_models:
+            return self._json({"error": f"model '{body.get('model')}' not found"}, 404)
+        messages, tools = body.get("messages", []), body.get("tools") or []
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+        prompt_tokens += estimate_tokens(json.dumps(tools)) if tools else 0
+        reply = owner.model.respond(messages, tools)
+
+        content = reply.get("content", "")
+        pieces = re.findall(r"\S+\s*", content) or [""]
+        owner.count(chat_calls=1, prompt_tokens=prompt_tokens, output_tokens=len(pieces),
+                    tool_calls=len(reply.get("tool_calls") or []))
+
+        now = datetime.now(timezone.utc).isoformat()
+        prefill_s = prompt_tokens * owner.prefill_s_per_token
+        lines = [{"model": body.get("model"), "created_at": now, "done": False,
+                  "message": {"role": "assistant", "content": p}} for p in pieces]
+        if reply.get("tool_calls"):
+            lines.append({"model": body.get("model"), "created_at": now, "done": False,
+                          "message": {"role": "assistant", "content": "", "tool_calls": reply["tool_calls"]}})
+        lines.append({
+            "model": body.get("model"), "created_at": now, "done": True, "done_reason": "stop",
+            "message": {"role": "assistant", "content": ""},
+            "prompt_eval_count": prompt_tokens, "eval_count": len(pieces),
+            "prompt_eval_duration": int(prefill_s * 1e9), "load_duration": 0,
+            "eval_duration": int(len(pieces) * owner.token_delay_s * 1e9),
+            "total_duration": int((prefill_s + len(pieces) * owner.token_delay_s) * 1e9),
+        })
+
+        if body.get("stream", True) is False:
+            time.sleep(prefill_s + len(pieces) * owner.token_delay_s)
+            final = dict(lines[-1])
+            final["message"] = {"role": "assistant", "content": content, "tool_calls": reply.get("tool_calls")}
+            return self._json(final)
+
+        chunks = [(json.dumps(line) + "\n").encode() for line in lines]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(sum(len(c) for c in chunks)))
+        self.end_headers()
+        time.sleep(prefill_s)
+        for chunk in chunks:
+            self.wfile.write(chunk)
+            self.wfile.flush()
+            if owner.token_delay_s:
+                time.sleep(owner.token_delay_s)
+
+class FakeOllama(_Server):
+    """Scripted Ollama. Delays model prefill and decode so latency numbers are meaningful."""
+    def __init__(self, port: int = 0, token_delay_s: float = 0.0, prefill_s_per_token: float = 0.0,
+                 embed_delay_s: float = 0.0, reply_tokens: int = 40, model_name: str = "qwen2.5:14b",
+                 available_models: Optional[List[str]] = None):
+        super().__init__(_OllamaHandler, port)
+        self.model = ScriptedModel(reply_tokens)
+        self.model_name = model_name
+        self.available_models = available_models  # None = answer for any model name
+        self.token_delay_s = token_delay_s
+        self.prefill_s_per_token = prefill_s_per_token
+        self.embed_delay_s = embed_delay_s
+        self.stats: Dict[str, int] = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {"chat_calls": 0, "prompt_tokens": 0, "output_tokens": 0, "tool_calls": 0, "embed_calls": 0}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+# --- HOME ASSISTANT ---
+ROOMS = ["kitchen", "living room", "bedroom", "office", "garage", "hallway", "basement", "porch",
+         "dining room", "bathroom", "laundry", "guest room", "attic", "patio", "nursery", "den"]
+DOMAIN_MIX = [("light", 0.35), ("switch", 0.15), ("sensor", 0.3), ("binary_sensor", 0.1),
+              ("lock", 0.03), ("climate", 0.02), ("cover", 0.02), ("media_player", 0.03)]
+
+# What a real color bulb / thermostat reports besides its state (sizes the prompts realistically).
+LIGHT_ATTRIBUTES = {
+    "min_color_temp_kelvin": 2000, "max_color_temp_kelvin": 6535, "min_mireds": 153, "max_mireds": 500,
+    "effect_list": ["None", "colorloop", "random"], "supported_color_modes": ["color_temp", "xy"],
+    "color_mode": "color_temp", "color_temp_kelvin": 2702, "color_temp": 370,
+    "hs_color": [28.391, 65.659], "rgb_color": [255, 167, 87], "xy_color": [0.526, 0.387],
+    "effect": "None", "icon": "mdi:lightbulb", "supported_features": 44,
+}
+CLIMATE_ATTRIBUTES = {
+    "hvac_modes": ["off", "heat", "cool", "heat_cool"], "min_temp": 45, "max_temp": 95,
+    "fan_modes": ["auto", "on"], "preset_modes": ["none", "eco", "away"], "current_temperature": 68,
+    "temperature": 70, "target_temp_high": None, "target_temp_low": None, "fan_mode": "auto",
+    "hvac_action": "heating", "preset_mode": "none", "supported_features": 411,
+}
+
+def synthetic_states(entity_count: int, seed: int = 7) -> List[dict]:
+    """A plausible house: rooms x domains, plus a weather and a calendar entity."""
+    rng = random.Random(seed)
+    states = [
+        {"entity_id": "weather.home", "state": "sunny",
+         "attributes": {"friendly_name": "Home", "temperature": 71, "temperature_unit": "°F"}},
+        {"entity_id": "calendar.family", "state": "off", "attributes": {"friendly_name": "Family"}},
+        {"entity_id": "sensor.air_quality_index", "state": "32", "attributes": {"friendly_name": "AQI"}},
+    ]
+    counters: Dict[str, int] = {}
+    while len(states) < entity_count:
+        domain = rng.choices([d for d, _ in DOMAIN_MIX], weights=[w for _, w in DOMAIN_MIX])[0]
+        room = rng.choice(ROOMS)
+        key = f"{domain}.{room.replace(' ', '_')}"
+        counters[key] = counters.get(key, 0) + 1
+        suffix = "" if counters[key] == 1 else f"_{counters[key]}"
+        name = f"{room.title()} {domain.replace('_', ' ').title()}{suffix.replace('_', ' ')}"
+        state = {
+            "light": rng.choice(["on", "off"]), "switch": rng.choice(["on", "off"]),
+            "sensor": f"{rng.uniform(10, 30):.1f}", "binary_sensor": rng.choice(["on", "off"]),
+            "lock": rng.choice(["locked", "unlocked"]), "climate": "heat", "cover": "closed",
+            "media_player": rng.choice(["idle", "off", "unavailable"]),
+        }[domain]
+        attributes = {"friendly_name": name}
+        if domain == "light":
+            attributes["brightness"] = rng.randint(0, 255)
+            attributes.update(LIGHT_ATTRIBUTES)
+        elif domain == "climate":
+            attributes.update(CLIMATE_ATTRIBUTES)
+        states.append({"entity_id": f"{key}{suffix}", "state": state, "attributes": attributes})
+    return states
+
+class _WebSocket:
+    """Server side of one RFC 6455 connection (unfragmented text frames only)."""
+    GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+    def __init__(self, handler: BaseHTTPRequestHandler):
+        self.rfile, self.wfile, self.connection = handler.rfile, handler.wfile, handler.connection
+        self.send_lock = threading.Lock()
+
+    @classmethod
+    def accept_key(cls, key: str) -> str:
+        return base64.b64encode(hashlib.sha1((key + cls.GUID).encode()).digest()).decode()
+
+    def _frame(self, opcode: int, payload: bytes):
+        n = len(payload)
+        header = bytes([0x80 | opcode])
+        if n < 126:
+            header += bytes([n])
+        elif n < 1 << 16:
+            header += bytes([126]) + struct.pack(">H", n)
+        else:
+            header += bytes([127]) + struct.pack(">Q", n)
+        with self.send_lock:
+            self.wfile.write(header + payload)
+            self.wfile.flush()
+
+    def send(self, obj: Any):
+        self._frame(0x1, json.dumps(obj).encode())
+
+    def recv(self) -> Optional[dict]:
+        """Next text message as JSON; None once the client closes."""
+        while True:
+            head = self.rfile.read(2)
+            if len(head) < 2:
+                return None
+            opcode, n = head[0] & 0x0F, head[1] & 0x7F
+            if n == 126:
+                n = struct.unpack(">H", self.rfile.read(2))[0]
+            elif n == 127:
+                n = struct.unpack(">Q", self.rfile.read(8))[0]
+            mask = self.rfile.read(4) if head[1] & 0x80 else b"\0\0\0\0"
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self.rfile.read(n)))
+            if opcode == 0x8:
+                self.close()
+                return None
+            if opcode == 0x9:
+                self._frame(0xA, payload)
+            elif opcode == 0x1:
+                return json.loads(payload)
+
+    def close(self):
+        try:
+            self._frame(0x8, b"")
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+class _HomeAssistantHandler(_Handler):
+    def setup(self):
+        super().setup()
+        self.server.owner.count(connections=1)
+
+    def do_GET(self):
+        owner = self.server.owner
+        owner.hit(self.path)
+        path = self.path.split("?")[0]
+        if path == "/api/websocket" and self.headers.get("Upgrade", "").lower() == "websocket":
+            if owner.accept_websockets:
+                return self._websocket()
+            return self._json({"message": "WebSocket API unavailable."}, 503)
+        if owner.failing():
+            return self._json({"message": "Bad gateway."}, 502)
+        if path == "/api/":
+            return self._json({"message": "API running."})
+        if path == "/api/states":
+            with owner.lock:
+                return self._json(list(owner.states.values()))
+        if path.startswith("/api/states/"):
+            with owner.lock:
+                state = owner.states.get(path.rsplit("/", 1)[-1])
+            return self._json(state) if state else self._json({"message": "Entity not found."}, 404)
+        if path.startswith("/api/calendars/"):
+            return self._json([{"summary": "Dentist", "start": {"dateTime": datetime.now().strftime("%Y-%m-%dT15:00:00")}}])
+        self._json({"message": "not found"}, 404)
+
+    def do_POST(self):
+        owner = self.server.owner
+        owner.hit(self.path)
+        body = self._body()
+        if owner.failing():
+            return self._json({"message": "Bad gateway."}, 502)
+        parts = self.path.split("?")[0].strip("/").split("/")  # api/services/<domain>/<service>
+        if len(parts) == 4 and parts[1] == "services":
+            changed = owner.apply(parts[2], parts[3], body)
+            return self._json(changed)
+        self._json({"message": "not found"}, 404)
+
+    def _websocket(self):
+        owner = self.server.owner
+        self.close_connection = True
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", _WebSocket.accept_key(self.headers["Sec-WebSocket-Key"]))
+        self.end_headers()
+        self.wfile.flush()
+
+        ws = _WebSocket(self)
+        ws.send({"type": "auth_required", "ha_version": "2025.1.0"})
+        auth = ws.recv()
+        if auth is None or auth.get("type") != "auth":
+            return ws.close()
+        ws.send({"type": "auth_ok", "ha_version": "2025.1.0"})
+        with owner.lock:
+            owner.sockets.add(ws)
+        try:
+            while True:
+                message = ws.recv()
+                if message is None:
+                    return
+                kind, msg_id = message.get("type"), message.get("id")
+                if kind == "subscribe_events" and message.get("event_type") == "state_changed":
+                    with owner.lock:
+                        owner.subscribers[ws] = msg_id
+                    ws.send({"id": msg_id, "type": "result", "success": True, "result": None})
+                elif kind == "get_states":
+                    with owner.lock:
+                        owner.stats["state_dumps"] += 1
+                        states = list(owner.states.values())
+                    ws.send({"id": msg_id, "type": "result", "success": True, "result": states})
+                elif kind in owner.REGISTRIES:
+                    ws.send({"id": msg_id, "type": "result", "success": True, "result": owner.registry(kind)})
+                elif kind == "ping":
+                    ws.send({"id": msg_id, "type": "pong"})
+                else:
+                    ws.send({"id": msg_id, "type": "result", "success": False,
+                             "error": {"code": "unknown_command", "message": f"Unknown command {kind}."}})
+        except (OSError, ValueError):
+            return
+        finally:
+            with owner.lock:
+                owner.sockets.discard(ws)
+                owner.subscribers.pop(ws, None)
+
+class FakeHomeAssistant(_Server):
+    """
+    REST + WebSocket stand-in over synthetic_states(); services flip state like
+    HA would and push state_changed to WebSocket subscribers.
+    """
+    SERVICE_STATES = {"turn_on": "on", "turn_off": "off", "lock": "locked", "unlock": "unlocked",
+                      "open_cover": "open", "close_cover": "closed"}
+
+    def __init__(self, port: int = 0, entity_count: int = 200, latency_s: float = 0.0):
+        super().__init__(_HomeAssistantHandler, port)
+        self.states = {s["entity_id"]: s for s in synthetic_states(entity_count)}
+        self.latency_s = latency_s
+        self.sockets = set()
+        self.accept_websockets = True
+        self.aliases: Dict[str, List[str]] = {}  # entity_id -> aliases in the entity registry
+        self.fail_next = 0  # The next N REST requests answer 502 (a restarting HA behind a proxy)
+        # domain -> seconds before a command takes effect (Z-Wave locks, covers); the call returns first
+        self.actuation_s: Dict[str, float] = {}
+        self.subscribers: Dict[_WebSocket, int] = {}  # socket -> subscription id
+        self.stats: Dict[str, int] = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {"requests": 0, "state_dumps": 0, "service_calls": 0, "events": 0, "connections": 0}
+
+    def failing(self) -> bool:
+        with self.lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+        return False
+
+    REGISTRIES = ("config/area_registry/list", "config/device_registry/list", "config/entity_registry/list")
+
+    def registry(self, kind: str) -> List[dict]:
+        """Areas are the rooms in the synthetic entity ids (light.living_room_3 -> living_room)."""
+        if kind == "config/area_registry/list":
+            return [{"area_id": room.replace(" ", "_"), "name": room.title()} for room in ROOMS]
+        if kind == "config/device_registry/list":
+            return []
+        areas = {room.replace(" ", "_") for room in ROOMS}
+        with self.lock:
+            entity_ids = list(self.states)
+        entries = []
+        for entity_id in entity_ids:
+            area_id = re.sub(r"_\d+$", "", entity_id.split(".", 1)[1])
+            entries.append({"entity_id": entity_id, "device_id": None, "area_id": area_id if area_id in areas else None,
+                            "aliases": self.aliases.get(entity_id, [])})
+        return entries
+
+    def drop_websockets(self):
+        """Closes every WebSocket, like an HA restart (clients should reconnect)."""
+        with self.lock:
+            sockets = list(self.sockets)
+        for ws in sockets:
+            ws.close()
+
+    def _publish(self, changes: List[tuple]):
+        with self.lock:
+            subscribers = list(self.subscribers.items())
+            self.stats["events"] += len(changes) * len(subscribers)
+        for ws, sub_id in subscribers:
+            for old, new in changes:
+                event = {"event_type": "state_changed",
+                         "data": {"entity_id": new["entity_id"], "old_state": old, "new_state": new}}
+                try:
+                    ws.send({"id": sub_id, "type": "event", "event": event})
+                except OSError:
+                    pass
+
+    def hit(self, path: str):
+        with self.lock:
+            self.stats["requests"] += 1
+            if path.split("?")[0] == "/api/states":
+                self.stats["state_dumps"] += 1
+            if "/api/services/" in path:
+                self.stats["service_calls"] += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def apply(self, domain: str, service: str, data: dict) -> List[dict]:
+        ids = data.get("entity_id") or []
+        ids = ids if isinstance(ids, list) else [ids]
+        delay = self.actuation_s.get(domain, 0.0)
+        if delay:
+            # Like a slow radio: HA answers with no changed states and the event comes later.
+            threading.Timer(delay, self.apply, (None, service, data)).start()
+            return []
+        changed, events = [], []
+        with self.lock:
+            for entity_id in ids:
+                state = self.states.get(entity_id)
+                if state is None:
+                    continue
+                old = json.loads(json.dumps(state))
+                if service in self.SERVICE_STATES:
+                    state["state"] = self.SERVICE_STATES[service]
+                if "brightness_pct" in data:
+                    state["attributes"]["brightness"] = round(data["brightness_pct"] * 255 / 100)
+                state["last_changed"] = state["last_updated"] = datetime.now(timezone.utc).isoformat()
+                changed.append(state)
+                events.append((old, json.loads(json.dumps(state))))
+        self._publish(events)
+        return changed
+
+    def set_state(self, entity_id: str, value: str):
+        """A change made outside the assistant (wall switch, automation)."""
+        with self.lock:
+            state = self.states[entity_id]
+            old = json.loads(json.dumps(state))
+            state["state"] = value
+            state["last_changed"] = state["last_updated"] = datetime.now(timezone.utc).isoformat()
+            new = json.loads(json.dumps(state))
+        self._publish([(old, new)])
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
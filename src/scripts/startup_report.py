@@ -0,0 +1,24 @@
+# src/scripts/startup_report.py
+import sys
+import os
+import time
+
+# Path Hack
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+def run_report():
+    print("--- STARTUP COST BREAKDOWN ---")
+
+    t0 = time.perf_counter()
+    from src.orchestrator import graph as graph_module
+    import_s = time.perf_counter() - t0
+    print(f"Import src.orchestrator.graph: {import_s:.2f}s (time to first prompt)")
+
+    # Load every capability synchronously so each one is timed in isolation.
+    graph_module.capabilities.warm_up()
+
+    print()
+    print(graph_module.startup_report())
+
+if __name__ == "__main__":
+    run_report()
@@ -0,0 +1,101 @@
+# src/scripts/trace_view.py
+"""
+Offline viewer for the span log written by src/core/tracing.py.
+
+For each turn it prints the span tree and the critical path: starting at the
+turn, repeatedly follow the child that finished last (the one the parent was
+waiting on). That answers "was it routing, the LLM, Home Assistant or Qdrant?".
+
+Usage:
+    python src/scripts/trace_view.py [--file traces.jsonl] [--thread ID] [--last N] [--tree]
+"""
+import sys
+import os
+import json
+import argparse
+from collections import defaultdict
+
+# Path Hack
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from src.core.config import settings
+
+def load_traces(path: str):
+    """Returns {trace_id: [span, ...]} in file order."""
+    traces = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+def label(span: dict) -> str:
+    text = f"{span['kind']}:{span['name']}"
+    if span["kind"] == "llm":
+        text += f" @{span['node']}"
+        if span.get("ttft_s") is not None:
+            text += f" ttft={span['ttft_s'] * 1000:.0f}ms"
+        text += f" tok={span['input_tokens']}/{span['output_tokens']}"
+    if span.get("error"):
+        text += f" ERROR({span['error'][:60]})"
+    return text
+
+def critical_path(root: dict, children: dict):
+    path = [root]
+    while children.get(path[-1]["span_id"]):
+        path.append(max(children[path[-1]["span_id"]], key=lambda s: s["start"] + s["duration_s"]))
+    return path
+
+def print_tree(span: dict, children: dict, on_path: set, depth: int = 0):
+    marker = "*" if span["span_id"] in on_path else " "
+    print(f"  {marker} {'  ' * depth}{span['duration_s'] * 1000:>8.0f}ms  {label(span)}")
+    for child in sorted(children.get(span["span_id"], []), key=lambda s: s["start"]):
+        print_tree(child, children, on_path, depth + 1)
+
+def show_turn(spans: list, tree: bool):
+    children = defaultdict(list)
+    root = None
+    for span in spans:
+        if span["parent_id"] is None:
+            root = span
+        else:
+            children[span["parent_id"]].append(span)
+    if root is None:
+        return
+
+    path = critical_path(root, children)
+    llm = sum(s["duration_s"] for s in spans if s["kind"] == "llm")
+    tools = sum(s["duration_s"] for s in spans if s["kind"] == "tool")
+    calls = sum(1 for s in spans if s["kind"] == "llm")
+
+    print(f"\n=== thread {root['thread_id'] or '?'} | turn {root['trace_id'][-8:]} | "
+          f"{root['duration_s']:.2f}s | {calls} LLM calls ({llm:.2f}s) | tools {tools:.2f}s ===")
+    print("  critical path:")
+    for span in path[1:]:
+        share = span["duration_s"] / root["duration_s"] * 100 if root["duration_s"] else 0
+        print(f"    {span['duration_s'] * 1000:>8.0f}ms {share:>5.1f}%  {label(span)}")
+    if tree:
+        print("  span tree (* = critical path):")
+        print_tree(root, children, {s["span_id"] for s in path})
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-turn critical path from the trace log.")
+    parser.add_argument("--file", default=settings.TRACE_LOG_PATH)
+    parser.add_argument("--thread", help="Only show turns of this thread_id")
+    parser.add_argument("--last", type=int, default=10, help="Number of most recent turns (default 10)")
+    parser.add_argument("--tree", action="store_true", help="Also print the full span tree")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"No trace log at {args.file}. Is TRACING_ENABLED set?")
+        return
+
+    traces = list(load_traces(args.file).values())
+    if args.thread:
+        traces = [t for t in traces if t and t[0]["thread_id"] == args.thread]
+    for spans in traces[-args.last:]:
+        show_turn(spans, args.tree)
+
+if __name__ == "__main__":
+    main()
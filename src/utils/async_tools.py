@@ -0,0 +1,30 @@
+# src/utils/async_tools.py
+from typing import Awaitable, Callable
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import BaseTool
+
+def async_variant(base_tool: BaseTool) -> Callable:
+    """
+    Registers a native coroutine for an existing @tool.
+    `invoke` keeps running the sync function (CLI path); `ainvoke` awaits the
+    coroutine instead of pushing the sync function onto a worker thread.
+
+    Usage:
+        @tool
+        def get_thing() -> str: ...
+
+        @async_variant(get_thing)
+        async def aget_thing() -> str: ...
+    """
+    def register(coroutine: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        base_tool.coroutine = coroutine
+        return coroutine
+    return register
+
+def dual_node(func: Callable, afunc: Callable[..., Awaitable]) -> RunnableLambda:
+    """
+    Graph node with a sync and an async implementation.
+    `graph.invoke` calls `func`; `graph.ainvoke`/`astream_events` await `afunc`
+    on the event loop instead of running `func` in the thread pool.
+    """
+    return RunnableLambda(func, afunc=afunc)
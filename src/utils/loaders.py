@@ -1,6 +1,7 @@
 # Extracted entirely from paperless_example.py
+import httpx
 import requests
-from typing import Iterator
+from typing import AsyncIterator, Iterator
 from langchain_core.documents import Document
 from langchain_core.document_loaders import BaseLoader
 
@@ -13,6 +14,24 @@ class CustomPaperlessLoader(BaseLoader):
         self.url = url.rstrip('/')
         self.headers = {"Authorization": f"Token {api_token}"}
 
+    @staticmethod
+    def _documents(data: dict) -> Iterator[Document]:
+        for doc_data in data.get("results", []):
+            # Only yield if there is actual text content
+            content = doc_data.get("content", "").strip()
+            if content:
+                yield Document(
+                    page_content=content,
+                    metadata={
+                        "source": f"paperless_id_{doc_data.get('id')}",
+                        "title": doc_data.get("title", "Untitled"),
+                        "created": doc_data.get("created", ""),
+                        "modified": doc_data.get("modified", ""),
+                        "correspondent": doc_data.get("correspondent", "Unknown"),
+                        "tags": doc_data.get("tags", [])
+                    }
+                )
+
     def lazy_load(self) -> Iterator[Document]:
         next_page = f"{self.url}/api/documents/"
         
@@ -23,24 +42,31 @@ class CustomPaperlessLoader(BaseLoader):
                 response.raise_for_status()
                 data = response.json()
                 
-                for doc_data in data.get("results", []):
-                    # Only yield if there is actual text content
-                    content = doc_data.get("content", "").strip()
-                    if content:
-                        yield Document(
-                            page_content=content,
-                            metadata={
-                                "source": f"paperless_id_{doc_data.get('id')}",
-                                "title": doc_data.get("title", "Untitled"),
-                                "created": doc_data.get("created", ""),
-                                "modified": doc_data.get("modified", ""),
-                                "correspondent": doc_data.get("correspondent", "Unknown"),
-                                "tags": doc_data.get("tags", [])
-                            }
-                        )
+                yield from self._documents(data)
                 
                 next_page = data.get("next") # Pagination handling
                 
             except Exception as e:
                 print(f"Error fetching from Paperless: {e}")
-                break
\ No newline at end of file
+                break
+
+    async def alazy_load(self) -> AsyncIterator[Document]:
+        """Async twin of lazy_load(); one pooled connection is reused across pages."""
+        next_page = f"{self.url}/api/documents/"
+
+        async with httpx.AsyncClient(headers=self.headers) as client:
+            while next_page:
+                print(f"   Fetching page: {next_page}...")
+                try:
+                    response = await client.get(next_page)
+                    response.raise_for_status()
+                    data = response.json()
+
+                    for doc in self._documents(data):
+                        yield doc
+
+                    next_page = data.get("next") # Pagination handling
+
+                except Exception as e:
+                    print(f"Error fetching from Paperless: {e}")
+                    break
@@ -0,0 +1,66 @@
+# src/utils/streaming.py
+import time
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+class TokenFrames:
+    """
+    Coalesces streamed tokens into frames before they reach the websocket.
+
+    add() buffers a token for a UI target (anything with an async
+    `stream_token`, e.g. a cl.Step or cl.Message). The buffers are sent as
+    one `stream_token` call per target once the oldest buffered token is
+    `frame_ms` old or `frame_chars` have piled up: checked on every add(),
+    and by a timer on the loop so a stream that goes quiet (tool call, slow
+    model) still shows its last tokens on time. Flushes run one at a time;
+    callers flush() before any other UI update, so frames never arrive
+    after the step/message they belong to was updated or removed.
+    """
+    def __init__(self, frame_ms: float = 50, frame_chars: int = 400):
+        self.frame_s = frame_ms / 1000
+        self.frame_chars = frame_chars
+        self._pending: Dict[int, Tuple[Any, List[str]]] = {}  # id(target) -> (target, tokens)
+        self._chars = 0
+        self._since = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._deadline_flush: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.stats = {"events": 0, "tokens": 0, "frames": 0}
+
+    async def add(self, target: Any, token: str):
+        if not self._pending:
+            self._since = time.monotonic()
+            if self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.frame_s, self._on_deadline)
+        self._pending.setdefault(id(target), (target, []))[1].append(token)
+        self._chars += len(token)
+        self.stats["tokens"] += 1
+        if self._chars >= self.frame_chars or time.monotonic() - self._since >= self.frame_s:
+            await self.flush()
+
+    def _on_deadline(self):
+        self._timer = None
+        if self._pending:
+            self._deadline_flush = asyncio.ensure_future(self.flush())
+
+    def drop(self, target: Any):
+        """Discards buffered tokens for a target that is about to be removed."""
+        entry = self._pending.pop(id(target), None)
+        if entry is not None:
+            self._chars -= sum(len(token) for token in entry[1])
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            pending, self._pending, self._chars = self._pending, {}, 0
+            for target, tokens in pending.values():
+                await target.stream_token("".join(tokens))
+                self.stats["frames"] += 1
+
+    def summary(self) -> str:
+        s = self.stats
+        ratio = s["tokens"] / s["frames"] if s["frames"] else 0.0
+        return (f"[UI] {s['events']} events, {s['tokens']} tokens sent in {s['frames']} frames "
+                f"({ratio:.1f} tokens/frame).")
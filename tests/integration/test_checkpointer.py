@@ -0,0 +1,73 @@
+# tests/integration/test_checkpointer.py
+import sys
+import os
+import time
+import asyncio
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+# --- PATH SETUP ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from src.core.persistence import SqliteCheckpointer
+
+def config(thread_id: str, checkpoint_ns: str = "") -> dict:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}}
+
+@pytest.fixture
+def saver(tmp_path):
+    """A real database file; maintenance is run by hand."""
+    saver = SqliteCheckpointer(str(tmp_path / "state.sqlite"), keep_last=3, thread_ttl_s=3600,
+                               maintenance_interval_s=0)
+    yield saver
+    saver.close()
+
+def test_put_and_list(saver):
+    print("--- CHECKPOINTER PUT/LIST TEST ---")
+    checkpoint = empty_checkpoint()
+    saved = saver.put(config("t1"), checkpoint, {"source": "input", "step": 0}, {})
+    saver.put_writes(saved, [("messages", "hello")], task_id="task-1")
+    found = saver.get_tuple(config("t1"))
+    assert found.checkpoint["id"] == checkpoint["id"] and found.metadata["step"] == 0
+    assert found.pending_writes == [("task-1", "messages", "hello")]
+    assert [t.checkpoint["id"] for t in saver.list(config("t1"))] == [checkpoint["id"]]
+    assert saver.get_next_version(saver.get_next_version(None, None), None) > saver.get_next_version(None, None)
+    print("   [SUCCESS] Checkpoint and pending writes read back.")
+
+def test_keep_last(saver):
+    print("--- CHECKPOINTER PRUNING TEST ---")
+    ids = []
+    for step in range(5):
+        checkpoint = empty_checkpoint()
+        ids.append(checkpoint["id"])
+        saver.put(config("t1"), checkpoint, {"step": step}, {})
+        saver.put(config("t1", "home_agent:1"), empty_checkpoint(), {"step": step}, {})
+    kept = [t.checkpoint["id"] for t in saver.list(config("t1", ""))]
+    assert kept == ids[:-4:-1], kept
+    subgraph = list(saver.list(config("t1", "home_agent:1")))
+    assert all(t.checkpoint["id"] > ids[-3] for t in subgraph), "subgraph checkpoints outlived their root"
+    print(f"   [SUCCESS] {len(kept)} of 5 root checkpoints kept.")
+
+def test_thread_ttl(saver):
+    print("--- CHECKPOINTER TTL TEST ---")
+    saver.put(config("idle"), empty_checkpoint(), {}, {})
+    saver.put(config("active"), empty_checkpoint(), {}, {})
+    saver.conn.execute("UPDATE thread_activity SET last_seen = ? WHERE thread_id = 'idle'", (time.time() - 7200,))
+    saver.conn.commit()
+    saver.maintain()
+    assert saver.get_tuple(config("idle")) is None
+    assert saver.get_tuple(config("active")) is not None
+    print("   [SUCCESS] Idle thread evicted, active thread kept.")
+
+def test_async_path(saver):
+    print("--- CHECKPOINTER ASYNC TEST ---")
+    async def run():
+        for step in range(4):
+            await saver.aput(config("t2"), empty_checkpoint(), {"step": step}, {})
+        return [t async for t in saver.alist(config("t2"))]
+    listed = asyncio.run(run())
+    assert [t.metadata["step"] for t in listed] == [3, 2, 1]
+    assert saver.get_tuple(config("t2")).metadata["step"] == 3, "sync reader missed the async write"
+    print("   [SUCCESS] Async writes pruned and visible to the sync saver.")
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q", "-s"]))
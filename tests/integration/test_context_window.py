@@ -0,0 +1,49 @@
+# tests/integration/test_context_window.py
+import sys
+import os
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+# --- PATH SETUP ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from src.core.config import settings
+from src.core.context import build_context, _summary_request
+
+@pytest.fixture
+def window(monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_WINDOW_ENABLED", True)
+    monkeypatch.setattr(settings, "CONTEXT_KEEP_TURNS", 6)
+    monkeypatch.setattr(settings, "CONTEXT_SUMMARY_BATCH_TURNS", 3)
+    monkeypatch.setattr(settings, "CONTEXT_DEFAULT_TOKEN_BUDGET", 100_000)
+
+def thread(turns: int):
+    messages = []
+    for i in range(turns):
+        messages += [HumanMessage(content=f"question {i}"), AIMessage(content=f"answer {i}")]
+    return messages[:-1]  # The last turn is the current one
+
+def humans(messages):
+    return [m.content for m in messages if isinstance(m, HumanMessage)]
+
+def test_unsummarized_turns_stay_visible(window):
+    print("--- CONTEXT WINDOW TEST ---")
+    # KEEP finished turns, 2 evicted (not a batch yet) and the current turn
+    messages = thread(settings.CONTEXT_KEEP_TURNS + 2 + 1)
+    state = {"messages": messages, "summary": "", "summary_cursor": 0}
+    assert _summary_request(state) is None, "folded before a full batch"
+    assert humans(build_context(state, "supervisor")) == humans(messages), "a turn is in neither the summary nor the window"
+    print(f"   [SUCCESS] {len(humans(messages))} turns visible before the fold.")
+
+def test_summarized_turns_leave_the_window(window):
+    print("--- CONTEXT WINDOW FOLD TEST ---")
+    messages = thread(settings.CONTEXT_KEEP_TURNS + 3 + 1)
+    state = {"messages": messages, "summary": "", "summary_cursor": 0}
+    _, _, cursor = _summary_request(state)
+    state.update(summary="- earlier questions", summary_cursor=cursor)
+    context = build_context(state, "supervisor")
+    assert isinstance(context[0], SystemMessage) and "earlier questions" in context[0].content
+    assert humans(context) == humans(messages[cursor:]), "the window repeats what the summary covers"
+    print(f"   [SUCCESS] Summary + {len(humans(context))} verbatim turns.")
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q", "-s"]))
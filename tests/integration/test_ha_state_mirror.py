@@ -0,0 +1,175 @@
+# tests/integration/test_ha_state_mirror.py
+import sys
+import os
+import json
+import time
+import asyncio
+import pytest
+
+# --- PATH SETUP ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from src.scripts.standins import FakeHomeAssistant
+from src.core.config import settings
+from src.core.iot import ha_client, async_ha_client, state_mirror
+from src.capabilities.home_control.tools import get_active_domains, list_entities_in_domain, control_devices, _expectation
+from src.capabilities.home_control.resolver import resolver
+from src.capabilities.home_control.inventory import inventory
+from src.capabilities.home_control.projection import project_entities
+from langchain_core.messages import SystemMessage
+from langchain_core.runnables import RunnableLambda
+
+ENTITIES = 2000
+
+@pytest.fixture(scope="module")
+def house():
+    """
+    Runs against the local stand-in (REST + WebSocket), not the real house:
+    settings and the REST clients point at it for this module only, and the
+    mirror starts over from it (whatever other tests loaded before).
+    """
+    ha = FakeHomeAssistant(entity_count=ENTITIES).start()
+    ha.aliased = next(e for e in ha.states if e.startswith("light."))
+    ha.aliases[ha.aliased] = ["Christmas Tree"]  # As if set in the HA entity settings
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "HOME_ASSISTANT_IP", "127.0.0.1")
+        mp.setattr(settings, "PORT_HOME_ASSISTANT", ha.port)
+        mp.setattr(settings, "HA_STATE_TTL_S", 1.0)
+        mp.setattr(settings, "HA_STATE_MIRROR_ENABLED", True)
+        mp.setattr(ha_client, "base_url", ha.url)
+        mp.setattr(async_ha_client, "base_url", ha.url)
+        state_mirror.stop()
+        try:
+            yield ha
+        finally:
+            state_mirror.stop()
+            ha.stop()
+
+@pytest.fixture
+def live(house):
+    """The stand-in with the mirror subscribed to it."""
+    state_mirror.states()
+    assert wait_for(lambda: state_mirror.live, timeout=10)
+    return house
+
+def wait_for(check, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_state_mirror(house):
+    print("--- HOME ASSISTANT STATE MIRROR TEST ---")
+
+    # 1. One load over the WebSocket, then every tool reads memory
+    print("\n1. Initial load...")
+    states = state_mirror.states()
+    assert len(states) == ENTITIES, len(states)
+    assert state_mirror.live and state_mirror.stats["ws_loads"] >= 1
+    dumps = house.stats["state_dumps"]
+    for _ in range(5):
+        get_active_domains.invoke({})
+        list_entities_in_domain.invoke({"domain": "light"})
+    assert house.stats["state_dumps"] == dumps, "tools downloaded the states again"
+    print(f"   [SUCCESS] {len(states)} entities, 10 tool calls, {house.stats['state_dumps']} state download(s).")
+
+    # 2. state_changed keeps the index current (service call and an outside change)
+    print("\n2. Following state_changed...")
+    light = state_mirror.states("light")[0]["entity_id"]
+    ha_client.call_service("light", "turn_off", {"entity_id": light})
+    assert wait_for(lambda: state_mirror.get(light)["state"] == "off")
+    house.set_state(light, "on")
+    assert wait_for(lambda: state_mirror.get(light)["state"] == "on")
+    assert any(s["entity_id"] == light and s["state"] == "on" for s in state_mirror.states("light"))
+    print(f"   [SUCCESS] {light} followed off -> on ({state_mirror.stats['events']} events).")
+
+    # 3. Subscription lost: REST snapshots with a TTL
+    print("\n3. WebSocket down...")
+    house.accept_websockets = False
+    house.drop_websockets()
+    assert wait_for(lambda: not state_mirror.live)
+    house.set_state(light, "off")  # Not pushed anywhere now
+    time.sleep(1.1)
+    rest_loads = state_mirror.stats["rest_loads"]
+    assert any(s["entity_id"] == light and s["state"] == "off" for s in state_mirror.states("light"))
+    state_mirror.states()
+    assert state_mirror.stats["rest_loads"] == rest_loads + 1, "refreshed within the TTL"
+    time.sleep(1.1)
+    async def concurrent_reads():
+        return await asyncio.gather(*(state_mirror.astates("light") for _ in range(5)))
+    reads = asyncio.run(concurrent_reads())
+    assert all(len(read) == len(reads[0]) > 0 for read in reads)
+    assert state_mirror.stats["rest_loads"] == rest_loads + 2, "concurrent async reads refreshed more than once"
+    print(f"   [SUCCESS] Served from REST, refreshed once per TTL.")
+
+    # 4. The subscription comes back on its own
+    print("\n4. WebSocket back...")
+    house.accept_websockets = True
+    assert wait_for(lambda: state_mirror.live, timeout=10)
+    print(f"   [SUCCESS] Live again after {state_mirror.stats['disconnects']} disconnect(s).")
+
+def test_entity_resolver(live):
+    print("--- ENTITY RESOLVER TEST ---")
+    # Areas and aliases from the registries feed the index
+    assert state_mirror.areas.get(live.aliased) and state_mirror.aliases.get(live.aliased) == ["Christmas Tree"]
+    resolution = resolver.resolve("turn on the christmas tree", state_mirror.states())
+    assert resolution.confident and resolution.candidates == [live.aliased], resolution
+    resolution = resolver.resolve("turn off the kitchen lights", state_mirror.states())
+    assert not resolution.confident, resolution  # dozens of them: left to the drill-down LLM
+    print(f"   [SUCCESS] 'christmas tree' -> {live.aliased} in "
+          f"{resolver.resolve('christmas tree', state_mirror.states()).elapsed_us:.0f}µs.")
+
+def test_actuation_confirmation(live, monkeypatch):
+    print("--- ACTUATION CONFIRMATION TEST ---")
+    # Commands are confirmed by the state_changed they cause
+    lights = [s["entity_id"] for s in state_mirror.states("light")[:2]]
+    lock = state_mirror.states("lock")[0]["entity_id"]
+    service = "unlock" if state_mirror.get(lock)["state"] == "locked" else "lock"
+    live.actuation_s["lock"] = 0.3  # The call returns before the lock moves
+    try:
+        result = json.loads(control_devices.invoke({"commands": [{"entity_id": e, "service": "turn_on"} for e in lights]
+                                                    + [{"entity_id": lock, "service": service}]}))
+        assert all(r["confirmed"] for r in result["results"]), result
+        latency = {r["entity_id"]: r["latency_ms"] for r in result["results"]}
+        assert latency[lock] >= 300 and all(latency[e] < 300 for e in lights), latency
+        monkeypatch.setitem(settings.HOME_CONFIRM_TIMEOUT_S, "lock", 0.1)  # Gave up before the event
+        undo = "lock" if service == "unlock" else "unlock"
+        result = json.loads(control_devices.invoke({"commands": [{"entity_id": lock, "service": undo}]}))
+        assert not result["results"][0]["confirmed"] and result["results"][0]["latency_ms"] is None, result
+    finally:
+        live.actuation_s.clear()
+
+    # A failed read confirms nothing; with parameters, an "on" light must be updated again
+    before = {"state": "on", "last_updated": "t0"}
+    assert not _expectation("toggle", before, False)({"error": "Entity not found."})
+    assert not _expectation("turn_on", before, True)(before)
+    assert _expectation("turn_on", before, True)({**before, "last_updated": "t1"})
+    print(f"   [SUCCESS] {lock} confirmed after {latency[lock]}ms, lights after {max(latency[e] for e in lights)}ms.")
+
+def test_inventory_diffs(live, monkeypatch):
+    print("--- INVENTORY DIFF TEST ---")
+    monkeypatch.setattr(settings, "HOME_INVENTORY_DIFFS_ENABLED", True)  # Off by default with the context window
+    # A thread is shown its inventory once, then only what changed
+    def show(history):
+        table = project_entities(state_mirror.states("light"), "light")
+        text, pin = inventory.entities(history, table, "light", state_mirror.states("light"))
+        if pin:
+            history.append(SystemMessage(content=text, **pin))
+        return text
+    in_thread = lambda history: RunnableLambda(show).invoke(history, {"configurable": {"thread_id": "inventory-test"}})
+    history = []
+    full = in_thread(history)
+    assert in_thread(history).startswith("## light: unchanged"), "nothing changed"
+    shown = full.splitlines()[2].split("|")[0]
+    flipped = "off" if state_mirror.get(shown)["state"] == "on" else "on"
+    live.set_state(shown, flipped)
+    assert wait_for(lambda: state_mirror.get(shown)["state"] == flipped)
+    diff = in_thread(history)
+    assert "changes since" in diff and shown in diff and len(diff) < len(full) / 10, diff
+    again = in_thread(history[1:])  # The window lost the baseline: show it in full again
+    assert again == project_entities(state_mirror.states("light"), "light") and shown in again
+    print(f"   [SUCCESS] ~{len(full) // 4} tokens once, then a ~{len(diff) // 4} token diff.")
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q", "-s"]))
@@ -0,0 +1,72 @@
+# tests/integration/test_speculation.py
+import sys
+import os
+import types
+import pytest
+from langchain_core.tools import tool
+
+# --- PATH SETUP ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from src.core.config import settings
+from src.orchestrator.speculation import SPECULATIVE_CALLS, speculator
+
+THREAD = "speculation-test"
+CONFIG = {"configurable": {"thread_id": THREAD}}
+
+@pytest.fixture(scope="module")
+def worker():
+    """
+    A scheduler-like worker: one prefetchable read and one write that changes
+    what it returns. Tools are wrapped once per process, so the module shares it.
+    """
+    log = {"fridge filter": "overdue"}
+
+    @tool
+    def maintenance_status() -> str:
+        """What is due."""
+        return ", ".join(f"{task}: {state}" for task, state in log.items())
+
+    @tool
+    def log_task(task_name: str) -> str:
+        """Marks a task done."""
+        log[task_name] = "done"
+        return f"Logged {task_name}."
+
+    module = types.ModuleType("maintenance_worker")
+    module.maintenance_status, module.log_task = maintenance_status, log_task
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "SPECULATIVE_TOOLS_ENABLED", True)
+        mp.setitem(SPECULATIVE_CALLS, "maintenance_worker", [("maintenance_status", None, lambda text: {})])
+        speculator.wrap_tools("maintenance_worker", module)
+        try:
+            yield module
+        finally:
+            speculator.discard(THREAD)
+
+def prefetch(text: str):
+    speculator.start(THREAD, "maintenance_worker", text)
+    speculator.settle(THREAD, ["maintenance_worker"])
+    for future in speculator._pending[THREAD]["calls"].values():
+        future.result(timeout=5)
+
+def test_prefetch_is_claimed(worker):
+    print("--- SPECULATION TEST ---")
+    prefetch("what's due?")
+    used = speculator.stats["used"]
+    assert worker.maintenance_status.invoke({}, CONFIG) == "fridge filter: overdue"
+    assert speculator.stats["used"] == used + 1, "the prefetched result was not claimed"
+    print("   [SUCCESS] Read served from the prefetch.")
+
+def test_write_drops_prefetch(worker):
+    print("--- SPECULATION WRITE-THEN-READ TEST ---")
+    # "I replaced the fridge filter, what's due?": the prefetch ran before the write
+    prefetch("I replaced the fridge filter, what's due?")
+    used = speculator.stats["used"]
+    worker.log_task.invoke({"task_name": "fridge filter"}, CONFIG)
+    assert THREAD not in speculator._pending, "the write left the prefetch claimable"
+    assert worker.maintenance_status.invoke({}, CONFIG) == "fridge filter: done"
+    assert speculator.stats["used"] == used
+    print("   [SUCCESS] The read after the write saw the write.")
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q", "-s"]))